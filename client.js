@@ -8,8 +8,29 @@ let playerName = '';
 let lastUpdateTime = 0;
 let keys = {};
 let lastControlsJson = '';
+let snapshots = {}; // Reconstructed snapshots by tick, used as delta baselines
+let wireEncoding = 'json'; // Encoding the server agreed to in its welcome message
+let roster = {}; // Maps network ids to player details (binary encoding)
+let lastEventTick = 0; // Tick of the newest snapshot whose events we have handled
+let lastInputBits = -1;
+let arena = {width: 1024, height: 768}; // World size from the welcome message; it wraps at the edges
+let precision = {position_scale: 8, angle_steps: 256, velocity_scale: 256}; // Quantization of binary snapshot fields, from the welcome message
+let lastLaserSoundTick = 0; // Newest laser we have played a sound for, by the tick it was fired on
+
+// Client-side prediction of our own ship
+let simulationRate = 60; // Server ticks per second
+let tickClock = {tick: 0, time: 0}; // Latest server tick we know of and when we learned it
+let inputSeq = 0; // Sequence number of the last input we sent
+let pendingInputs = []; // Inputs the server hasn't applied yet: {seq, tick, rotation, thrust}
+let predictedShip = null; // Our ship, simulated ahead of the server
+let predictedTick = 0;
+let predictedInputIndex = 0; // Next pending input to replay into predictedShip
 
 // Game constants
+// Largest view of the arena; the server only sends what's within its AOI_MARGIN of a view this size
+const SCREEN_WIDTH = 1024;
+const SCREEN_HEIGHT = 768;
+const LASER_SPEED = 10; // Pixels per 1/60s step, as on the server
 const KEYS = {
     LEFT: 37,
     UP: 38,
@@ -18,6 +39,45 @@ const KEYS = {
     SPACE: 32
 };
 
+// Inputs are scheduled this many ticks ahead of our estimate of the server's tick,
+// so they usually arrive in time to be applied at the tick we predicted them for
+const INPUT_LEAD_TICKS = 3;
+const MAX_PREDICTION_STEPS = 120;
+
+// Ship physics (must match ship_model.py)
+const SHIP_PHYSICS = {
+    rotationSpeed: 6,
+    acceleration: 0.3,
+    friction: 0.97,
+    maxSpeed: 8.5,
+    stopSpeed: 0.1
+};
+
+// Ask the server for compact binary snapshots instead of JSON
+const USE_BINARY_PROTOCOL = true;
+
+// Binary wire format (must match wire.py)
+const WIRE = {
+    MSG_SNAPSHOT: 1,
+    MSG_INPUT: 2,
+    MSG_ACK: 3,
+    INPUT_LEFT: 1 << 0,
+    INPUT_RIGHT: 1 << 1,
+    INPUT_THRUST: 1 << 2,
+    INPUT_FIRE: 1 << 3,
+    FLAG_KEYFRAME: 1 << 0,
+    FLAG_SCORES: 1 << 1,
+    FLAG_AREA_EVENTS: 1 << 2,
+    FLAG_EVENTS: 1 << 3,
+    SHIP_THRUSTING: 1 << 0,
+    SHIP_INVULNERABLE: 1 << 1,
+    SHIP_VISIBLE: 1 << 2,
+    SHIP_ROTATING_LEFT: 1 << 3,
+    SHIP_ROTATING_RIGHT: 1 << 4,
+    NO_BASELINE: 0xFFFFFFFF,
+    NO_INPUT_SEQ: 0xFFFFFFFF
+};
+
 // Ship colors
 const SHIP_COLORS = [
   [255, 100, 100],  // Red
@@ -331,8 +391,7 @@ function initGameCanvas() {
     ctx = canvas.getContext('2d');
     
     // Set canvas size to match window
-    canvas.width = window.innerWidth - 20;
-    canvas.height = window.innerHeight - 20;
+    resizeCanvas();
     
     // Initialize fluid field
     fluidField.init();
@@ -352,12 +411,17 @@ function initGameCanvas() {
     
     // Set resize handler to update canvas size
     window.addEventListener('resize', function() {
-        canvas.width = window.innerWidth - 20;
-        canvas.height = window.innerHeight - 20;
+        resizeCanvas();
         fluidField.init(); // Reinitialize fluid field when canvas size changes
     });
 }
 
+// Fit the canvas to the window, but never past the view the server sends entities for
+function resizeCanvas() {
+    canvas.width = Math.min(window.innerWidth - 20, SCREEN_WIDTH);
+    canvas.height = Math.min(window.innerHeight - 20, SCREEN_HEIGHT);
+}
+
 // Function to connect to the WebSocket server
 function connectToServer() {
     try {
@@ -368,24 +432,68 @@ function connectToServer() {
         const wsUrl = `ws://${window.location.hostname}:8081`;
         console.log(`Connecting to: ${wsUrl}`);
         socket = new WebSocket(wsUrl);
+        socket.binaryType = 'arraybuffer';
         
         socket.onopen = function() {
             console.log('Connected to server successfully');
             // Send player info when connection is established
-            socket.send(JSON.stringify({
+            // An optional ?room=name in the page URL picks a specific room
+            const join = {
                 type: 'join',
-                player_name: playerName || 'Player'
-            }));
+                player_name: playerName || 'Player',
+                encoding: USE_BINARY_PROTOCOL ? 'binary' : 'json'
+            };
+            const room = new URLSearchParams(window.location.search).get('room');
+            if (room) {
+                join.room = room;
+            }
+            socket.send(JSON.stringify(join));
         };
         
         socket.onmessage = function(event) {
             try {
-                const message = JSON.parse(event.data);
-                console.log("Received message:", message.type);
+                const message = (event.data instanceof ArrayBuffer)
+                    ? decodeBinaryMessage(event.data)
+                    : JSON.parse(event.data);
                 
-                if (message.type === 'game_state') {
+                if (message.type === 'welcome') {
+                    playerId = message.player_id;
+                    wireEncoding = message.encoding;
+                    roster = message.players;
+                    if (message.arena) {
+                        arena = message.arena;
+                    }
+                    if (message.precision) {
+                        precision = message.precision;
+                    }
+                    lastInputBits = -1;
+                    lastControlsJson = '';
+                    simulationRate = message.simulation_rate || simulationRate;
+                    tickClock = {tick: message.tick || 0, time: Date.now()};
+                    lastEventTick = message.tick || 0;
+                    lastLaserSoundTick = message.tick || 0;
+                    inputSeq = 0;
+                    pendingInputs = [];
+                    predictedShip = null;
+                    console.log('Joined room', message.room, 'as', playerId, 'using', wireEncoding, 'encoding');
+                } else if (message.type === 'error') {
+                    console.error('Server refused to join:', message.reason, message.room);
+                } else if (message.type === 'game_state') {
+                    // Joins, hits and spawns since the last snapshot (binary frames had theirs handled while decoding)
+                    handleEvents(message.events, message.tick);
+                    
+                    // Rebuild the full snapshot from a keyframe or a delta
+                    const snapshot = applySnapshot(message);
+                    if (!snapshot) {
+                        return;
+                    }
+                    
                     // Update game state
-                    gameState = message.data;
+                    gameState = snapshotToGameState(snapshot, message.tick);
+                    
+                    // Re-run our unacknowledged inputs on top of the server's view of our ship
+                    tickClock = {tick: message.tick, time: Date.now()};
+                    reconcile(message.tick, message.input_seq);
                     
                     // Get player ID from server response
                     if (!playerId) {
@@ -398,9 +506,6 @@ function connectToServer() {
                             }
                         }
                     }
-                } else if (message.type === 'hit') {
-                    // Play explosion sound when an asteroid is hit
-                    playSound('explosion', 0.5);
                 }
             } catch (error) {
                 console.error("Error parsing message:", error, event.data);
@@ -408,6 +513,8 @@ function connectToServer() {
         };
         
         socket.onclose = function(event) {
+            // Baselines are per connection, so start over with a keyframe
+            snapshots = {};
             console.log(`Disconnected from server: code=${event.code}, reason=${event.reason}`);
             // Attempt to reconnect after 3 seconds
             setTimeout(connectToServer, 3000);
@@ -434,6 +541,311 @@ function connectToServer() {
     }
 }
 
+// Handle the events a snapshot carries. Snapshots repeat events until we ack
+// one that had them, so skip any an earlier snapshot already delivered
+function handleEvents(events, tick) {
+    if (events) {
+        for (const event of events) {
+            if (event.tick > lastEventTick) {
+                handleEvent(event);
+            }
+        }
+    }
+    lastEventTick = Math.max(lastEventTick, tick);
+}
+
+// Handle one event from the server
+function handleEvent(event) {
+    if (event.type === 'roster') {
+        // We fell behind and missed some joins or leaves; this is everyone in the room now
+        roster = event.players;
+    } else if (event.type === 'player_joined') {
+        roster[event.net_id] = {
+            player_id: event.player_id,
+            player_name: event.player_name,
+            color_idx: event.color_idx
+        };
+    } else if (event.type === 'player_left') {
+        for (const netId in roster) {
+            if (roster[netId].player_id === event.player_id) {
+                delete roster[netId];
+            }
+        }
+    } else if (event.type === 'hit') {
+        // Play explosion sound when an asteroid is hit
+        playSound('explosion', 0.5);
+    } else if (event.type === 'crash') {
+        // A ship ran into an asteroid
+        playSound('explosion', event.player_id === playerId ? 1.0 : 0.5);
+    }
+}
+
+// Rebuild a full snapshot from a game_state message and acknowledge it
+function applySnapshot(message) {
+    let base;
+    if (message.keyframe) {
+        base = {ships: {}, asteroids: {}, lasers: {}, scores: {}, level: 1};
+    } else {
+        base = snapshots[message.baseline];
+        if (!base) {
+            // Baseline is gone, wait for the server to send a keyframe
+            return null;
+        }
+    }
+    
+    const data = message.data;
+    const removed = message.removed || {};
+    const snapshot = {
+        scores: data.scores !== undefined ? data.scores : base.scores,
+        level: data.level !== undefined ? data.level : base.level
+    };
+    
+    for (const section of ['ships', 'asteroids', 'lasers']) {
+        const entities = Object.assign({}, base[section], data[section]);
+        for (const id of removed[section] || []) {
+            delete entities[id];
+        }
+        snapshot[section] = entities;
+    }
+    
+    // The server never deltas against anything older than the baseline it just used
+    const oldest = message.keyframe ? message.tick : message.baseline;
+    for (const tick in snapshots) {
+        if (tick < oldest) {
+            delete snapshots[tick];
+        }
+    }
+    snapshots[message.tick] = snapshot;
+    
+    sendAck(message.tick);
+    return snapshot;
+}
+
+// Acknowledge a snapshot so the server can use it as a delta baseline
+function sendAck(tick) {
+    if (wireEncoding === 'binary') {
+        const view = new DataView(new ArrayBuffer(5));
+        view.setUint8(0, WIRE.MSG_ACK);
+        view.setUint32(1, tick, true);
+        socket.send(view.buffer);
+    } else {
+        socket.send(JSON.stringify({type: 'ack', tick: tick}));
+    }
+}
+
+// Decode a binary snapshot frame into the same shape as a JSON game_state message
+function decodeBinaryMessage(buffer) {
+    const view = new DataView(buffer);
+    let offset = 0;
+    
+    const kind = view.getUint8(offset); offset += 1;
+    if (kind !== WIRE.MSG_SNAPSHOT) {
+        return {type: 'unknown'};
+    }
+    
+    const tick = view.getUint32(offset, true); offset += 4;
+    const baseline = view.getUint32(offset, true); offset += 4;
+    const flags = view.getUint8(offset); offset += 1;
+    const level = view.getUint16(offset, true); offset += 2;
+    const lastInputSeq = view.getUint32(offset, true); offset += 4;
+    
+    // Events come first so joins reach the roster before the new players' ships are read
+    if (flags & WIRE.FLAG_EVENTS) {
+        const length = view.getUint32(offset, true); offset += 4;
+        const text = new TextDecoder().decode(new Uint8Array(buffer, offset, length));
+        offset += length;
+        handleEvents(JSON.parse(text), tick);
+    }
+    
+    const data = {ships: {}, asteroids: {}, lasers: {}, level: level};
+    
+    // Positions, angles, velocities and spins arrive as quantized steps; these
+    // give back exactly the values the server put in its own snapshot
+    const position = steps => steps / precision.position_scale;
+    const angleStep = 360 / precision.angle_steps;
+    const velocity = steps => steps / precision.velocity_scale;
+    
+    // Ships
+    const shipCount = view.getUint8(offset); offset += 1;
+    for (let i = 0; i < shipCount; i++) {
+        const netId = view.getUint8(offset);
+        const player = roster[netId] || {player_id: `net-${netId}`, player_name: 'Player'};
+        const shipFlags = view.getUint8(offset + 10);
+        let rotation = 0;
+        if (shipFlags & WIRE.SHIP_ROTATING_LEFT) rotation = 1;
+        if (shipFlags & WIRE.SHIP_ROTATING_RIGHT) rotation = -1;
+        
+        data.ships[player.player_id] = {
+            player_id: player.player_id,
+            player_name: player.player_name,
+            net_id: netId,
+            x: position(view.getUint16(offset + 1, true)),
+            y: position(view.getUint16(offset + 3, true)),
+            angle: view.getUint8(offset + 5) * angleStep,
+            velocity_x: velocity(view.getInt16(offset + 6, true)),
+            velocity_y: velocity(view.getInt16(offset + 8, true)),
+            thrusting: !!(shipFlags & WIRE.SHIP_THRUSTING),
+            invulnerable: !!(shipFlags & WIRE.SHIP_INVULNERABLE),
+            visible: !!(shipFlags & WIRE.SHIP_VISIBLE),
+            rotation_direction: rotation,
+            score: view.getInt32(offset + 11, true),
+            color_idx: view.getUint8(offset + 15)
+        };
+        offset += 16;
+    }
+    
+    // Asteroids
+    const asteroidCount = view.getUint16(offset, true); offset += 2;
+    for (let i = 0; i < asteroidCount; i++) {
+        const id = view.getUint32(offset, true);
+        data.asteroids[id] = {
+            id: id,
+            x: position(view.getUint16(offset + 4, true)),
+            y: position(view.getUint16(offset + 6, true)),
+            vx: velocity(view.getInt16(offset + 8, true)),
+            vy: velocity(view.getInt16(offset + 10, true)),
+            tick: view.getUint32(offset + 12, true),
+            angle: view.getUint8(offset + 16) * angleStep,
+            spin: velocity(view.getInt16(offset + 17, true)),
+            level: view.getUint8(offset + 19)
+        };
+        offset += 20;
+    }
+    
+    // Lasers
+    const laserCount = view.getUint16(offset, true); offset += 2;
+    for (let i = 0; i < laserCount; i++) {
+        const id = view.getUint32(offset, true);
+        const owner = roster[view.getUint8(offset + 9)];
+        data.lasers[id] = {
+            id: id,
+            x: position(view.getUint16(offset + 4, true)),
+            y: position(view.getUint16(offset + 6, true)),
+            angle: view.getUint8(offset + 8) * angleStep,
+            player_id: owner ? owner.player_id : null,
+            tick: tick - view.getUint16(offset + 10, true) // Sent as its age in ticks
+        };
+        offset += 12;
+    }
+    
+    // Removed entities
+    const removed = readEntityIds(view, offset);
+    offset = removed.offset;
+    
+    // Scores
+    if (flags & WIRE.FLAG_SCORES) {
+        data.scores = {};
+        const scoreCount = view.getUint8(offset); offset += 1;
+        for (let i = 0; i < scoreCount; i++) {
+            const player = roster[view.getUint8(offset)];
+            if (player) data.scores[player.player_id] = view.getInt32(offset + 1, true);
+            offset += 5;
+        }
+    }
+    
+    const message = {
+        type: 'game_state',
+        tick: tick,
+        keyframe: !!(flags & WIRE.FLAG_KEYFRAME),
+        baseline: baseline === WIRE.NO_BASELINE ? null : baseline,
+        input_seq: lastInputSeq === WIRE.NO_INPUT_SEQ ? null : lastInputSeq,
+        data: data,
+        removed: removed.ids
+    };
+    
+    // Entities that moved into or out of our area of interest
+    if (flags & WIRE.FLAG_AREA_EVENTS) {
+        const entered = readEntityIds(view, offset);
+        const left = readEntityIds(view, entered.offset);
+        message.entered = entered.ids;
+        message.left = left.ids;
+    }
+    
+    return message;
+}
+
+// Read per-section id lists: ships as one-byte net ids, asteroids and lasers as 32-bit ids
+function readEntityIds(view, offset) {
+    const ids = {ships: [], asteroids: [], lasers: []};
+    const shipCount = view.getUint8(offset); offset += 1;
+    for (let i = 0; i < shipCount; i++) {
+        const player = roster[view.getUint8(offset)];
+        if (player) ids.ships.push(player.player_id);
+        offset += 1;
+    }
+    for (const section of ['asteroids', 'lasers']) {
+        const count = view.getUint16(offset, true); offset += 2;
+        for (let i = 0; i < count; i++) {
+            ids[section].push(view.getUint32(offset, true));
+            offset += 4;
+        }
+    }
+    return {ids: ids, offset: offset};
+}
+
+// Shortest signed distance along a wrapping axis of the given size
+function wrapDelta(delta, size) {
+    return delta - size * Math.round(delta / size);
+}
+
+// Wrap a coordinate into [0, size)
+function wrapCoordinate(value, size) {
+    return ((value % size) + size) % size;
+}
+
+// The world position the view is centered on: our ship, or the middle of the arena
+function cameraCenter() {
+    const ourShip = playerId && gameState.ships[playerId];
+    if (ourShip) {
+        return {x: ourShip.x, y: ourShip.y};
+    }
+    return {x: arena.width / 2, y: arena.height / 2};
+}
+
+// Draw an entity at whichever of its wrapped positions is nearest the camera
+function drawInView(entity, camera, draw) {
+    const screenX = canvas.width / 2 + wrapDelta(entity.x - camera.x, arena.width);
+    const screenY = canvas.height / 2 + wrapDelta(entity.y - camera.y, arena.height);
+    ctx.save();
+    ctx.translate(screenX - entity.x, screenY - entity.y);
+    draw(entity);
+    ctx.restore();
+}
+
+// Convert a snapshot into the structure used for rendering
+function snapshotToGameState(snapshot, snapshotTick) {
+    // Copy entities so client-side movement doesn't modify stored baselines
+    const ships = {};
+    for (const id in snapshot.ships) {
+        const ship = Object.assign({}, snapshot.ships[id]);
+        // Let the render loop extrapolate ships between snapshots
+        ship.vx = ship.velocity_x;
+        ship.vy = ship.velocity_y;
+        ships[id] = ship;
+    }
+    
+    // Asteroids arrive as their spawn state; the render loop works out where they are now
+    const tick = estimatedServerTime();
+    const asteroids = Object.values(snapshot.asteroids).map(a => {
+        const asteroid = Object.assign({spawn_x: a.x, spawn_y: a.y}, a);
+        placeAsteroid(asteroid, tick);
+        return asteroid;
+    });
+    
+    return {
+        ships: ships,
+        asteroids: asteroids,
+        lasers: Object.values(snapshot.lasers).map(l => {
+            const laser = Object.assign({}, l);
+            aimLaser(laser, snapshotTick);
+            placeLaser(laser, tick);
+            return laser;
+        }),
+        scores: snapshot.scores,
+        level: snapshot.level
+    };
+}
+
 // Set up keyboard controls
 function setupKeyboardControls() {
     document.addEventListener('keydown', function(e) {
@@ -461,35 +873,215 @@ function setupKeyboardControls() {
 // Function to send control updates to the server
 function sendControlUpdate() {
     if (socket && socket.readyState === WebSocket.OPEN) {
+        if (wireEncoding === 'binary') {
+            sendBinaryControlUpdate();
+            return;
+        }
+        
         // Calculate rotation value (1 = left, -1 = right, 0 = none)
         let rotation = 0;
         if (keys['ArrowLeft'] || keys['a']) rotation += 1;
         if (keys['ArrowRight'] || keys['d']) rotation -= 1;
         
-        const controls = {
-            type: 'input',
-            data: {
-                rotation: rotation,
-                thrust: keys['ArrowUp'] || keys['w'] || false,
-                fire: keys[' '] || keys['f'] || false
-            }
+        const data = {
+            rotation: rotation,
+            thrust: keys['ArrowUp'] || keys['w'] || false,
+            fire: keys[' '] || keys['f'] || false
         };
         
         // Only send if controls have changed
-        const controlsJson = JSON.stringify(controls);
+        const controlsJson = JSON.stringify(data);
         if (controlsJson !== lastControlsJson) {
-            socket.send(controlsJson);
+            const input = queueInput(data.rotation, data.thrust);
+            socket.send(JSON.stringify({type: 'input', seq: input.seq, tick: input.tick, data: data}));
             lastControlsJson = controlsJson;
         }
     }
 }
 
+// Send the controls as a one-byte input bitfield
+function sendBinaryControlUpdate() {
+    let bits = 0;
+    if (keys['ArrowLeft'] || keys['a']) bits |= WIRE.INPUT_LEFT;
+    if (keys['ArrowRight'] || keys['d']) bits |= WIRE.INPUT_RIGHT;
+    if (keys['ArrowUp'] || keys['w']) bits |= WIRE.INPUT_THRUST;
+    if (keys[' '] || keys['f']) bits |= WIRE.INPUT_FIRE;
+    
+    // Only send if controls have changed
+    if (bits !== lastInputBits) {
+        const rotation = ((bits & WIRE.INPUT_LEFT) ? 1 : 0) - ((bits & WIRE.INPUT_RIGHT) ? 1 : 0);
+        const input = queueInput(rotation, !!(bits & WIRE.INPUT_THRUST));
+        
+        const view = new DataView(new ArrayBuffer(10));
+        view.setUint8(0, WIRE.MSG_INPUT);
+        view.setUint8(1, bits);
+        view.setUint32(2, input.seq, true);
+        view.setUint32(6, input.tick, true);
+        socket.send(view.buffer);
+        lastInputBits = bits;
+    }
+}
+
+// Our best guess at the server's current tick, including the fraction of the next one
+function estimatedServerTime() {
+    return tickClock.tick + (Date.now() - tickClock.time) / 1000 * simulationRate;
+}
+
+// Our best guess at the server's current tick
+function estimatedServerTick() {
+    return Math.floor(estimatedServerTime());
+}
+
+// The tick our predicted ship is simulated up to
+function predictionTargetTick() {
+    return estimatedServerTick() + INPUT_LEAD_TICKS;
+}
+
+// Number a new input and keep it until the server confirms it applied it
+function queueInput(rotation, thrust) {
+    inputSeq += 1;
+    const input = {seq: inputSeq, tick: predictionTargetTick() + 1, rotation: rotation, thrust: thrust};
+    pendingInputs.push(input);
+    return input;
+}
+
+// Advance a ship by one server tick (mirrors ShipModel.update)
+function stepShip(ship) {
+    if (ship.rotation !== 0) {
+        ship.angle = ((ship.angle + ship.rotation * SHIP_PHYSICS.rotationSpeed) % 360 + 360) % 360;
+    }
+    
+    if (ship.thrust) {
+        const angleRad = ship.angle * Math.PI / 180;
+        ship.velocity_x += Math.cos(angleRad) * SHIP_PHYSICS.acceleration;
+        ship.velocity_y -= Math.sin(angleRad) * SHIP_PHYSICS.acceleration;
+        
+        const speed = Math.hypot(ship.velocity_x, ship.velocity_y);
+        if (speed > SHIP_PHYSICS.maxSpeed) {
+            ship.velocity_x *= SHIP_PHYSICS.maxSpeed / speed;
+            ship.velocity_y *= SHIP_PHYSICS.maxSpeed / speed;
+        }
+    }
+    
+    ship.velocity_x *= SHIP_PHYSICS.friction;
+    ship.velocity_y *= SHIP_PHYSICS.friction;
+    if (Math.hypot(ship.velocity_x, ship.velocity_y) < SHIP_PHYSICS.stopSpeed) {
+        ship.velocity_x = 0;
+        ship.velocity_y = 0;
+    }
+    
+    ship.x = wrapCoordinate(ship.x + ship.velocity_x, arena.width);
+    ship.y = wrapCoordinate(ship.y + ship.velocity_y, arena.height);
+}
+
+// Restart prediction from the server's state of our ship at a snapshot tick
+function reconcile(tick, lastAppliedSeq) {
+    const serverShip = playerId && gameState.ships[playerId];
+    if (!serverShip) {
+        predictedShip = null;
+        return;
+    }
+    
+    // Inputs the server has applied are already part of its state
+    if (lastAppliedSeq !== null && lastAppliedSeq !== undefined) {
+        pendingInputs = pendingInputs.filter(input => input.seq > lastAppliedSeq);
+    }
+    
+    predictedShip = {
+        x: serverShip.x,
+        y: serverShip.y,
+        angle: serverShip.angle,
+        velocity_x: serverShip.velocity_x,
+        velocity_y: serverShip.velocity_y,
+        rotation: serverShip.rotation_direction,
+        thrust: serverShip.thrusting
+    };
+    predictedTick = tick;
+    predictedInputIndex = 0;
+    advancePrediction();
+}
+
+// Simulate our ship forward to the prediction tick, replaying pending inputs as their ticks come up
+function advancePrediction() {
+    if (!predictedShip) return;
+    
+    const target = predictionTargetTick();
+    let steps = 0;
+    while (predictedTick < target && steps < MAX_PREDICTION_STEPS) {
+        predictedTick += 1;
+        steps += 1;
+        while (predictedInputIndex < pendingInputs.length && pendingInputs[predictedInputIndex].tick <= predictedTick) {
+            const input = pendingInputs[predictedInputIndex];
+            predictedShip.rotation = input.rotation;
+            predictedShip.thrust = input.thrust;
+            predictedInputIndex += 1;
+        }
+        stepShip(predictedShip);
+    }
+    
+    // After a long stall (e.g. a background tab), snap to the present
+    predictedTick = Math.max(predictedTick, target);
+}
+
+// Draw our own ship where prediction puts it rather than where the last snapshot did
+function applyPrediction() {
+    const ourShip = playerId && gameState.ships[playerId];
+    if (!ourShip || !predictedShip) return;
+    
+    advancePrediction();
+    ourShip.x = predictedShip.x;
+    ourShip.y = predictedShip.y;
+    ourShip.angle = predictedShip.angle;
+    ourShip.thrusting = predictedShip.thrust;
+    ourShip.rotation_direction = predictedShip.rotation;
+    ourShip.vx = 0;
+    ourShip.vy = 0;
+}
+
 // Clear the screen
 function clearScreen() {
     ctx.fillStyle = 'black';
     ctx.fillRect(0, 0, canvas.width, canvas.height);
 }
 
+// Move an asteroid to where its spawn state puts it at a (fractional) server tick
+// Asteroids never change course, so this matches EntityStore.extrapolate on the server
+function placeAsteroid(asteroid, tick) {
+    const steps = (tick - asteroid.tick) * 60 / simulationRate; // Velocities are per 1/60s step
+    asteroid.x = wrapCoordinate(asteroid.spawn_x + asteroid.vx * steps, arena.width);
+    asteroid.y = wrapCoordinate(asteroid.spawn_y + asteroid.vy * steps, arena.height);
+    asteroid.rotation = (asteroid.angle + asteroid.spin * steps) * Math.PI / 180;
+}
+
+// Lasers fly in a straight line too. Work back from where a snapshot saw one to
+// where that line starts at the tick it was fired, so it can be placed like an asteroid
+function aimLaser(laser, snapshotTick) {
+    const angleRad = laser.angle * Math.PI / 180;
+    laser.vx = LASER_SPEED * Math.cos(angleRad);
+    laser.vy = -LASER_SPEED * Math.sin(angleRad);
+    const steps = (snapshotTick - laser.tick) * 60 / simulationRate;
+    laser.spawn_x = laser.x - laser.vx * steps;
+    laser.spawn_y = laser.y - laser.vy * steps;
+}
+
+// Move a laser to where it is at a (fractional) server tick
+function placeLaser(laser, tick) {
+    const steps = (tick - laser.tick) * 60 / simulationRate;
+    laser.x = wrapCoordinate(laser.spawn_x + laser.vx * steps, arena.width);
+    laser.y = wrapCoordinate(laser.spawn_y + laser.vy * steps, arena.height);
+}
+
+// Jagged outline of an asteroid, derived from its id so it keeps its shape between snapshots
+function asteroidVertices(id) {
+    const vertices = [];
+    let seed = Math.imul(id, 2654435761) >>> 0;
+    for (let i = 0; i < 8; i++) {
+        seed = (Math.imul(seed, 1664525) + 1013904223) >>> 0;
+        vertices.push(0.8 + (seed / 4294967296) * 0.4);
+    }
+    return vertices;
+}
+
 // Draw an asteroid
 function drawAsteroid(asteroid) {
     const x = asteroid.x;
@@ -500,24 +1092,7 @@ function drawAsteroid(asteroid) {
     
     // Create vertices if not present
     if (!asteroid.vertices) {
-        asteroid.vertices = Array(8).fill(0).map(() => 0.8 + Math.random() * 0.4);
-        asteroid.rotation = 0;
-        asteroid.rotationSpeed = (Math.random() - 0.5) * 0.02; // Add rotation speed
-    }
-    
-    // Update rotation based on rotation speed
-    asteroid.rotation += asteroid.rotationSpeed;
-    
-    // FIXED: Update position based on velocity if available
-    if (asteroid.vx !== undefined && asteroid.vy !== undefined) {
-        asteroid.x += asteroid.vx;
-        asteroid.y += asteroid.vy;
-        
-        // Wrap around screen edges
-        if (asteroid.x < 0) asteroid.x = canvas.width;
-        if (asteroid.x > canvas.width) asteroid.x = 0;
-        if (asteroid.y < 0) asteroid.y = canvas.height;
-        if (asteroid.y > canvas.height) asteroid.y = 0;
+        asteroid.vertices = asteroidVertices(asteroid.id);
     }
     
     // Draw the asteroid
@@ -645,14 +1220,15 @@ function drawShip(ship) {
 function drawScoreboard() {
     if (!gameState) return;
     
-    // Sort players by score
+    // Sort players by score (from the roster, since ships outside our view aren't in the game state)
     const players = [];
-    for (const id in gameState.ships) {
+    for (const netId in roster) {
+        const player = roster[netId];
         players.push({
-            id: id,
-            name: gameState.ships[id].player_name || `Player ${id}`,
-            score: gameState.scores && gameState.scores[id] || 0,
-            color_idx: gameState.ships[id].color_idx
+            id: player.player_id,
+            name: player.player_name || `Player ${netId}`,
+            score: gameState.scores && gameState.scores[player.player_id] || 0,
+            color_idx: player.color_idx
         });
     }
     
@@ -1168,12 +1744,15 @@ function playSound(name, volume = 1.0) {
 // Update the game loop to handle sound effects
 function updateGameLoop() {
     // Play laser sounds when others fire
+    let newestLaserTick = lastLaserSoundTick;
     for (const laser of gameState.lasers) {
         // Check if this is a new laser
-        if (laser.created > lastUpdateTime / 1000) {
+        if (laser.tick > lastLaserSoundTick) {
             playSound('laser', 0.2);
+            newestLaserTick = Math.max(newestLaserTick, laser.tick);
         }
     }
+    lastLaserSoundTick = newestLaserTick;
     
     // Play thrust sound if our ship is thrusting
     const ourShip = playerId && gameState.ships[playerId];
@@ -1202,23 +1781,27 @@ function gameLoop() {
         
         // FIXED: Update all positions between server updates for smoother movement
         updateGameObjects(dt);
+        applyPrediction();
     }
     
     // Draw game objects
     if (gameState) {
+        // The view follows our ship around the arena
+        const camera = cameraCenter();
+        
         // Draw all asteroids
         for (const asteroid of gameState.asteroids) {
-            drawAsteroid(asteroid);
+            drawInView(asteroid, camera, drawAsteroid);
         }
         
         // Draw all lasers
         for (const laser of gameState.lasers) {
-            drawLaser(laser);
+            drawInView(laser, camera, drawLaser);
         }
         
         // Draw all ships
         for (const id in gameState.ships) {
-            drawShip(gameState.ships[id]);
+            drawInView(gameState.ships[id], camera, drawShip);
         }
         
         // Draw the scoreboard
@@ -1237,26 +1820,15 @@ function gameLoop() {
 
 // ADDED: Function to update all game objects positions between server updates
 function updateGameObjects(dt) {
-    // Update asteroid positions
+    // Dead-reckon asteroids from their spawn state
+    const tick = estimatedServerTime();
     for (const asteroid of gameState.asteroids) {
-        if (asteroid.vx !== undefined && asteroid.vy !== undefined) {
-            asteroid.x += asteroid.vx * dt * 60; // Scale by dt for smooth movement
-            asteroid.y += asteroid.vy * dt * 60;
-            
-            // Wrap around screen edges
-            if (asteroid.x < 0) asteroid.x = canvas.width;
-            if (asteroid.x > canvas.width) asteroid.x = 0;
-            if (asteroid.y < 0) asteroid.y = canvas.height;
-            if (asteroid.y > canvas.height) asteroid.y = 0;
-        }
+        placeAsteroid(asteroid, tick);
     }
     
-    // Update laser positions
+    // Dead-reckon lasers from where they were fired
     for (const laser of gameState.lasers) {
-        if (laser.vx !== undefined && laser.vy !== undefined) {
-            laser.x += laser.vx * dt * 60;
-            laser.y += laser.vy * dt * 60;
-        }
+        placeLaser(laser, tick);
     }
     
     // Update ship positions
@@ -1266,11 +1838,9 @@ function updateGameObjects(dt) {
             ship.x += ship.vx * dt * 60;
             ship.y += ship.vy * dt * 60;
             
-            // Wrap around screen edges
-            if (ship.x < 0) ship.x = canvas.width;
-            if (ship.x > canvas.width) ship.x = 0;
-            if (ship.y < 0) ship.y = canvas.height;
-            if (ship.y > canvas.height) ship.y = 0;
+            // Wrap around arena edges
+            ship.x = wrapCoordinate(ship.x, arena.width);
+            ship.y = wrapCoordinate(ship.y, arena.height);
         }
     }
 }
@@ -1291,12 +1861,6 @@ function drawLaser(laser) {
         }
     }
     
-    // Update laser position based on velocity if available
-    if (laser.vx !== undefined && laser.vy !== undefined) {
-        laser.x += laser.vx;
-        laser.y += laser.vy;
-    }
-    
     // Calculate the front of the laser
     // Convert angle from degrees to radians if needed
     let angle = laser.angle || 0;
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from websockets.exceptions import ConnectionClosed
+
+logger = logging.getLogger("asteroids_server")
+
+# Backpressure policy
+BACKLOG_DISCONNECT_TIME = 5.0  # Seconds a client may keep dropping snapshots before we disconnect it
+MAX_RELIABLE_BACKLOG = 256  # Queued reliable messages before we disconnect the client
+
+
+class ClientConnection:
+    """Outbound side of one client socket: a latest-snapshot slot and a reliable queue, drained by its own writer task"""
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.snapshot = None  # Latest unsent snapshot
+        self.reliable = deque()  # Unsent reliable messages, in order
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.closing = False
+
+        # Backpressure tracking
+        self.backlogged_since = None
+        self.dropped_snapshots = 0
+
+        # Traffic actually written to the socket
+        self.messages_sent = 0
+        self.bytes_sent = 0
+
+    def start(self):
+        """Start the writer task"""
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the writer task"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    def send_snapshot(self, data):
+        """Offer a snapshot, replacing any unsent one"""
+        if self.closing:
+            return
+
+        if self.snapshot is not None:
+            # The previous snapshot never made it out, so this client is falling behind
+            self.dropped_snapshots += 1
+            now = time.monotonic()
+            if self.backlogged_since is None:
+                self.backlogged_since = now
+            elif now - self.backlogged_since > BACKLOG_DISCONNECT_TIME:
+                self.disconnect(f"backlogged for over {BACKLOG_DISCONNECT_TIME}s")
+                return
+
+        self.snapshot = data
+        self.wakeup.set()
+
+    def send_reliable(self, data):
+        """Queue a message that must be delivered"""
+        if self.closing:
+            return
+
+        if len(self.reliable) >= MAX_RELIABLE_BACKLOG:
+            self.disconnect(f"over {MAX_RELIABLE_BACKLOG} reliable messages queued")
+            return
+
+        self.reliable.append(data)
+        self.wakeup.set()
+
+    def disconnect(self, reason, close_reason="Client too slow"):
+        """Close the socket in the background; the handler cleans up when it ends"""
+        if self.closing:
+            return
+        self.closing = True
+        self.snapshot = None
+        self.reliable.clear()
+
+        logger.warning(f"Disconnecting {self.websocket.remote_address}: {reason}")
+        asyncio.create_task(self.websocket.close(code=1008, reason=close_reason))
+
+    async def run(self):
+        """Writer loop: drain reliable messages first, then the latest snapshot"""
+        try:
+            while not self.closing:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+
+                while self.reliable and not self.closing:
+                    data = self.reliable.popleft()
+                    await self.websocket.send(data)
+                    self.messages_sent += 1
+                    self.bytes_sent += len(data)
+
+                if self.snapshot is not None:
+                    data, self.snapshot = self.snapshot, None
+                    await self.websocket.send(data)
+                    self.messages_sent += 1
+                    self.bytes_sent += len(data)
+
+                # Caught up with the game loop again
+                if self.snapshot is None:
+                    self.backlogged_since = None
+        except ConnectionClosed:
+            pass
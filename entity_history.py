@@ -0,0 +1,75 @@
+import numpy as np
+
+from spatial_hash import SpatialHash
+
+DEFAULT_DEPTH = 16  # Ticks of history kept
+
+
+class PositionHistory:
+    """Fixed-size ring of past entity positions, used to rewind hit tests to what a player saw"""
+    # Frame for tick t lives in slot t % depth. Each slot holds compact copies
+    # of the ids, positions and radii at that tick, and a broadphase grid over
+    # their indexes: either one the caller already built for that tick, or one
+    # built the first time something rewinds to the frame.
+    def __init__(self, depth=DEFAULT_DEPTH, capacity=64, wrap=None):
+        self.depth = depth
+        self.capacity = capacity
+        self.wrap = wrap
+        self.ticks = np.full(depth, -1, dtype=np.int64)
+        self.counts = np.zeros(depth, dtype=np.int32)
+        self.ids = np.zeros((depth, capacity), dtype=np.uint32)
+        self.x = np.zeros((depth, capacity), dtype=np.float32)
+        self.y = np.zeros((depth, capacity), dtype=np.float32)
+        self.radius = np.zeros((depth, capacity), dtype=np.float32)
+        self.grids = [None] * depth
+
+    def grow(self, needed):
+        """Widen every slot to hold at least `needed` entities"""
+        while self.capacity < needed:
+            self.capacity *= 2
+        for name in ("ids", "x", "y", "radius"):
+            column = getattr(self, name)
+            grown = np.zeros((self.depth, self.capacity), dtype=column.dtype)
+            grown[:, :column.shape[1]] = column
+            setattr(self, name, grown)
+
+    def record(self, tick, ids, x, y, radius, grid=None):
+        """Store the positions at a tick, overwriting the frame from `depth` ticks ago"""
+        # A grid passed in must index these entities in order; items it gains
+        # later with higher indexes are ignored by callers checking the count
+        n = len(ids)
+        if n > self.capacity:
+            self.grow(n)
+
+        slot = tick % self.depth
+        self.ticks[slot] = tick
+        self.counts[slot] = n
+        self.ids[slot, :n] = ids
+        self.x[slot, :n] = x
+        self.y[slot, :n] = y
+        self.radius[slot, :n] = radius
+        self.grids[slot] = grid
+
+    def frame(self, tick):
+        """Get (ids, x, y, radius) arrays for a tick, or None if it is no longer kept"""
+        slot = tick % self.depth
+        if self.ticks[slot] != tick:
+            return None
+        n = self.counts[slot]
+        return self.ids[slot, :n], self.x[slot, :n], self.y[slot, :n], self.radius[slot, :n]
+
+    def grid(self, tick):
+        """Get a broadphase grid over the frame indexes of a tick, building it on first use"""
+        slot = tick % self.depth
+        if self.ticks[slot] != tick:
+            return None
+
+        if self.grids[slot] is None:
+            grid = SpatialHash(wrap=self.wrap)
+            n = self.counts[slot]
+            for index, (x, y, radius) in enumerate(zip(
+                self.x[slot, :n].tolist(), self.y[slot, :n].tolist(), self.radius[slot, :n].tolist()
+            )):
+                grid.insert(index, x, y, radius)
+            self.grids[slot] = grid
+        return self.grids[slot]
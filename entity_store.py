@@ -0,0 +1,151 @@
+import numpy as np
+
+NO_OWNER = -1
+
+# Column name -> dtype
+COLUMNS = {
+    "id": np.int64,
+    "x": np.float64,
+    "y": np.float64,
+    "vx": np.float64,
+    "vy": np.float64,
+    "angle": np.float64,
+    "level": np.int8,
+    "owner": np.int16,  # Network id of the owning player, or NO_OWNER
+    "rewind": np.int16,  # Ticks of lag compensation applied to a laser's hit tests
+    "spin": np.float64,  # Degrees of rotation per step
+    "spawn_x": np.float64,  # Position at spawn_tick, which positions are extrapolated from
+    "spawn_y": np.float64,
+    "spawn_tick": np.int64,  # Also what lifetimes are counted from
+}
+
+
+class EntityStore:
+    """Struct-of-arrays storage for simple moving entities (asteroids, lasers)"""
+    # Entity i lives at index i of every column, for i < count. Indexes are
+    # stable while entities are only added; removals swap tail entities into
+    # the freed slots.
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.capacity = capacity
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def __len__(self):
+        return self.count
+
+    def grow(self):
+        """Double the capacity of every column"""
+        self.capacity *= 2
+        for name in COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            setattr(self, name, grown)
+
+    def add(self, entity_id, x, y, vx=0.0, vy=0.0, angle=0.0, level=0, owner=NO_OWNER, rewind=0,
+            spin=0.0, spawn_tick=0):
+        """Append an entity and return its index"""
+        if self.count == self.capacity:
+            self.grow()
+
+        index = self.count
+        self.id[index] = entity_id
+        self.x[index] = x
+        self.y[index] = y
+        self.vx[index] = vx
+        self.vy[index] = vy
+        self.angle[index] = angle
+        self.level[index] = level
+        self.owner[index] = owner
+        self.rewind[index] = rewind
+        self.spin[index] = spin
+        self.spawn_x[index] = x
+        self.spawn_y[index] = y
+        self.spawn_tick[index] = spawn_tick
+        self.count += 1
+        return index
+
+    def compact(self, keep):
+        """Remove every entity whose entry in the boolean keep mask is False"""
+        # Survivors from the tail are swapped into the holes at the front,
+        # so this moves only as many entities as were removed
+        keep = keep[:self.count]
+        new_count = int(np.count_nonzero(keep))
+        if new_count == self.count:
+            return
+
+        holes = np.flatnonzero(~keep[:new_count])
+        movers = np.flatnonzero(keep[new_count:]) + new_count
+        if len(holes):
+            for name in COLUMNS:
+                column = getattr(self, name)
+                column[holes] = column[movers]
+        self.count = new_count
+
+    def integrate(self, scale=1.0):
+        """Move every entity by its velocity"""
+        n = self.count
+        self.x[:n] += self.vx[:n] * scale
+        self.y[:n] += self.vy[:n] * scale
+
+    def extrapolate(self, tick, scale, width, height):
+        """Set positions from spawn state, for entities moving at constant velocity on a wrapping world"""
+        # Computed in closed form, the same way clients dead-reckon from the
+        # spawn parameters, rather than accumulated step by step
+        n = self.count
+        elapsed = (tick - self.spawn_tick[:n]) * scale
+        np.mod(self.spawn_x[:n] + self.vx[:n] * elapsed, width, out=self.x[:n])
+        np.mod(self.spawn_y[:n] + self.vy[:n] * elapsed, height, out=self.y[:n])
+
+    def wrap(self, width, height):
+        """Wrap positions onto a toroidal world of the given size"""
+        n = self.count
+        np.mod(self.x[:n], width, out=self.x[:n])
+        np.mod(self.y[:n], height, out=self.y[:n])
+
+    def count_owned(self, owner):
+        """Count the entities owned by one player"""
+        return int(np.count_nonzero(self.owner[:self.count] == owner))
+
+    def alive_at(self, tick, lifetime):
+        """Get a boolean mask of entities spawned less than lifetime ticks ago"""
+        return tick - self.spawn_tick[:self.count] < lifetime
+
+    def columns(self, *names):
+        """Get the live part of the named columns as Python lists"""
+        return [getattr(self, name)[:self.count].tolist() for name in names]
+
+    def state(self):
+        """Get every column's live values as Python lists, for a lockstep checkpoint"""
+        return {name: getattr(self, name)[:self.count].tolist() for name in COLUMNS}
+
+    def load(self, state):
+        """Replace every entity with those of a state()"""
+        self.count = 0
+        count = len(state["id"])
+        while self.capacity < count:
+            self.grow()
+        for name in COLUMNS:
+            getattr(self, name)[:count] = state[name]
+        self.count = count
+
+    def serialize(self, fields, previous=None):
+        """Build {id: {field: column value}} for every entity, reading straight from the columns"""
+        # For entities that never change once added, pass the previous result:
+        # entities already in it keep their dicts, and only new ones are built
+        names = list(fields)
+        if previous is None:
+            values = self.columns("id", *fields.values())
+            return {
+                row[0]: dict(zip(names, row[1:]))
+                for row in zip(*values)
+            }
+
+        ids = self.id[:self.count].tolist()
+        new = [index for index, entity_id in enumerate(ids) if entity_id not in previous]
+        built = {}
+        if new:
+            values = [getattr(self, column)[new].tolist() for column in fields.values()]
+            built = {ids[index]: dict(zip(names, row)) for index, row in zip(new, zip(*values))}
+        return {entity_id: previous.get(entity_id) or built[entity_id] for entity_id in ids}
@@ -0,0 +1,42 @@
+from collections import deque
+
+# Input buffering limits
+MAX_QUEUED_INPUTS = 64  # Inputs held per player before the oldest are applied early to make room
+MAX_INPUT_LEAD = 30  # Furthest into the future (in ticks) an input may be scheduled
+
+
+class InputQueue:
+    """One player's inputs, held until the tick they target and applied in sequence order"""
+    def __init__(self):
+        self.pending = deque()  # (target_tick, seq, inputs, view_tick), in arrival order
+        self.last_received_seq = None
+        self.last_applied_seq = None  # Echoed back in snapshots so the client can reconcile
+
+    def push(self, seq, target_tick, inputs, current_tick, view_tick=None):
+        """Queue an input for the tick it targets, or False if it is a duplicate (view_tick: the tick the player was looking at)"""
+        if seq is not None:
+            if self.last_received_seq is not None and seq <= self.last_received_seq:
+                return False
+            self.last_received_seq = seq
+
+        # Late inputs go into the next tick; inputs too far ahead are pulled in
+        if not isinstance(target_tick, int):
+            target_tick = current_tick + 1
+        target_tick = min(max(target_tick, current_tick + 1), current_tick + MAX_INPUT_LEAD)
+
+        # Keep sequence order even if the client's tick estimate moved backwards
+        if self.pending and target_tick < self.pending[-1][0]:
+            target_tick = self.pending[-1][0]
+
+        self.pending.append((target_tick, seq, inputs, view_tick))
+        return True
+
+    def pop_due(self, tick):
+        """Remove and return the (inputs, view_tick) pairs due at or before a tick, oldest first"""
+        due = []
+        while self.pending and (self.pending[0][0] <= tick or len(self.pending) > MAX_QUEUED_INPUTS):
+            _, seq, inputs, view_tick = self.pending.popleft()
+            if seq is not None:
+                self.last_applied_seq = seq
+            due.append((inputs, view_tick))
+        return due
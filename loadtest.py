@@ -0,0 +1,332 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import websockets
+from websockets.exceptions import WebSocketException
+
+from match_log import read_match, RECORD_TICK_COST
+from wire import (
+    ENCODING_JSON, ENCODING_BINARY, MSG_SNAPSHOT, MSG_INPUT, MSG_ACK,
+    INPUT_LEFT, INPUT_RIGHT, INPUT_THRUST, INPUT_FIRE, HEADER, INPUT_MESSAGE, ACK_MESSAGE,
+)
+
+SERVER_URL = "ws://localhost:8081"
+STARTUP_TIMEOUT = 15  # Seconds to wait for a freshly started server to accept connections
+CONNECT_SPREAD = 1.0  # Seconds over which a stage's bots connect, so they don't all join at once
+PROBE_INTERVAL = 0.1  # Seconds between event loop lag probes
+RSS_INTERVAL = 1.0  # Seconds between memory samples
+INPUT_LEAD_TICKS = 3  # How far ahead of the server bots aim their inputs (like client.js)
+SATURATED_LAG = 0.05  # Load generator loop lag above which its own numbers can't be trusted
+
+
+class Bot:
+    """A fake player that joins, acknowledges snapshots and mashes the controls like a person"""
+    def __init__(self, index, encoding, rng):
+        self.index = index
+        self.encoding = encoding
+        self.rng = rng
+        self.bytes_received = 0
+        self.snapshot_sizes = []
+        self.inputs_sent = 0
+        self.connected_at = None
+        self.disconnected_at = None
+        self.error = None
+        self.server_tick = 0  # Server tick and our clock time when we last heard it
+        self.server_tick_time = 0.0
+        self.simulation_rate = 60
+        self.seq = 0
+
+    def estimated_tick(self):
+        """Guess the server's current tick from the last one we heard"""
+        return self.server_tick + int((time.monotonic() - self.server_tick_time) * self.simulation_rate)
+
+    async def run(self, stop):
+        """Play until stop is set"""
+        try:
+            async with websockets.connect(SERVER_URL, max_size=None) as websocket:
+                self.connected_at = time.monotonic()
+                await websocket.send(json.dumps({
+                    "type": "join",
+                    "player_name": f"bot-{self.index}",
+                    "encoding": self.encoding,
+                }))
+                reader = asyncio.create_task(self.read(websocket))
+                try:
+                    await self.play(websocket, stop)
+                finally:
+                    reader.cancel()
+                self.disconnected_at = time.monotonic()
+        except (OSError, WebSocketException) as e:
+            self.error = e
+            self.disconnected_at = time.monotonic()
+
+    async def read(self, websocket):
+        """Count everything received and acknowledge every snapshot"""
+        async for message in websocket:
+            self.bytes_received += len(message)
+            if isinstance(message, bytes):
+                if message[0] == MSG_SNAPSHOT:
+                    _, tick, *_ = HEADER.unpack_from(message)
+                    self.snapshot_sizes.append(len(message))
+                    self.heard_tick(tick)
+                    await websocket.send(ACK_MESSAGE.pack(MSG_ACK, tick))
+                continue
+
+            data = json.loads(message)
+            if data.get("type") == "game_state":
+                self.snapshot_sizes.append(len(message))
+                self.heard_tick(data["tick"])
+                await websocket.send(json.dumps({"type": "ack", "tick": data["tick"]}))
+            elif data.get("type") == "welcome":
+                self.simulation_rate = data["simulation_rate"]
+                self.heard_tick(data["tick"])
+
+    def heard_tick(self, tick):
+        """Resynchronise our estimate of the server tick"""
+        if tick >= self.estimated_tick():
+            self.server_tick = tick
+            self.server_tick_time = time.monotonic()
+
+    async def play(self, websocket, stop):
+        """Change the controls every so often, with bursts of fire"""
+        rotation = 0
+        thrust = False
+        while not stop.is_set():
+            # Hold a turn or thrust for a while, like someone lining up a shot
+            if self.rng.random() < 0.3:
+                rotation = self.rng.choice((-1, 0, 0, 1))
+            if self.rng.random() < 0.2:
+                thrust = not thrust
+            # Tap fire (one laser per press, as in the browser client)
+            fire = self.rng.random() < 0.5
+            await self.send_input(websocket, rotation, thrust, fire)
+            if fire:
+                await asyncio.sleep(self.rng.uniform(0.05, 0.1))
+                await self.send_input(websocket, rotation, thrust, False)
+
+            try:
+                await asyncio.wait_for(stop.wait(), self.rng.uniform(0.1, 0.5))
+            except asyncio.TimeoutError:
+                pass
+
+    async def send_input(self, websocket, rotation, thrust, fire):
+        """Send one sequenced input aimed a few ticks ahead of the server"""
+        self.seq += 1
+        self.inputs_sent += 1
+        tick = self.estimated_tick() + INPUT_LEAD_TICKS
+        if self.encoding == ENCODING_BINARY:
+            bits = (INPUT_LEFT if rotation > 0 else 0) | (INPUT_RIGHT if rotation < 0 else 0)
+            bits |= (INPUT_THRUST if thrust else 0) | (INPUT_FIRE if fire else 0)
+            await websocket.send(INPUT_MESSAGE.pack(MSG_INPUT, bits, self.seq, tick))
+        else:
+            await websocket.send(json.dumps({
+                "type": "input",
+                "seq": self.seq,
+                "tick": tick,
+                "data": {"rotation": rotation, "thrust": thrust, "fire": fire},
+            }))
+
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of a process and its direct children (the room workers), from /proc"""
+    pids = [pid]
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid is the second field after the parenthesised command name
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    pids.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    total = 0
+    for child in pids:
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+async def probe_loop_lag(stop, samples):
+    """Measure the server's event loop lag as the ping round trip of a connection that never joins"""
+    # The server answers pings from its event loop, so on localhost the
+    # round trip is almost entirely the time the loop was busy elsewhere
+    async with websockets.connect(SERVER_URL) as websocket:
+        while not stop.is_set():
+            pong = await websocket.ping()
+            samples.append(await pong)
+            await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def measure_own_lag(stop, samples):
+    """Measure the load generator's own event loop lag, to flag when it is the bottleneck"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(loop.time() - started - PROBE_INTERVAL)
+
+
+async def sample_rss(stop, pid, samples):
+    """Record the server's memory use once per RSS_INTERVAL"""
+    while not stop.is_set():
+        samples.append(process_tree_rss(pid))
+        await asyncio.sleep(RSS_INTERVAL)
+
+
+async def wait_for_server(process):
+    """Wait until a freshly started server accepts WebSocket connections"""
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} during startup")
+        try:
+            async with websockets.connect(SERVER_URL):
+                return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start in time")
+
+
+def percentiles(values, scale=1.0):
+    """Get (p50, p95, p99) of a list, or NaNs if it is empty"""
+    if not len(values):
+        return (float("nan"),) * 3
+    return tuple(np.percentile(np.asarray(values) * scale, [50, 95, 99]))
+
+
+async def run_stage(players, args, seed):
+    """Start a fresh server, load it with a number of bots and collect its measurements"""
+    with tempfile.TemporaryDirectory(prefix="asteroids-load-") as record_dir:
+        command = [sys.executable, "server.py", "--workers", str(args.workers), "--record", record_dir]
+        log = open(os.path.join(record_dir, "server.log"), "w")
+        process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   stdout=log, stderr=subprocess.STDOUT)
+        try:
+            await wait_for_server(process)
+
+            rng = random.Random(seed)
+            stop = asyncio.Event()
+            encodings = {
+                "json": [ENCODING_JSON],
+                "binary": [ENCODING_BINARY],
+                "mixed": [ENCODING_JSON, ENCODING_BINARY],
+            }[args.encoding]
+            bots = [Bot(index, encodings[index % len(encodings)], random.Random(rng.random()))
+                    for index in range(players)]
+
+            server_lag, own_lag, rss = [], [], []
+            monitors = [
+                asyncio.create_task(probe_loop_lag(stop, server_lag)),
+                asyncio.create_task(measure_own_lag(stop, own_lag)),
+                asyncio.create_task(sample_rss(stop, process.pid, rss)),
+            ]
+
+            # Connect the bots gradually, then let them play
+            tasks = []
+            for bot in bots:
+                tasks.append(asyncio.create_task(bot.run(stop)))
+                await asyncio.sleep(CONNECT_SPREAD / players)
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks, *monitors, return_exceptions=True)
+
+            # Give empty rooms a moment to close (which flushes their logs), then shut down
+            await asyncio.sleep(1.0)
+            process.send_signal(signal.SIGINT)
+            process.wait(timeout=10)
+
+            tick_costs = []
+            for name in os.listdir(record_dir):
+                if name.endswith(".rec"):
+                    tick_costs.extend(fields for kind, fields in read_match(os.path.join(record_dir, name))
+                                      if kind == RECORD_TICK_COST)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            log.close()
+
+    errors = [bot.error for bot in bots if bot.error]
+    rates = [
+        bot.bytes_received / (bot.disconnected_at - bot.connected_at)
+        for bot in bots if bot.connected_at and bot.disconnected_at and bot.disconnected_at > bot.connected_at
+    ]
+    sizes = [size for bot in bots for size in bot.snapshot_sizes]
+    return {
+        "players": players,
+        "errors": len(errors),
+        "first_error": repr(errors[0]) if errors else None,
+        "ticks": len(tick_costs),
+        "tick_ms": percentiles(tick_costs, 1000),
+        "tick_ms_max": max(tick_costs) * 1000 if tick_costs else float("nan"),
+        "bytes_per_client": float(np.mean(rates)) if rates else float("nan"),
+        "snapshot_bytes": float(np.mean(sizes)) if sizes else float("nan"),
+        "snapshot_bytes_p95": percentiles(sizes)[1],
+        "loop_lag_ms": percentiles(server_lag, 1000),
+        "rss_mb": max(rss) / 2 ** 20 if rss else float("nan"),
+        "generator_lag_ms": max(own_lag) * 1000 if own_lag else 0.0,
+    }
+
+
+def print_report(results):
+    """Print one row per stage"""
+    print(f"{'players':>7} {'tick ms p50/p95/p99':>21} {'max':>7} {'KB/s/client':>11} "
+          f"{'snap B avg/p95':>15} {'loop lag ms p50/p99':>20} {'RSS MB':>7} {'errors':>6}")
+    for result in results:
+        tick = "/".join(f"{value:.2f}" for value in result["tick_ms"])
+        snapshot = f"{result['snapshot_bytes']:.0f}/{result['snapshot_bytes_p95']:.0f}"
+        lag_p50, _, lag_p99 = result["loop_lag_ms"]
+        print(f"{result['players']:>7} {tick:>21} {result['tick_ms_max']:>7.2f} "
+              f"{result['bytes_per_client'] / 1024:>11.1f} {snapshot:>15} "
+              f"{f'{lag_p50:.2f}/{lag_p99:.2f}':>20} {result['rss_mb']:>7.1f} {result['errors']:>6}")
+
+    for result in results:
+        if result["first_error"]:
+            print(f"{result['players']} players: {result['errors']} bots failed, e.g. {result['first_error']}")
+        if result["generator_lag_ms"] > SATURATED_LAG * 1000:
+            print(f"{result['players']} players: the load generator itself lagged by up to "
+                  f"{result['generator_lag_ms']:.0f} ms, so client-side numbers may be understated")
+
+
+async def main(args):
+    results = []
+    for stage, players in enumerate(args.players):
+        print(f"Running {players} bots for {args.duration:.0f}s...", file=sys.stderr)
+        results.append(await run_stage(players, args, args.seed + stage))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Start server.py locally, load it with bot players and report how it holds up")
+    parser.add_argument("--players", default="1,4,8,16,32",
+                        help="Comma-separated bot counts, one stage (and fresh server) each")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds each stage runs for")
+    parser.add_argument("--workers", type=int, default=0, help="Passed on to server.py --workers")
+    parser.add_argument("--encoding", choices=("json", "binary", "mixed"), default="mixed",
+                        help="Wire encoding the bots ask for")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the bots' control patterns")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results to a JSON file")
+    args = parser.parse_args()
+    args.players = [int(count) for count in args.players.split(",")]
+
+    asyncio.run(main(args))
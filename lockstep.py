@@ -0,0 +1,139 @@
+import hashlib
+import json
+
+# Room modes a client can ask for in its join message
+MODE_SNAPSHOT = "snapshot"  # The server simulates and sends each client snapshots of its view
+MODE_LOCKSTEP = "lockstep"  # The server relays inputs and every participant runs the simulation
+MODES = (MODE_SNAPSHOT, MODE_LOCKSTEP)
+
+CHECK_TICKS = 120  # Ticks between state hashes, which let participants detect a desync
+
+# Lockstep messages, server -> participant (JSON, sent reliably at the snapshot rate):
+#   {"type": "lockstep_start", "settings": {...}, "checkpoint": {...} or null, "events": [...], "through": tick}
+#   {"type": "lockstep", "events": [...], "through": tick}
+# Events, in the order they happened:
+#   ["join", {"tick", "player_id", "player_name", "net_id", "encoding"}]  after that tick was simulated
+#   ["leave", net_id, tick]  after that tick was simulated
+#   ["inputs", tick, [[net_id, inputs], ...]]  applied at the start of that tick
+#   ["check", tick, hash]  state_hash of the world after that tick
+# Every tick up to `through` has been simulated; ticks without an inputs
+# event had no inputs. lockstep_start carries the room's latest checkpoint
+# (AsteroidsServer.checkpoint, taken with each check) and every event since,
+# so a late joiner restores it and simulates its way to the present. Before
+# the first check there is no checkpoint, and the events go back to the start.
+
+
+def state_hash(snapshot):
+    """Hash a world snapshot, all of which the simulation determines"""
+    data = json.dumps(snapshot, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+class LockstepRelay:
+    """Room side of lockstep mode: records the room's joins, leaves and inputs and relays them to participants"""
+    # It takes the same calls as a MatchRecorder (the room uses it as its
+    # recorder) and passes them on to the real recorder, if there is one
+    def __init__(self, recorder=None):
+        self.recorder = recorder
+        self.settings = None
+        self.events = []  # Events since the oldest one a participant or the checkpoint still needs
+        self.dropped = 0  # Events trimmed off the front of self.events
+        self.checkpoint = None  # (event count, room state) of the latest check, which late joiners start from
+        self.current_tick = None  # Tick being simulated, and the inputs applied in it so far
+        self.current_inputs = []
+        self.cursors = {}  # Maps a participant's WebSocket to the number of events it has been sent (counting dropped ones)
+
+    def end_tick(self):
+        """Turn the inputs of the tick being simulated into an event"""
+        if self.current_inputs:
+            self.events.append(["inputs", self.current_tick, self.current_inputs])
+            self.current_inputs = []
+
+    def header(self, settings):
+        self.settings = settings
+        if self.recorder:
+            self.recorder.header(settings)
+
+    def tick(self, tick, now, dt):
+        self.end_tick()
+        self.current_tick = tick
+        if self.recorder:
+            self.recorder.tick(tick, now, dt)
+
+    def input(self, net_id, inputs, view_tick):
+        self.current_inputs.append([net_id, inputs])
+        if self.recorder:
+            self.recorder.input(net_id, inputs, view_tick)
+
+    def join(self, player):
+        self.end_tick()
+        self.events.append(["join", player])
+        if self.recorder:
+            self.recorder.join(player)
+
+    def leave(self, net_id):
+        # Players leave between ticks, so after the last one that started
+        self.end_tick()
+        self.events.append(["leave", net_id, self.current_tick or 0])
+        if self.recorder:
+            self.recorder.leave(net_id)
+
+    def keyframe(self, tick, snapshot):
+        if self.recorder:
+            self.recorder.keyframe(tick, snapshot)
+
+    def tick_cost(self, seconds):
+        if self.recorder:
+            self.recorder.tick_cost(seconds)
+
+    def close(self):
+        if self.recorder:
+            self.recorder.close()
+
+    def check(self, tick, snapshot, state):
+        """Add a state hash for participants to compare against, and make the room's state the checkpoint"""
+        self.end_tick()
+        self.events.append(["check", tick, state_hash(snapshot)])
+        self.checkpoint = (self.dropped + len(self.events), state)
+        self.trim()
+
+    def trim(self):
+        """Drop the events every participant has been sent that came before the checkpoint"""
+        if self.checkpoint is None:
+            return
+        keep = min([self.checkpoint[0], *self.cursors.values()])
+        del self.events[:keep - self.dropped]
+        self.dropped = keep
+
+    def forget(self, websocket):
+        """Stop tracking a participant that left"""
+        self.cursors.pop(websocket, None)
+
+    def flush(self, tick, connections):
+        """Send each participant the events it hasn't had yet, confirming every tick up to `tick`"""
+        self.end_tick()
+        count = self.dropped + len(self.events)
+        encoded = {}  # Participants that are equally far behind get the same message
+        for websocket, connection in connections.items():
+            cursor = self.cursors.get(websocket)
+            if cursor is None:
+                # New participant: the checkpoint and everything after it
+                start, state = self.checkpoint or (0, None)
+                message = json.dumps({
+                    "type": "lockstep_start",
+                    "settings": self.settings,
+                    "checkpoint": state,
+                    "events": self.events[start - self.dropped:],
+                    "through": tick,
+                })
+            else:
+                if cursor not in encoded:
+                    encoded[cursor] = json.dumps({
+                        "type": "lockstep",
+                        "events": self.events[cursor - self.dropped:],
+                        "through": tick,
+                    })
+                message = encoded[cursor]
+            connection.send_reliable(message)
+            self.cursors[websocket] = count
+        self.trim()
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+import websockets
+
+from lockstep import MODE_LOCKSTEP, state_hash
+from replay import NullConnection, ReplayClient
+from precision import DEFAULT_PRECISION, PrecisionProfile
+from server import AsteroidsServer
+
+logger = logging.getLogger("asteroids_server")
+
+SERVER_URL = "ws://localhost:8081"
+INPUT_LEAD_TICKS = 3  # How far ahead of the last confirmed tick inputs are aimed
+
+
+class LockstepParticipant:
+    """A headless lockstep player: sends inputs, and simulates the room from the relayed events"""
+    def __init__(self, url, player_name, room_id=None, play=False, seed=None):
+        self.url = url
+        self.player_name = player_name
+        self.room_id = room_id
+        self.play = play
+        self.rng = random.Random(seed)
+        self.room = None  # Local copy of the room's world
+        self.started = None  # The room's start time, which each tick's clock is counted from
+        self.dt = None
+        self.clients = {}  # Maps net_id to ReplayClient
+        self.through = 0  # Last tick the server has confirmed
+        self.checks = 0
+        self.divergences = 0
+        self.bytes_received = 0
+        self.seq = 0
+
+    async def run(self, duration):
+        """Join a lockstep room and keep simulating it for a number of seconds"""
+        async with websockets.connect(self.url, max_size=None) as websocket:
+            join = {"type": "join", "player_name": self.player_name, "mode": MODE_LOCKSTEP}
+            if self.room_id:
+                join["room"] = self.room_id
+            await websocket.send(json.dumps(join))
+
+            tasks = [asyncio.create_task(self.read(websocket))]
+            if self.play:
+                tasks.append(asyncio.create_task(self.send_inputs(websocket)))
+            try:
+                await asyncio.wait(tasks, timeout=duration, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def read(self, websocket):
+        """Apply every lockstep message from the server"""
+        async for message in websocket:
+            self.bytes_received += len(message)
+            if isinstance(message, bytes):
+                continue
+
+            data = json.loads(message)
+            if data["type"] == "lockstep_start":
+                self.start(data["settings"], data.get("checkpoint"))
+                self.apply(data["events"], data["through"])
+            elif data["type"] == "lockstep":
+                self.apply(data["events"], data["through"])
+            elif data["type"] == "error":
+                logger.error(f"Server turned us away: {data['reason']}")
+                return
+
+    def start(self, settings, checkpoint=None):
+        """Create the room exactly as the server created it, and catch up to its checkpoint if it sent one"""
+        self.room = AsteroidsServer(
+            room_id=settings["room_id"],
+            max_players=settings["max_players"],
+            simulation_rate=settings["simulation_rate"],
+            snapshot_rate=settings["snapshot_rate"],
+            arena_width=settings["arena_width"],
+            arena_height=settings["arena_height"],
+            seed=settings["seed"],
+            precision=PrecisionProfile(**settings["precision"]) if "precision" in settings else DEFAULT_PRECISION,
+        )
+        self.started = settings["started"]
+        self.dt = 1.0 / settings["simulation_rate"]
+        self.room.now = self.started
+        if checkpoint:
+            self.clients = {player["net_id"]: ReplayClient(player["net_id"]) for player in checkpoint["players"]}
+            self.room.restore(checkpoint, self.clients, NullConnection())
+
+    def advance_to(self, tick):
+        """Simulate every tick up to and including `tick`"""
+        room = self.room
+        while room.tick < tick:
+            # The clock only goes into recordings, so any consistent one will do
+            room.update_game(self.dt, self.started + (room.tick + 1) * self.dt)
+
+    def apply(self, events, through):
+        """Simulate the events of one lockstep message, then every tick it confirms"""
+        room = self.room
+        for event in events:
+            kind = event[0]
+            if kind == "inputs":
+                _, tick, inputs = event
+                self.advance_to(tick - 1)
+                for net_id, data in inputs:
+                    player_id = room.clients[self.clients[net_id]]
+                    room.input_queues[player_id].push(None, tick, data, room.tick)
+            elif kind == "join":
+                player = event[1]
+                self.advance_to(player["tick"])
+                client = ReplayClient(player["net_id"])
+                self.clients[player["net_id"]] = client
+                room.register(client, NullConnection(), player["player_name"], player["encoding"],
+                              player_id=player["player_id"])
+            elif kind == "leave":
+                _, net_id, tick = event
+                self.advance_to(tick)
+                room.unregister(self.clients.pop(net_id))
+            elif kind == "check":
+                _, tick, expected = event
+                self.advance_to(tick)
+                self.checks += 1
+                if state_hash(room.build_snapshot()) != expected:
+                    self.divergences += 1
+                    logger.warning(f"Lockstep simulation diverged from the server at tick {tick}")
+        self.advance_to(through)
+        self.through = through
+
+    async def send_inputs(self, websocket):
+        """Change the controls every so often, like loadtest's bots"""
+        rotation = 0
+        thrust = False
+        while True:
+            if self.rng.random() < 0.3:
+                rotation = self.rng.choice((-1, 0, 0, 1))
+            if self.rng.random() < 0.2:
+                thrust = not thrust
+            fire = self.rng.random() < 0.5
+            await self.send_input(websocket, rotation, thrust, fire)
+            if fire:
+                await asyncio.sleep(self.rng.uniform(0.05, 0.1))
+                await self.send_input(websocket, rotation, thrust, False)
+            await asyncio.sleep(self.rng.uniform(0.1, 0.5))
+
+    async def send_input(self, websocket, rotation, thrust, fire):
+        """Send one sequenced input"""
+        self.seq += 1
+        await websocket.send(json.dumps({
+            "type": "input",
+            "seq": self.seq,
+            "tick": self.through + INPUT_LEAD_TICKS,
+            "data": {"rotation": rotation, "thrust": thrust, "fire": fire},
+        }))
+
+    def report(self, elapsed):
+        """Print how far the simulation got and whether it stayed in step with the server"""
+        ticks = self.room.tick if self.room else 0
+        print(f"Simulated {ticks} ticks, confirmed through tick {self.through}")
+        print(f"State checks: {self.checks} compared, {self.divergences} diverged")
+        print(f"Received {self.bytes_received} bytes ({self.bytes_received / max(elapsed, 1e-9):.0f} bytes/s)")
+
+
+async def main(args):
+    participant = LockstepParticipant(args.url, args.name, args.room, args.play, args.seed)
+    started = time.monotonic()
+    await participant.run(args.duration)
+    participant.report(time.monotonic() - started)
+    return participant.divergences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Join a lockstep room and simulate it locally, checking it against the server")
+    parser.add_argument("--url", default=SERVER_URL, help="WebSocket URL of the server")
+    parser.add_argument("--name", default="lockstep-bot", help="Player name")
+    parser.add_argument("--room", help="Room to join (created as a lockstep room if it doesn't exist)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to stay in the room")
+    parser.add_argument("--play", action="store_true", help="Send random inputs rather than just watching")
+    parser.add_argument("--seed", type=int, help="Seed for the random inputs")
+    args = parser.parse_args()
+
+    # Joins and leaves are logged at INFO, which would drown out the report
+    logger.setLevel(logging.WARNING)
+    raise SystemExit(1 if asyncio.run(main(args)) else 0)
@@ -0,0 +1,164 @@
+import json
+import struct
+import zlib
+
+# A match log is a sequence of chunks, each a CHUNK_HEADER followed by a
+# zlib-compressed run of records. Chunks are only ever appended, so a log cut
+# short by a crash is readable up to its last complete chunk.
+
+# Record kinds (first byte of every record)
+RECORD_HEADER = 1  # JSON: room settings and RNG seed
+RECORD_TICK = 2  # A simulation step starts
+RECORD_INPUT = 3  # An input applied during the current step
+RECORD_JOIN = 4  # JSON: a player joined
+RECORD_LEAVE = 5  # A player left
+RECORD_KEYFRAME = 6  # JSON: the full world snapshot after a step
+RECORD_TICK_COST = 7  # How long the previous step took to simulate
+
+CHUNK_HEADER = struct.Struct("<II")  # uncompressed size, compressed size
+JSON_RECORD = struct.Struct("<BI")  # kind, payload size
+TICK_RECORD = struct.Struct("<BIdd")  # kind, tick, wall-clock time, dt
+INPUT_RECORD = struct.Struct("<BBBdI")  # kind, net_id, flags, rotation, view tick
+LEAVE_RECORD = struct.Struct("<BB")  # kind, net_id
+TICK_COST_RECORD = struct.Struct("<Bf")  # kind, seconds
+
+# Input record flags (inputs only carry the fields the client sent)
+INPUT_HAS_ROTATION = 1 << 0
+INPUT_HAS_THRUST = 1 << 1
+INPUT_THRUST = 1 << 2
+INPUT_HAS_FIRE = 1 << 3
+INPUT_FIRE = 1 << 4
+
+NO_VIEW_TICK = 0xFFFFFFFF
+CHUNK_SIZE = 64 * 1024  # Uncompressed bytes buffered before a chunk is written
+KEYFRAME_TICKS = 600  # Steps between recorded keyframes (which also flush the buffer)
+
+
+class MatchRecorder:
+    """Append-only, chunk-compressed log of everything needed to re-simulate a room"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        self.buffer = bytearray()
+
+    def write_json(self, kind, payload):
+        """Buffer a record with a JSON payload"""
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.buffer += JSON_RECORD.pack(kind, len(data))
+        self.buffer += data
+        if len(self.buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def header(self, settings):
+        """Record the room settings and seed a replay needs to start from"""
+        self.write_json(RECORD_HEADER, settings)
+
+    def tick(self, tick, now, dt):
+        """Record the start of a simulation step"""
+        self.buffer += TICK_RECORD.pack(RECORD_TICK, tick, now, dt)
+        if len(self.buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def input(self, net_id, inputs, view_tick):
+        """Record an input applied to a player's ship in the current step"""
+        flags = 0
+        rotation = 0.0
+        if "rotation" in inputs:
+            flags |= INPUT_HAS_ROTATION
+            rotation = float(inputs["rotation"])
+        if "thrust" in inputs:
+            flags |= INPUT_HAS_THRUST
+            if inputs["thrust"]:
+                flags |= INPUT_THRUST
+        if "fire" in inputs:
+            flags |= INPUT_HAS_FIRE
+            if inputs["fire"]:
+                flags |= INPUT_FIRE
+        self.buffer += INPUT_RECORD.pack(
+            RECORD_INPUT, net_id, flags, rotation, NO_VIEW_TICK if view_tick is None else view_tick,
+        )
+
+    def join(self, player):
+        """Record a player joining"""
+        self.write_json(RECORD_JOIN, player)
+
+    def leave(self, net_id):
+        """Record a player leaving"""
+        self.buffer += LEAVE_RECORD.pack(RECORD_LEAVE, net_id)
+
+    def keyframe(self, tick, snapshot):
+        """Record the full world state, so replays can check they haven't diverged"""
+        self.write_json(RECORD_KEYFRAME, {"tick": tick, "snapshot": snapshot})
+        self.flush()
+
+    def tick_cost(self, seconds):
+        """Record how long the last step took to simulate"""
+        self.buffer += TICK_COST_RECORD.pack(RECORD_TICK_COST, seconds)
+
+    def flush(self):
+        """Compress the buffered records and append them as one chunk"""
+        if not self.buffer:
+            return
+        data = zlib.compress(bytes(self.buffer))
+        self.file.write(CHUNK_HEADER.pack(len(self.buffer), len(data)))
+        self.file.write(data)
+        self.file.flush()
+        self.buffer.clear()
+
+    def close(self):
+        """Write any buffered records and close the file"""
+        self.flush()
+        self.file.close()
+
+
+def unpack_input(flags, rotation):
+    """Rebuild the input dict from an input record's fields"""
+    inputs = {}
+    if flags & INPUT_HAS_ROTATION:
+        inputs["rotation"] = int(rotation) if rotation.is_integer() else rotation
+    if flags & INPUT_HAS_THRUST:
+        inputs["thrust"] = bool(flags & INPUT_THRUST)
+    if flags & INPUT_HAS_FIRE:
+        inputs["fire"] = bool(flags & INPUT_FIRE)
+    return inputs
+
+
+def read_match(path):
+    """Yield (kind, fields) for every record in a match log"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                return
+            size, compressed_size = CHUNK_HEADER.unpack(header)
+            compressed = f.read(compressed_size)
+            if len(compressed) < compressed_size:
+                return  # Truncated final chunk
+            chunk = zlib.decompress(compressed)
+
+            offset = 0
+            while offset < size:
+                kind = chunk[offset]
+                if kind in (RECORD_HEADER, RECORD_JOIN, RECORD_KEYFRAME):
+                    _, length = JSON_RECORD.unpack_from(chunk, offset)
+                    offset += JSON_RECORD.size
+                    yield kind, json.loads(chunk[offset:offset + length])
+                    offset += length
+                elif kind == RECORD_TICK:
+                    _, tick, now, dt = TICK_RECORD.unpack_from(chunk, offset)
+                    offset += TICK_RECORD.size
+                    yield kind, (tick, now, dt)
+                elif kind == RECORD_INPUT:
+                    _, net_id, flags, rotation, view_tick = INPUT_RECORD.unpack_from(chunk, offset)
+                    offset += INPUT_RECORD.size
+                    yield kind, (net_id, unpack_input(flags, rotation), None if view_tick == NO_VIEW_TICK else view_tick)
+                elif kind == RECORD_LEAVE:
+                    _, net_id = LEAVE_RECORD.unpack_from(chunk, offset)
+                    offset += LEAVE_RECORD.size
+                    yield kind, net_id
+                elif kind == RECORD_TICK_COST:
+                    _, seconds = TICK_COST_RECORD.unpack_from(chunk, offset)
+                    offset += TICK_COST_RECORD.size
+                    yield kind, seconds
+                else:
+                    raise ValueError(f"Unknown record kind {kind} in {path}")
@@ -0,0 +1,169 @@
+import bisect
+import time
+
+# Phases of a room's work, in the order they run. The simulation phases run
+# every tick; snapshot and broadcast run at the snapshot rate.
+PHASES = (
+    "inputs",  # Applying queued inputs
+    "ships",  # Ship physics
+    "lasers",  # Laser movement and expiry
+    "asteroids",  # Asteroid movement
+    "laser_collisions",  # Laser/asteroid hits, including lag compensation
+    "ship_collisions",  # Ship/asteroid hits
+    "level",  # Level-ups and match recording
+    "snapshot",  # Building the world snapshot and its position index
+    "broadcast",  # Filtering, diffing and encoding each client's view
+)
+ENTITY_KINDS = ("ships", "asteroids", "lasers")
+
+# Upper bounds (in seconds) of the tick time histogram buckets; 60 ticks per second leaves 16.6ms each
+TICK_BUCKETS = (0.0005, 0.001, 0.002, 0.004, 0.008, 0.0166, 0.0333, 0.1)
+
+
+class RoomMetrics:
+    """Per-phase timers and counters for one room, cheap enough to leave on in production"""
+    def __init__(self):
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)  # Total time spent in each phase
+        self.ticks = 0
+        self.tick_seconds = 0.0
+        self.tick_buckets = [0] * len(TICK_BUCKETS)  # Ticks by the first bucket they fit in (not cumulative)
+        self.tick_max = 0.0
+        self.snapshots = 0  # Snapshot messages handed to connections
+        self.snapshot_bytes = 0  # Encoded size of those messages
+        self.shots_dropped = 0  # Fire inputs refused by the fire cooldown or the live laser cap
+        self.entities_deferred = 0  # Entity updates left out of snapshots by clients' byte budgets, to be sent later
+        self.entities = dict.fromkeys(ENTITY_KINDS, 0)
+        self.players = 0
+
+    def lap(self, phase, started):
+        """Charge the time since `started` to a phase and return the current time, for the next lap"""
+        now = time.perf_counter()
+        self.phase_seconds[phase] += now - started
+        return now
+
+    def tick(self, seconds):
+        """Count one simulation step and how long it took"""
+        self.ticks += 1
+        self.tick_seconds += seconds
+        if seconds > self.tick_max:
+            self.tick_max = seconds
+        bucket = bisect.bisect_left(TICK_BUCKETS, seconds)
+        if bucket < len(self.tick_buckets):
+            self.tick_buckets[bucket] += 1
+
+    def as_dict(self):
+        """Get the counters as plain data (sent between processes and served as JSON)"""
+        ticks = max(self.ticks, 1)
+        return {
+            "ticks": self.ticks,
+            "tick_seconds": self.tick_seconds,
+            "tick_max_seconds": self.tick_max,
+            "tick_buckets": list(self.tick_buckets),
+            "phase_seconds": dict(self.phase_seconds),
+            "phase_ms_per_tick": {phase: seconds * 1000 / ticks for phase, seconds in self.phase_seconds.items()},
+            "snapshots": self.snapshots,
+            "snapshot_bytes": self.snapshot_bytes,
+            "shots_dropped": self.shots_dropped,
+            "entities_deferred": self.entities_deferred,
+            "entities": dict(self.entities),
+            "players": self.players,
+        }
+
+
+class ServerMetrics:
+    """Counters for the front process: client connections and the traffic through them"""
+    def __init__(self):
+        self.started = time.time()
+        self.connections = set()  # Live ClientConnections, whose counters are added in when read
+        self.messages_received = 0
+        self.messages_rate_limited = 0  # Messages dropped unread because their client was over its limits
+        self.rate_limit_disconnects = 0
+        self.closed_bytes_sent = 0  # Totals from connections that have since closed
+        self.closed_messages_sent = 0
+        self.closed_dropped_snapshots = 0
+
+    def connection_closed(self, connection):
+        """Fold a finished connection's counters into the totals"""
+        self.connections.discard(connection)
+        self.closed_bytes_sent += connection.bytes_sent
+        self.closed_messages_sent += connection.messages_sent
+        self.closed_dropped_snapshots += connection.dropped_snapshots
+
+    def as_dict(self):
+        """Get the counters as plain data"""
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "connections": len(self.connections),
+            "messages_received": self.messages_received,
+            "messages_rate_limited": self.messages_rate_limited,
+            "rate_limit_disconnects": self.rate_limit_disconnects,
+            "messages_sent": self.closed_messages_sent + sum(c.messages_sent for c in self.connections),
+            "bytes_sent": self.closed_bytes_sent + sum(c.bytes_sent for c in self.connections),
+            "dropped_snapshots": self.closed_dropped_snapshots + sum(c.dropped_snapshots for c in self.connections),
+        }
+
+
+def escape_label(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render_prometheus(stats):
+    """Format the /stats document in the Prometheus text exposition format"""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    server = stats["server"]
+    metric("asteroids_uptime_seconds", "gauge", "Seconds since the server started", [({}, server["uptime_seconds"])])
+    metric("asteroids_connections", "gauge", "Open client connections", [({}, server["connections"])])
+    metric("asteroids_messages_received_total", "counter", "Messages received from clients",
+           [({}, server["messages_received"])])
+    metric("asteroids_messages_rate_limited_total", "counter", "Messages dropped unread because their client was over its limits",
+           [({}, server["messages_rate_limited"])])
+    metric("asteroids_rate_limit_disconnects_total", "counter", "Clients disconnected for staying over their limits",
+           [({}, server["rate_limit_disconnects"])])
+    metric("asteroids_messages_sent_total", "counter", "Messages written to client sockets",
+           [({}, server["messages_sent"])])
+    metric("asteroids_bytes_sent_total", "counter", "Bytes written to client sockets", [({}, server["bytes_sent"])])
+    metric("asteroids_dropped_snapshots_total", "counter", "Snapshots replaced before a slow client took them",
+           [({}, server["dropped_snapshots"])])
+
+    rooms = stats["rooms"]
+    metric("asteroids_rooms", "gauge", "Rooms running", [({}, len(rooms))])
+    metric("asteroids_players", "gauge", "Players in each room",
+           [({"room": room_id}, room["players"]) for room_id, room in rooms.items()])
+    metric("asteroids_entities", "gauge", "Entities in each room",
+           [({"room": room_id, "kind": kind}, count)
+            for room_id, room in rooms.items() for kind, count in room["entities"].items()])
+    metric("asteroids_phase_seconds_total", "counter", "Time spent in each phase of a room's work",
+           [({"room": room_id, "phase": phase}, seconds)
+            for room_id, room in rooms.items() for phase, seconds in room["phase_seconds"].items()])
+    metric("asteroids_snapshots_total", "counter", "Snapshot messages encoded for clients",
+           [({"room": room_id}, room["snapshots"]) for room_id, room in rooms.items()])
+    metric("asteroids_snapshot_bytes_total", "counter", "Encoded size of snapshot messages",
+           [({"room": room_id}, room["snapshot_bytes"]) for room_id, room in rooms.items()])
+    metric("asteroids_shots_dropped_total", "counter", "Fire inputs refused by the fire cooldown or live laser cap",
+           [({"room": room_id}, room["shots_dropped"]) for room_id, room in rooms.items()])
+    metric("asteroids_entities_deferred_total", "counter", "Entity updates left out of snapshots by client byte budgets",
+           [({"room": room_id}, room["entities_deferred"]) for room_id, room in rooms.items()])
+
+    # Histogram buckets are cumulative in the exposition format
+    lines.append("# HELP asteroids_tick_seconds Time per simulation step")
+    lines.append("# TYPE asteroids_tick_seconds histogram")
+    for room_id, room in rooms.items():
+        room_label = f'room="{escape_label(room_id)}"'
+        cumulative = 0
+        for bound, count in zip(TICK_BUCKETS, room["tick_buckets"]):
+            cumulative += count
+            lines.append(f'asteroids_tick_seconds_bucket{{{room_label},le="{bound}"}} {cumulative}')
+        lines.append(f'asteroids_tick_seconds_bucket{{{room_label},le="+Inf"}} {room["ticks"]}')
+        lines.append(f"asteroids_tick_seconds_sum{{{room_label}}} {room['tick_seconds']}")
+        lines.append(f"asteroids_tick_seconds_count{{{room_label}}} {room['ticks']}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,77 @@
+# Default precision of snapshot fields. On a 1024x768 canvas nobody can see
+# an eighth of a pixel, or a ship turned by less than a degree and a half
+POSITION_SCALE = 8  # Steps per pixel; positions are sent as 16-bit fixed point
+ANGLE_STEPS = 256  # Steps per full turn; angles are sent as one byte
+VELOCITY_SCALE = 256  # Steps per pixel per 1/60s step; velocities (and asteroid spins, in degrees) are sent as int16
+
+# Ranges of the binary record fields the steps are packed into
+POSITION_LIMIT = 1 << 16
+ANGLE_LIMIT = 1 << 8
+VELOCITY_LIMIT = 1 << 15
+
+
+class PrecisionProfile:
+    """How finely snapshot fields are quantized, so the server and its clients see the very same values"""
+    # The server quantizes a field and stores the value the steps stand for
+    # (steps / scale) in its snapshots. Binary frames carry the steps, JSON
+    # the value, and clients dequantize steps the same way, so deltas, state
+    # hashes and recordings on the server match what clients decode exactly
+    def __init__(self, position_scale=POSITION_SCALE, angle_steps=ANGLE_STEPS, velocity_scale=VELOCITY_SCALE):
+        if angle_steps > ANGLE_LIMIT:
+            raise ValueError(f"Angles are sent as one byte, so there can be at most {ANGLE_LIMIT} steps, not {angle_steps}")
+        self.position_scale = position_scale
+        self.angle_steps = angle_steps
+        self.angle_step = 360 / angle_steps  # Degrees
+        self.velocity_scale = velocity_scale
+
+    def check_arena(self, width, height):
+        """Raise ValueError if positions in an arena this size don't fit their 16-bit fields"""
+        if max(width, height) * self.position_scale > POSITION_LIMIT:
+            raise ValueError(f"A {width}x{height} arena is too large for {self.position_scale} position steps per pixel")
+
+    def to_dict(self):
+        """Describe the profile for the welcome message, so binary clients can dequantize"""
+        return {"position_scale": self.position_scale, "angle_steps": self.angle_steps, "velocity_scale": self.velocity_scale}
+
+    # Quantizing: value -> steps, as packed into binary records
+    def position_to_steps(self, value, size):
+        # Positions wrap with the arena, so rounding up to its far edge lands back on 0
+        return round(value * self.position_scale) % (size * self.position_scale)
+
+    def angle_to_steps(self, value):
+        return round(value / self.angle_step) % self.angle_steps
+
+    def velocity_to_steps(self, value):
+        return max(-VELOCITY_LIMIT, min(VELOCITY_LIMIT - 1, round(value * self.velocity_scale)))
+
+    # Dequantizing: the values the steps stand for, which snapshots hold
+    def position(self, value, size):
+        """Quantize a position on a wrapping axis of the given size"""
+        return self.position_to_steps(value, size) / self.position_scale
+
+    def angle(self, value):
+        """Quantize an angle in degrees, to [0, 360)"""
+        return self.angle_to_steps(value) * self.angle_step
+
+    def velocity(self, value):
+        """Quantize a per-step velocity or spin"""
+        return self.velocity_to_steps(value) / self.velocity_scale
+
+    def quantize_ship(self, ship, width, height):
+        """Quantize a ship snapshot dict in place"""
+        ship["x"] = self.position(ship["x"], width)
+        ship["y"] = self.position(ship["y"], height)
+        ship["angle"] = self.angle(ship["angle"])
+        ship["velocity_x"] = self.velocity(ship["velocity_x"])
+        ship["velocity_y"] = self.velocity(ship["velocity_y"])
+        return ship
+
+    def quantize_laser(self, laser, width, height):
+        """Quantize a laser snapshot dict in place"""
+        laser["x"] = self.position(laser["x"], width)
+        laser["y"] = self.position(laser["y"], height)
+        laser["angle"] = self.angle(laser["angle"])
+        return laser
+
+
+DEFAULT_PRECISION = PrecisionProfile()
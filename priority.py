@@ -0,0 +1,67 @@
+from wire import ENCODING_JSON, ENCODING_BINARY, SHIP_RECORD, ASTEROID_RECORD, LASER_RECORD
+
+# Snapshot data each client may be sent, before the budget adapts to its link
+CLIENT_BANDWIDTH = 128 * 1024  # Bytes per second (None sends every change, whatever its size)
+MIN_BUDGET = 512  # Bytes per snapshot a client's budget never shrinks below
+BUDGET_RECOVERY_SNAPSHOTS = 20  # Snapshots without a drop to grow a halved budget back to full
+
+# How much each kind of entity matters. A client's own and other ships
+# decide fights, lasers are brief, and asteroids are only sent when they
+# come into view or break up, since clients dead-reckon them
+PRIORITY_WEIGHTS = {"ships": 4.0, "lasers": 2.0, "asteroids": 1.0}
+PRIORITY_FALLOFF = 400  # Pixels from the client's ship at which an entity's priority halves
+
+# Estimated encoded size of one entity. Binary records are fixed; JSON
+# sizes are typical ones (ships carry their player's uuid and name)
+ENTITY_BYTES = {
+    ENCODING_BINARY: {"ships": SHIP_RECORD.size, "asteroids": ASTEROID_RECORD.size, "lasers": LASER_RECORD.size},
+    ENCODING_JSON: {"ships": 350, "asteroids": 135, "lasers": 135},
+}
+
+
+class SnapshotBudget:
+    """A client's byte budget per snapshot, and the priorities of the entity updates waiting to fit in it"""
+    # Each snapshot, every entity update the client is missing adds its
+    # priority to what it has accumulated, and the highest go in until the
+    # budget is spent. Updates that don't fit keep their priority and so
+    # rise until they are sent; nothing waits forever. The budget halves
+    # whenever the client's connection had to drop a snapshot, and grows
+    # back while it keeps up.
+    def __init__(self, budget):
+        self.max_budget = budget
+        self.budget = budget
+        self.priorities = {}  # Maps (section, entity_id) to the priority accumulated while left out
+        self.dropped_snapshots = 0  # The connection's count of dropped snapshots when last checked
+        self.deferred = 0  # Updates left out of the last snapshot
+
+    def adapt(self, dropped_snapshots):
+        """Shrink the budget if the connection dropped a snapshot since the last check, otherwise grow it back"""
+        if dropped_snapshots > self.dropped_snapshots:
+            self.budget = max(MIN_BUDGET, self.budget // 2)
+        else:
+            self.budget = min(self.max_budget, self.budget + self.max_budget // BUDGET_RECOVERY_SNAPSHOTS)
+        self.dropped_snapshots = dropped_snapshots
+
+    def select(self, candidates, budget):
+        """Pick which (section, entity_id, priority, cost) candidates to send, highest accumulated priority first"""
+        waiting = []
+        for section, entity_id, priority, cost in candidates:
+            key = (section, entity_id)
+            waiting.append((self.priorities.get(key, 0.0) + priority, cost, key))
+        waiting.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        selected = set()
+        priorities = {}
+        for priority, cost, key in waiting:
+            # Smaller updates may still fit after a large one didn't, and the
+            # top update always goes, so even a tiny budget makes progress
+            if cost <= budget or not selected:
+                selected.add(key)
+                budget -= cost
+            else:
+                priorities[key] = priority
+
+        # Updates that went out, or that are no longer waiting, start over
+        self.priorities = priorities
+        self.deferred = len(priorities)
+        return selected
@@ -0,0 +1,76 @@
+import time
+
+# Inbound limits per client connection. The browser client sends an input
+# when its controls change and an ack per snapshot, around 30 messages and
+# 2KB a second, so these leave plenty of headroom for real players.
+MESSAGE_RATE = 60  # Messages per second, sustained
+MESSAGE_BURST = 60  # Messages that may arrive back-to-back
+BYTE_RATE = 16 * 1024  # Bytes per second, sustained
+BYTE_BURST = 16 * 1024
+MAX_MESSAGE_SIZE = 4096  # Larger frames close the connection before they are even read in full
+ABUSE_DISCONNECT_TIME = 5.0  # Seconds a client may stay over its limits before we disconnect it (None to only drop)
+ABUSE_FORGIVE_TIME = 1.0  # Seconds without a dropped message after which a client is back under its limits
+
+
+class TokenBucket:
+    """Allows `rate` units a second on average, and up to `burst` at once"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        """Add the tokens earned since the last refill"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def has(self, amount, now):
+        """Check whether there are enough tokens, without spending them"""
+        self.refill(now)
+        return self.tokens >= amount
+
+    def take(self, amount, now):
+        """Spend tokens if there are enough, refilling for the time since the last call"""
+        if not self.has(amount, now):
+            return False
+        self.tokens -= amount
+        return True
+
+
+class InboundLimiter:
+    """Per-connection message and byte budgets, checked before a message is parsed"""
+    def __init__(self, message_rate=MESSAGE_RATE, message_burst=MESSAGE_BURST, byte_rate=BYTE_RATE, byte_burst=BYTE_BURST,
+                 abuse_time=ABUSE_DISCONNECT_TIME):
+        self.messages = TokenBucket(message_rate, message_burst)
+        self.bytes = TokenBucket(byte_rate, byte_burst)
+        self.abuse_time = abuse_time
+        self.limited_since = None  # When the client went over its limits, if it still is
+        self.last_dropped = None
+        self.dropped = 0
+
+    def allow(self, size):
+        """Check whether a message of `size` bytes fits the budgets, counting it against them if it does"""
+        now = time.monotonic()
+        # Both buckets must have room before either is charged, so a dropped
+        # message costs nothing
+        if self.messages.has(1, now) and self.bytes.has(size, now):
+            self.messages.take(1, now)
+            self.bytes.take(size, now)
+            # A flood still gets the odd message through as tokens trickle
+            # back, so only a quiet spell counts as being back under the limits
+            if self.limited_since is not None and now - self.last_dropped > ABUSE_FORGIVE_TIME:
+                self.limited_since = None
+            return True
+
+        self.dropped += 1
+        self.last_dropped = now
+        if self.limited_since is None:
+            self.limited_since = now
+        return False
+
+    def abusive(self):
+        """Check whether the client has been over its limits for longer than we tolerate"""
+        if self.abuse_time is None or self.limited_since is None:
+            return False
+        return time.monotonic() - self.limited_since > self.abuse_time
@@ -0,0 +1,155 @@
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+
+from match_log import (
+    read_match, RECORD_HEADER, RECORD_TICK, RECORD_INPUT, RECORD_JOIN, RECORD_LEAVE,
+    RECORD_KEYFRAME, RECORD_TICK_COST,
+)
+from precision import DEFAULT_PRECISION, PrecisionProfile
+from server import AsteroidsServer
+
+logger = logging.getLogger("asteroids_server")
+
+SLOWEST_TICKS = 10  # Production ticks listed in the report
+
+
+class NullConnection:
+    """Stands in for a client's ClientConnection and drops everything sent to it"""
+    dropped_snapshots = 0
+
+    def send_snapshot(self, data):
+        pass
+
+    def send_reliable(self, data):
+        pass
+
+
+class ReplayClient:
+    """Stands in for a player's WebSocket as the room's key for that player"""
+    def __init__(self, net_id):
+        self.net_id = net_id
+
+
+class MatchReplay:
+    """Re-simulates a recorded match as fast as possible, without sending snapshots"""
+    def __init__(self, path):
+        self.path = path
+        self.room = None
+        self.clients = {}  # Maps net_id to ReplayClient
+        self.pending_tick = None  # (tick, now, dt) of the step whose inputs are being collected
+        self.pending_inputs = []  # (net_id, inputs, view_tick) for that step
+        self.replay_costs = []  # Seconds per step when replayed
+        self.production_costs = []  # Seconds per step when recorded
+        self.keyframes = 0
+        self.divergences = 0
+
+    def run(self):
+        """Replay every record in the log"""
+        for kind, fields in read_match(self.path):
+            if kind == RECORD_HEADER:
+                self.start(fields)
+            elif kind == RECORD_TICK:
+                # A step's inputs follow its tick record, so it runs once they're all read
+                self.step()
+                self.pending_tick = fields
+            elif kind == RECORD_INPUT:
+                self.pending_inputs.append(fields)
+            elif kind == RECORD_TICK_COST:
+                self.step()
+                self.production_costs.append(fields)
+            elif kind == RECORD_JOIN:
+                self.step()
+                self.join(fields)
+            elif kind == RECORD_LEAVE:
+                self.step()
+                self.room.unregister(self.clients.pop(fields))
+            elif kind == RECORD_KEYFRAME:
+                self.step()
+                self.check_keyframe(fields)
+        self.step()
+
+    def start(self, header):
+        """Create the room exactly as it was created in production"""
+        self.room = AsteroidsServer(
+            room_id=header["room_id"],
+            max_players=header["max_players"],
+            simulation_rate=header["simulation_rate"],
+            snapshot_rate=header["snapshot_rate"],
+            arena_width=header["arena_width"],
+            arena_height=header["arena_height"],
+            seed=header["seed"],
+            precision=PrecisionProfile(**header["precision"]) if "precision" in header else DEFAULT_PRECISION,
+        )
+        self.room.now = header["started"]
+
+    def join(self, player):
+        """Add a recorded player to the room"""
+        client = ReplayClient(player["net_id"])
+        self.clients[player["net_id"]] = client
+        self.room.register(client, NullConnection(), player["player_name"], player["encoding"],
+                           player_id=player["player_id"])
+
+    def step(self):
+        """Run the pending simulation step with the inputs recorded for it"""
+        if self.pending_tick is None:
+            return
+        tick, now, dt = self.pending_tick
+        self.pending_tick = None
+
+        # Queue each input for this tick, with the tick each player was looking
+        # at, so laser shots rewind by the same amount
+        for net_id, inputs, view_tick in self.pending_inputs:
+            player_id = self.room.clients[self.clients[net_id]]
+            self.room.input_queues[player_id].push(None, tick, inputs, self.room.tick, view_tick)
+        self.pending_inputs = []
+
+        started = time.perf_counter()
+        self.room.update_game(dt, now)
+        self.replay_costs.append(time.perf_counter() - started)
+
+        if self.room.tick != tick:
+            logger.warning(f"Replay reached tick {self.room.tick} where the log has tick {tick}")
+
+    def check_keyframe(self, keyframe):
+        """Compare the replayed world with a recorded keyframe"""
+        self.keyframes += 1
+        replayed = json.loads(json.dumps(self.room.build_snapshot()))
+        if replayed != keyframe["snapshot"]:
+            self.divergences += 1
+            logger.warning(f"Replay diverged from the recording at tick {keyframe['tick']}")
+
+    def report(self):
+        """Print the replay speed, keyframe checks and tick cost comparison"""
+        replay_costs = np.array(self.replay_costs)
+        production_costs = np.array(self.production_costs)
+        total = replay_costs.sum()
+        print(f"Replayed {len(replay_costs)} ticks in {total:.2f}s ({len(replay_costs) / max(total, 1e-9):.0f} ticks/s)")
+        print(f"Keyframes: {self.keyframes} checked, {self.divergences} diverged")
+
+        for name, costs in (("replay", replay_costs), ("production", production_costs)):
+            if len(costs):
+                p50, p95, p99 = np.percentile(costs, [50, 95, 99]) * 1000
+                print(f"{name:>10} tick ms: p50 {p50:.3f}  p95 {p95:.3f}  p99 {p99:.3f}  max {costs.max() * 1000:.3f}")
+
+        # Production costs are recorded in tick order, starting at tick 1
+        if len(production_costs):
+            print("Slowest production ticks:")
+            for index in np.argsort(production_costs)[::-1][:SLOWEST_TICKS]:
+                replayed = f"{replay_costs[index] * 1000:.3f} ms" if index < len(replay_costs) else "-"
+                print(f"  tick {index + 1}: {production_costs[index] * 1000:.3f} ms (replayed {replayed})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-simulate a match recorded with server.py --record")
+    parser.add_argument("log", help="Path of the match log")
+    args = parser.parse_args()
+
+    # Joins and leaves are logged at INFO, which would drown out the report
+    logger.setLevel(logging.WARNING)
+    replay = MatchReplay(args.log)
+    replay.run()
+    replay.report()
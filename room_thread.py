@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("asteroids_server")
+
+STATS_INTERVAL = 0.5  # Seconds between copies of a room's counters published for /stats
+SWITCH_INTERVAL = 0.001  # Seconds a thread may hold the GIL while another waits, so a long tick can't stall the I/O loop
+
+
+class ThreadConnection:
+    """Stand-in for a ClientConnection on the simulation thread: outbound data is handed to the I/O loop"""
+    def __init__(self, connection, room):
+        self.connection = connection
+        self.room = room
+
+    @property
+    def dropped_snapshots(self):
+        # Counted on the I/O loop; a slightly stale read only delays the room's reaction
+        return self.connection.dropped_snapshots
+
+    def send_snapshot(self, data):
+        self.room.queue(self.connection, False, data)
+
+    def send_reliable(self, data):
+        self.room.queue(self.connection, True, data)
+
+
+class ThreadedRoom:
+    """I/O-loop proxy for a room whose game loop runs on its own thread"""
+    # The two sides share no state. The I/O loop appends commands to a deque
+    # (appends and pops are atomic, so no lock is needed) that the simulation
+    # thread runs between ticks. The simulation thread fills one outbox while
+    # the I/O loop delivers the previous one, and publishes a copy of the
+    # room's counters for /stats.
+    def __init__(self, room, loop):
+        self.room = room  # AsteroidsServer, only touched by the simulation thread once started
+        self.room_id = room.room_id
+        self.mode = room.mode
+        self.max_players = room.max_players
+        self.loop = loop
+        self.clients = set()  # WebSockets of the players in the room
+        self.commands = deque()  # (function, args, on_error) for the simulation thread to run
+        self.outbox = []  # (connection, reliable, data) queued by the simulation thread
+        self.published_stats = None
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"room-{self.room_id}", daemon=True)
+
+    def start(self):
+        """Start the simulation thread"""
+        self.thread.start()
+
+    def stop(self):
+        """Ask the simulation thread to finish; it closes the room's recording on its way out"""
+        self.stopping.set()
+
+    def join(self, timeout=None):
+        """Wait for the simulation thread to finish"""
+        self.thread.join(timeout)
+
+    def is_full(self):
+        return len(self.clients) >= self.max_players
+
+    def is_empty(self):
+        return not self.clients
+
+    def register(self, websocket, connection, player_name, encoding, on_error=None):
+        # The room registers the player on its own thread; if that fails, on_error is called on the I/O loop
+        self.clients.add(websocket)
+        self.commands.append((self.room.register, (websocket, ThreadConnection(connection, self), player_name, encoding),
+                              on_error))
+
+    def unregister(self, websocket):
+        if websocket in self.clients:
+            self.clients.discard(websocket)
+            self.commands.append((self.room.unregister, (websocket,), None))
+
+    def process_message(self, websocket, message):
+        self.commands.append((self.room.process_message, (websocket, message), None))
+
+    def stats(self):
+        """Get the counters the simulation thread last published, or None before it has"""
+        return self.published_stats
+
+    def run(self):
+        """Simulation thread: the room's fixed-step game loop"""
+        room = self.room
+        room.start_loop(time.monotonic())
+        next_stats = 0.0
+        try:
+            while not self.stopping.is_set():
+                self.run_commands()
+                deadline = room.run_due(time.monotonic())
+                self.flush()
+
+                now = time.monotonic()
+                if now >= next_stats:
+                    self.published_stats = room.stats()
+                    next_stats = now + STATS_INTERVAL
+
+                # Sleep until the next deadline, or until told to stop
+                self.stopping.wait(max(0, deadline - time.monotonic()))
+        except Exception as e:
+            logger.error(f"Room {self.room_id} simulation thread failed: {str(e)}", exc_info=True)
+        finally:
+            room.stop()
+
+    def run_commands(self):
+        """Apply everything the I/O loop has sent since the last tick"""
+        commands = self.commands
+        while commands:
+            function, args, on_error = commands.popleft()
+            try:
+                function(*args)
+            except Exception as e:
+                logger.error(f"Room {self.room_id} failed to run {function.__name__}: {str(e)}", exc_info=True)
+                if on_error is not None:
+                    self.loop.call_soon_threadsafe(on_error)
+
+    def queue(self, connection, reliable, data):
+        """Queue outbound data (simulation thread)"""
+        self.outbox.append((connection, reliable, data))
+
+    def flush(self):
+        """Hand the outbox to the I/O loop and start a fresh one (simulation thread)"""
+        if self.outbox:
+            outbox, self.outbox = self.outbox, []
+            self.loop.call_soon_threadsafe(self.deliver, outbox)
+
+    def deliver(self, outbox):
+        """Pass queued data to the client connections (I/O loop)"""
+        for connection, reliable, data in outbox:
+            if reliable:
+                connection.send_reliable(data)
+            else:
+                connection.send_snapshot(data)
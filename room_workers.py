@@ -0,0 +1,306 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+
+logger = logging.getLogger("asteroids_server")
+
+LOAD_REPORT_INTERVAL = 1.0  # Seconds between worker load reports
+NEW_ROOM_LOAD_ESTIMATE = 0.02  # Assumed load of a freshly placed room until the next report
+
+# Pipe messages, front -> worker:
+#   ("create_room", room_id, max_players, mode)
+#   ("close_room", room_id)
+#   ("join", room_id, client_id, player_name, encoding)
+#   ("message", room_id, client_id, data)
+#   ("leave", room_id, client_id)
+#   ("drops", {client_id: dropped_snapshots, ...})
+#   ("stop",)
+# Pipe messages, worker -> front:
+#   ("out", [(client_id, reliable, data), ...])
+#   ("join_failed", client_id)
+#   ("load", busy_fraction, room_count, {room_id: stats})
+
+
+class WorkerConnection:
+    """Stand-in for ClientConnection inside a worker: outbound data is queued for the front process"""
+    def __init__(self, client_id, worker):
+        self.client_id = client_id
+        self.worker = worker
+        self.dropped_snapshots = 0  # The front connection's count, as last reported over the pipe
+
+    def send_snapshot(self, data):
+        self.worker.queue(self.client_id, False, data)
+
+    def send_reliable(self, data):
+        self.worker.queue(self.client_id, True, data)
+
+
+class RoomWorker:
+    """Runs the rooms placed on one worker process"""
+    def __init__(self, conn, worker_index, record_dir=None):
+        self.conn = conn
+        self.worker_index = worker_index
+        self.record_dir = record_dir
+        self.rooms = {}  # Maps room_id to AsteroidsServer
+        self.tasks = {}  # Maps room_id to the room's game loop task
+        self.connections = {}  # Maps client_id to its WorkerConnection
+        self.outbox = []
+        self.flush_scheduled = False
+        self.loop = None
+        self.done = None
+
+    async def run(self):
+        """Serve commands from the front process until told to stop"""
+        self.loop = asyncio.get_running_loop()
+        self.done = self.loop.create_future()
+        self.loop.add_reader(self.conn.fileno(), self.on_readable)
+        report_task = asyncio.create_task(self.report_load())
+        logger.info(f"Room worker {self.worker_index} started")
+
+        try:
+            await self.done
+        finally:
+            report_task.cancel()
+            self.loop.remove_reader(self.conn.fileno())
+            for room in self.rooms.values():
+                room.stop()
+            for task in self.tasks.values():
+                task.cancel()
+
+    def on_readable(self):
+        """Handle every command waiting in the pipe"""
+        try:
+            while self.conn.poll():
+                self.handle(self.conn.recv())
+        except (EOFError, OSError):
+            # Front process went away
+            if not self.done.done():
+                self.done.set_result(None)
+
+    def handle(self, command):
+        """Apply one command from the front process"""
+        # Imported here because server imports this module
+        from server import AsteroidsServer, open_recorder
+
+        kind = command[0]
+        try:
+            if kind == "message":
+                _, room_id, client_id, data = command
+                room = self.rooms.get(room_id)
+                if room:
+                    room.process_message(client_id, data)
+            elif kind == "join":
+                _, room_id, client_id, player_name, encoding = command
+                connection = WorkerConnection(client_id, self)
+                self.connections[client_id] = connection
+                self.rooms[room_id].register(client_id, connection, player_name, encoding)
+            elif kind == "leave":
+                _, room_id, client_id = command
+                self.connections.pop(client_id, None)
+                room = self.rooms.get(room_id)
+                if room:
+                    room.unregister(client_id)
+            elif kind == "drops":
+                for client_id, dropped_snapshots in command[1].items():
+                    connection = self.connections.get(client_id)
+                    if connection:
+                        connection.dropped_snapshots = dropped_snapshots
+            elif kind == "create_room":
+                _, room_id, max_players, mode = command
+                room = AsteroidsServer(room_id=room_id, max_players=max_players,
+                                       recorder=open_recorder(self.record_dir, room_id), mode=mode)
+                self.rooms[room_id] = room
+                self.tasks[room_id] = asyncio.create_task(room.game_loop())
+            elif kind == "close_room":
+                _, room_id = command
+                room = self.rooms.pop(room_id, None)
+                if room:
+                    room.stop()
+                    self.tasks.pop(room_id).cancel()
+            elif kind == "stop":
+                if not self.done.done():
+                    self.done.set_result(None)
+        except Exception as e:
+            logger.error(f"Room worker {self.worker_index} failed to handle {kind}: {str(e)}", exc_info=True)
+            if kind == "join":
+                # The front still counts the player as in the room until told otherwise
+                self.flush()
+                self.conn.send(("join_failed", command[2]))
+
+    def queue(self, client_id, reliable, data):
+        """Queue outbound data; everything queued in one loop iteration goes in one pipe message"""
+        self.outbox.append((client_id, reliable, data))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.loop.call_soon(self.flush)
+
+    def flush(self):
+        """Send queued outbound data to the front process"""
+        self.flush_scheduled = False
+        if self.outbox:
+            outbox, self.outbox = self.outbox, []
+            self.conn.send(("out", outbox))
+
+    async def report_load(self):
+        """Periodically tell the front process how busy this worker is, and send its rooms' counters"""
+        while True:
+            await asyncio.sleep(LOAD_REPORT_INTERVAL)
+            busy = sum(room.tick_time * room.simulation_rate for room in self.rooms.values())
+            stats = {room_id: room.stats() for room_id, room in self.rooms.items()}
+            self.conn.send(("load", busy, len(self.rooms), stats))
+
+
+def worker_main(conn, worker_index, record_dir=None):
+    """Entry point of a room worker process"""
+    try:
+        asyncio.run(RoomWorker(conn, worker_index, record_dir).run())
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerPool:
+    """Front-process side of the room workers: starts them, places rooms and relays traffic"""
+    def __init__(self, size, record_dir=None):
+        self.size = size
+        self.record_dir = record_dir
+        self.processes = []
+        self.pipes = []
+        self.loads = [0.0] * size  # Busy fraction reported by each worker
+        self.room_counts = [0] * size
+        self.room_stats = [{} for _ in range(size)]  # Latest counters of each worker's rooms
+        self.connections = {}  # Maps client_id to the front's ClientConnection
+        self.join_errors = {}  # Maps client_id to the callback for a failed join
+        self.reported_drops = {}  # Maps client_id to the dropped-snapshot count last sent to its worker
+        self.client_ids = itertools.count(1)
+
+    def start(self):
+        """Start the worker processes and listen for their output"""
+        # Spawn rather than fork, since the front process is already running an event loop
+        context = multiprocessing.get_context("spawn")
+        loop = asyncio.get_running_loop()
+        for worker_index in range(self.size):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=worker_main, args=(child_conn, worker_index, self.record_dir), daemon=True)
+            process.start()
+            child_conn.close()
+            self.processes.append(process)
+            self.pipes.append(parent_conn)
+            loop.add_reader(parent_conn.fileno(), self.on_readable, worker_index)
+        logger.info(f"Started {self.size} room worker processes")
+
+    def stop(self):
+        """Ask every worker to stop and wait for it"""
+        loop = asyncio.get_running_loop()
+        for worker_index, conn in enumerate(self.pipes):
+            loop.remove_reader(conn.fileno())
+            try:
+                conn.send(("stop",))
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+
+    def send(self, worker_index, command):
+        """Send a command to a worker"""
+        self.pipes[worker_index].send(command)
+
+    def place_room(self, room_id, max_players, mode):
+        """Create a room on the least loaded worker and return that worker's index"""
+        worker_index = min(range(self.size), key=lambda i: (self.loads[i], self.room_counts[i]))
+        self.loads[worker_index] += NEW_ROOM_LOAD_ESTIMATE
+        self.room_counts[worker_index] += 1
+        self.send(worker_index, ("create_room", room_id, max_players, mode))
+        logger.info(f"Placed {mode} room {room_id} on worker {worker_index} (load {self.loads[worker_index]:.2f})")
+        return worker_index
+
+    def close_room(self, worker_index, room_id):
+        """Remove a room from its worker"""
+        self.room_counts[worker_index] -= 1
+        self.send(worker_index, ("close_room", room_id))
+
+    def attach(self, connection, on_error=None):
+        """Register a client connection so worker output can reach it, and on_error is called if its join fails"""
+        client_id = next(self.client_ids)
+        self.connections[client_id] = connection
+        if on_error is not None:
+            self.join_errors[client_id] = on_error
+        return client_id
+
+    def detach(self, client_id):
+        """Forget a client connection"""
+        self.connections.pop(client_id, None)
+        self.join_errors.pop(client_id, None)
+        self.reported_drops.pop(client_id, None)
+
+    def on_readable(self, worker_index):
+        """Relay everything a worker has sent"""
+        conn = self.pipes[worker_index]
+        try:
+            while conn.poll():
+                message = conn.recv()
+                if message[0] == "out":
+                    drops = {}
+                    for client_id, reliable, data in message[1]:
+                        connection = self.connections.get(client_id)
+                        if connection is None:
+                            continue
+                        if reliable:
+                            connection.send_reliable(data)
+                        else:
+                            connection.send_snapshot(data)
+                            # Snapshots are dropped here, when a newer one replaces one
+                            # still unsent, so the worker's snapshot budgets hear of it now
+                            if connection.dropped_snapshots != self.reported_drops.get(client_id, 0):
+                                drops[client_id] = self.reported_drops[client_id] = connection.dropped_snapshots
+                    if drops:
+                        self.send(worker_index, ("drops", drops))
+                elif message[0] == "join_failed":
+                    on_error = self.join_errors.pop(message[1], None)
+                    if on_error is not None:
+                        on_error()
+                elif message[0] == "load":
+                    _, self.loads[worker_index], self.room_counts[worker_index], self.room_stats[worker_index] = message
+        except (EOFError, OSError):
+            logger.error(f"Room worker {worker_index} exited")
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+
+
+class RemoteRoom:
+    """Front-process proxy for a room that runs on a worker"""
+    def __init__(self, room_id, pool, worker_index, max_players, mode):
+        self.room_id = room_id
+        self.mode = mode
+        self.pool = pool
+        self.worker_index = worker_index
+        self.max_players = max_players
+        self.clients = {}  # Maps WebSocket to client_id
+
+    def is_full(self):
+        return len(self.clients) >= self.max_players
+
+    def is_empty(self):
+        return not self.clients
+
+    def register(self, websocket, connection, player_name, encoding, on_error=None):
+        # The worker registers the player; if that fails, on_error is called when it reports back
+        client_id = self.pool.attach(connection, on_error)
+        self.clients[websocket] = client_id
+        self.pool.send(self.worker_index, ("join", self.room_id, client_id, player_name, encoding))
+
+    def unregister(self, websocket):
+        client_id = self.clients.pop(websocket, None)
+        if client_id is not None:
+            self.pool.send(self.worker_index, ("leave", self.room_id, client_id))
+            self.pool.detach(client_id)
+
+    def stats(self):
+        """Get the counters from the worker's latest report, or None before its first one"""
+        return self.pool.room_stats[self.worker_index].get(self.room_id)
+
+    def process_message(self, websocket, message):
+        client_id = self.clients.get(websocket)
+        if client_id is not None:
+            self.pool.send(self.worker_index, ("message", self.room_id, client_id, message))
@@ -1,22 +1,41 @@
+import argparse
 import asyncio
+import functools
+import itertools
 import json
 import logging
+import math
 import os
 import random
+import re
+import secrets
+import sys
 import time
 import uuid
 from datetime import datetime
+import numpy as np
 import websockets
 from aiohttp import web
-import pygame
 
-# Import game objects (without initializing pygame's display)
-os.environ["SDL_VIDEODRIVER"] = "dummy"  # Headless mode for server
-pygame.init()
-pygame.mixer.init()
-
-from ship import Ship
-from asteroid import Asteroid
+# Import game objects (render-free, so the server doesn't need pygame)
+from ship_model import ShipModel
+from connection import ClientConnection
+from entity_store import EntityStore
+from entity_history import PositionHistory
+from spatial_hash import SpatialHash
+from input_queue import InputQueue
+from match_log import MatchRecorder, KEYFRAME_TICKS
+from metrics import RoomMetrics, ServerMetrics, render_prometheus
+from rate_limit import InboundLimiter, MAX_MESSAGE_SIZE
+from room_thread import ThreadedRoom, SWITCH_INTERVAL
+from lockstep import MODE_SNAPSHOT, MODE_LOCKSTEP, MODES, CHECK_TICKS, LockstepRelay
+from precision import DEFAULT_PRECISION
+from priority import CLIENT_BANDWIDTH, PRIORITY_WEIGHTS, PRIORITY_FALLOFF, ENTITY_BYTES, SnapshotBudget
+from static_assets import StaticAssets
+from snapshot import ENTITY_SECTIONS, SnapshotHistory, ClientSnapshotState, EventLog, snapshot_message
+from wire import (ENCODING_JSON, ENCODING_BINARY, ENCODINGS, FragmentCache, encode_snapshot, encode_json_snapshot,
+                  encode_json_fragment, encode_record, decode_client_message)
+from room_workers import WorkerPool, RemoteRoom
 
 # Configure logging
 logging.basicConfig(
@@ -26,17 +45,80 @@ logging.basicConfig(
 logger = logging.getLogger("asteroids_server")
 
 # Game constants
-SCREEN_WIDTH = 1024
+SCREEN_WIDTH = 1024  # Size of a client's view of the arena
 SCREEN_HEIGHT = 768
-UPDATE_RATE = 1 / 60  # 60 FPS
+ARENA_WIDTH = 2048  # Size of the world, which wraps around at the edges
+ARENA_HEIGHT = 1536
+AOI_MARGIN = 200  # Entities this far beyond the edge of a player's view are still sent to them
+SIMULATION_RATE = 60  # Fixed simulation steps per second
+SNAPSHOT_RATE = 20  # Snapshots sent to clients per second
+BASE_STEP = 1 / 60  # Per-step speeds below are tuned for 60 steps per second
+MAX_CATCHUP_STEPS = 5  # Most simulation steps run back-to-back before dropping time
+TICK_TIME_SMOOTHING = 0.05  # Weight of the newest sample in the moving average of tick time
+ROOM_STOP_TIMEOUT = 2.0  # Seconds to wait for a room's simulation thread when shutting down
 MAX_PLAYERS = 8
+LASER_SPEED = 10
+LASER_LIFETIME = 1.5  # Seconds (counted in simulation ticks, so it doesn't depend on the wall clock)
+FIRE_COOLDOWN = 0.1  # Seconds a ship must wait between shots, however fast its client sends fire inputs
+MAX_LASERS_PER_PLAYER = 8  # Live lasers a ship may have; shots beyond this are dropped
+ASTEROID_MIN_SPEED = 1.2  # Asteroid speeds and spins match asteroid.Asteroid in single-player
+ASTEROID_MIN_AXIS_SPEED = 0.5
+ASTEROID_MAX_SPIN = 2  # Degrees per step
+MAX_REWIND_TICKS = 15  # Most lag compensation given to a shot (250ms at 60 ticks per second)
+INPUT_LEAD_TICKS = 3  # How far past the tick on their screen clients aim their inputs (as in client.js)
+
+def asteroid_radius(level):
+    """Get the collision radius of an asteroid (larger level = smaller asteroid)"""
+    return (4 - level) * 15
+
+def open_recorder(record_dir, room_id):
+    """Start a match log for a room in record_dir, or return None if recording is off"""
+    if not record_dir:
+        return None
+    # Room ids come from clients, so only safe characters make it into the
+    # file name, and a random suffix keeps same-named rooms apart
+    name = re.sub(r"[^A-Za-z0-9_-]", "_", room_id) or "room"
+    path = os.path.join(record_dir, f"{name}-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.rec")
+    logger.info(f"Recording room {room_id} to {path}")
+    return MatchRecorder(path)
+
+def wrap_delta(delta, size):
+    """Get the shortest signed distance along a wrapping axis (works on floats and NumPy arrays)"""
+    return (delta + size / 2) % size - size / 2
 
 class AsteroidsServer:
-    def __init__(self):
+    """A single game room: one simulated world shared by up to max_players players"""
+    def __init__(self, room_id="main", max_players=MAX_PLAYERS, simulation_rate=SIMULATION_RATE, snapshot_rate=SNAPSHOT_RATE,
+                 arena_width=ARENA_WIDTH, arena_height=ARENA_HEIGHT, seed=None, recorder=None, mode=MODE_SNAPSHOT,
+                 precision=DEFAULT_PRECISION, client_bandwidth=CLIENT_BANDWIDTH):
+        self.room_id = room_id
+        self.mode = mode
+        self.max_players = max_players
+        self.arena_width = arena_width
+        self.arena_height = arena_height
+        precision.check_arena(arena_width, arena_height)
+        self.precision = precision  # PrecisionProfile that snapshot fields are quantized to
         self.clients = {}  # Maps WebSocket to player_id
-        self.ships = {}  # Maps player_id to Ship object
-        self.asteroids = []  # List of asteroids
-        self.lasers = []  # List of lasers
+        self.connections = {}  # Maps WebSocket to its ClientConnection (outbound queues)
+        self.ships = {}  # Maps player_id to ShipModel
+        self.input_queues = {}  # Maps player_id to InputQueue, drained at tick boundaries
+        self.fire_ticks = {}  # Maps player_id to the tick of its ship's last shot
+        self.asteroids = EntityStore()  # Column store of asteroids
+        self.lasers = EntityStore(capacity=max_players * MAX_LASERS_PER_PLAYER)  # Column store of lasers, sized for the per-player cap so it never grows
+        # All of the room's randomness comes from its seed, so a recorded match can be re-simulated
+        self.seed = seed if seed is not None else secrets.randbits(63)
+        self.random = random.Random(self.seed)
+        self.recorder = recorder  # Optional MatchRecorder
+        self.lockstep = None
+        if mode == MODE_LOCKSTEP:
+            # Participants get the same joins, leaves and inputs a recording would, and simulate them
+            self.lockstep = LockstepRelay(recorder)
+            self.recorder = self.lockstep
+        self.now = time.time()  # Wall-clock time of the current simulation step
+        self.asteroid_grid = SpatialHash(wrap=(arena_width, arena_height))  # Broadphase over asteroid indexes, rebuilt per collision pass
+        self.asteroid_history = PositionHistory(MAX_REWIND_TICKS + 1, wrap=(arena_width, arena_height))  # Recent asteroid positions for lag compensation
+        self.rewind_time = 0.0  # Moving average of seconds per tick spent on lag compensation
+        self.metrics = RoomMetrics()  # Per-phase timers and counters, served on /metrics and /stats
         self.game_state = {
             "ships": {},
             "asteroids": [],
@@ -45,81 +127,223 @@ class AsteroidsServer:
             "level": 1,
         }
         self.running = False
-        self.last_update = time.time()
+        self.simulation_rate = simulation_rate
+        self.snapshot_rate = snapshot_rate
+        self.laser_lifetime = round(LASER_LIFETIME * simulation_rate)  # In ticks
+        self.fire_cooldown = max(round(FIRE_COOLDOWN * simulation_rate), 1)  # In ticks
+        self.tick = 0
+        self.tick_time = 0.0  # Moving average of seconds spent per simulation step
+        self.snapshots = SnapshotHistory()  # Recent unfiltered world snapshots
+        self.snapshot_positions = None  # Entity ids and positions of the latest world snapshot, for filtering
+        self.client_snapshots = {}  # Maps WebSocket to ClientSnapshotState
+        self.client_encodings = {}  # Maps WebSocket to its negotiated wire encoding
+        self.client_budgets = {}  # Maps WebSocket to its SnapshotBudget, unless snapshots are unlimited
+        self.snapshot_budget = client_bandwidth // snapshot_rate if client_bandwidth else None  # Bytes per snapshot per client
+        self.events = EventLog()  # Joins, leaves, hits and spawns, delivered with the snapshots that follow them
+        # Ship and asteroid dicts are reused between snapshots until a field
+        # changes, so their encoded forms can be cached and shared by every client
+        self.snapshot_entities = {"ships": {}, "asteroids": {}}  # Entity dicts of the last snapshot built
+        self.json_fragments = FragmentCache(encode_json_fragment)
+        self.binary_fragments = FragmentCache(functools.partial(encode_record, arena=(arena_width, arena_height), precision=precision))
+        self.next_entity_id = 1  # Small integer ids for asteroids and lasers
+        self.net_ids = {}  # Maps player_id to a one-byte network id
+        self.next_net_id = 0
         self.color_indexes = list(range(8))  # 8 unique colors
-        random.shuffle(self.color_indexes)  # Randomize colors
+        self.random.shuffle(self.color_indexes)  # Randomize colors
+        
+        if self.recorder:
+            self.recorder.header({
+                "room_id": room_id,
+                "seed": self.seed,
+                "max_players": max_players,
+                "simulation_rate": simulation_rate,
+                "snapshot_rate": snapshot_rate,
+                "arena_width": arena_width,
+                "arena_height": arena_height,
+                "precision": precision.to_dict(),
+                "started": self.now,
+            })
         
         # Create initial asteroids
         self.create_asteroids(10)
         
-        logger.info("Asteroids server initialized")
+        logger.info(f"Room {self.room_id} initialized")
     
     def create_asteroids(self, count):
         """Create a number of asteroids"""
+        width, height = self.arena_width, self.arena_height
         for _ in range(count):
-            # Choose a spawn area outside the center of the screen
-            spawn_area = random.random()
+            # Choose a spawn area outside the center of the arena
+            spawn_area = self.random.random()
             
             if spawn_area < 0.25:
                 # Top
-                x = random.randint(0, SCREEN_WIDTH)
+                x = self.random.randint(0, width)
                 y = -50
             elif spawn_area < 0.5:
                 # Right
-                x = SCREEN_WIDTH + 50
-                y = random.randint(0, SCREEN_HEIGHT)
+                x = width + 50
+                y = self.random.randint(0, height)
             elif spawn_area < 0.75:
                 # Bottom
-                x = random.randint(0, SCREEN_WIDTH)
-                y = SCREEN_HEIGHT + 50
+                x = self.random.randint(0, width)
+                y = height + 50
             else:
                 # Left
                 x = -50
-                y = random.randint(0, SCREEN_HEIGHT)
+                y = self.random.randint(0, height)
                 
             # Create the asteroid with random position and properties
-            asteroid = {"x": x, "y": y, "level": random.randint(1, 3), "id": str(uuid.uuid4())}
-            self.asteroids.append(asteroid)
+            self.spawn_asteroid(x % width, y % height, self.random.randint(1, 3))
+    
+    def spawn_asteroid(self, x, y, level):
+        """Add an asteroid with a seeded velocity and spin, and return its index"""
+        # Smaller asteroids are faster, and none crawl along either axis
+        speed = max(ASTEROID_MIN_SPEED, (self.random.random() * 3.5 + 0.8) / level)
+        heading = self.random.random() * 2 * math.pi
+        vx = math.cos(heading) * speed
+        vy = math.sin(heading) * speed
+        if abs(vx) < ASTEROID_MIN_AXIS_SPEED:
+            vx = ASTEROID_MIN_AXIS_SPEED if vx >= 0 else -ASTEROID_MIN_AXIS_SPEED
+        if abs(vy) < ASTEROID_MIN_AXIS_SPEED:
+            vy = ASTEROID_MIN_AXIS_SPEED if vy >= 0 else -ASTEROID_MIN_AXIS_SPEED
+        
+        # The motion never changes after this, so clients can dead-reckon the
+        # asteroid from its spawn state; snapshots only change when it does.
+        # The state is quantized the way snapshots send it, so the server's
+        # asteroid is exactly where the clients work out it is
+        precision = self.precision
+        return self.asteroids.add(
+            self.allocate_entity_id(),
+            precision.position(x, self.arena_width), precision.position(y, self.arena_height),
+            vx=precision.velocity(vx), vy=precision.velocity(vy), level=level,
+            spin=precision.velocity(self.random.uniform(-ASTEROID_MAX_SPIN, ASTEROID_MAX_SPIN)),
+            spawn_tick=self.tick,
+        )
+    
+    def spawn_position(self):
+        """Get a random ship spawn point away from the edges of the arena"""
+        return (
+            self.random.randint(self.arena_width // 4, 3 * self.arena_width // 4),
+            self.random.randint(self.arena_height // 4, 3 * self.arena_height // 4),
+        )
     
     def get_player_color_idx(self):
         """Get a unique color index for a new player"""
         if not self.color_indexes:
             # If all colors are taken, start recycling them
             self.color_indexes = list(range(8))
-            random.shuffle(self.color_indexes)
+            self.random.shuffle(self.color_indexes)
         return self.color_indexes.pop(0)
     
-    async def register(self, websocket, player_name):
-        """Register a new player"""
+    def allocate_entity_id(self):
+        """Get a new id for an asteroid or laser"""
+        entity_id = self.next_entity_id
+        self.next_entity_id += 1
+        return entity_id
+    
+    def allocate_net_id(self):
+        """Get a one-byte network id for a new player"""
+        # Ids are handed out round-robin so a departed player's id isn't reused
+        # while clients may still hold snapshots that reference it
+        in_use = set(self.net_ids.values())
+        for _ in range(256):
+            net_id = self.next_net_id
+            self.next_net_id = (self.next_net_id + 1) % 256
+            if net_id not in in_use:
+                return net_id
+        raise RuntimeError("No free network ids")
+    
+    def roster(self):
+        """Get the player list that maps network ids to player details"""
+        return {
+            net_id: {
+                "player_id": player_id,
+                "player_name": self.ships[player_id].player_name,
+                "color_idx": self.ships[player_id].color_idx,
+            }
+            for player_id, net_id in self.net_ids.items()
+        }
+    
+    def is_full(self):
+        """Check whether the room has reached its player limit"""
+        return len(self.clients) >= self.max_players
+    
+    def is_empty(self):
+        """Check whether the room has no players left"""
+        return not self.clients
+    
+    def register(self, websocket, connection, player_name, encoding=ENCODING_JSON, player_id=None):
+        """Register a new player (player_id is only passed when replaying a recorded match)"""
+        if self.is_full():
+            raise RuntimeError(f"Room {self.room_id} is full")
+        
         try:
-            player_id = str(uuid.uuid4())
+            player_id = player_id or str(uuid.uuid4())
             color_idx = self.get_player_color_idx()
+            net_id = self.allocate_net_id()
             
             # Create a new ship for the player at a random position
-            x = random.randint(SCREEN_WIDTH // 4, 3 * SCREEN_WIDTH // 4)
-            y = random.randint(SCREEN_HEIGHT // 4, 3 * SCREEN_HEIGHT // 4)
+            x, y = self.spawn_position()
             
             logger.info(f"Creating ship for player {player_name} with ID {player_id}")
-            ship = Ship(x, y, player_id=player_id, player_name=player_name, color_idx=color_idx)
+            ship = ShipModel(x, y, player_id=player_id, player_name=player_name, color_idx=color_idx,
+                             arena=(self.arena_width, self.arena_height))
             ship.set_invulnerable()  # Make the ship invulnerable when joining
             
             # Store client and ship
             self.clients[websocket] = player_id
+            self.connections[websocket] = connection
+            self.client_snapshots[websocket] = ClientSnapshotState(joined_tick=self.tick)
+            self.client_encodings[websocket] = encoding
+            if self.snapshot_budget is not None:
+                self.client_budgets[websocket] = SnapshotBudget(self.snapshot_budget)
             self.ships[player_id] = ship
+            self.input_queues[player_id] = InputQueue()
+            self.net_ids[player_id] = net_id
             self.game_state["scores"][player_id] = 0
             
-            logger.info(f"Player {player_name} ({player_id}) connected")
+            if self.recorder:
+                self.recorder.join({
+                    "tick": self.tick,
+                    "player_id": player_id,
+                    "player_name": player_name,
+                    "net_id": net_id,
+                    "encoding": encoding,
+                })
             
-            # Send initial game state to the new player
-            await self.send_game_state(websocket)
+            logger.info(f"Player {player_name} ({player_id}) joined room {self.room_id} using {encoding} encoding")
             
-            # Broadcast updated player list
-            await self.broadcast({"type": "player_joined", "player_id": player_id, "player_name": player_name})
+            # Tell the new player who they are and how snapshots will be encoded
+            self.connections[websocket].send_reliable(json.dumps({
+                "type": "welcome",
+                "room": self.room_id,
+                "player_id": player_id,
+                "net_id": net_id,
+                "encoding": encoding,
+                "mode": self.mode,
+                "tick": self.tick,
+                "simulation_rate": self.simulation_rate,
+                "arena": {"width": self.arena_width, "height": self.arena_height},
+                "precision": self.precision.to_dict(),
+                "players": self.roster(),
+            }))
+            
+            # Players join between ticks, so the join belongs to the next one. Everyone,
+            # including the new player, hears of it with the next snapshot (a keyframe for them)
+            self.events.add(self.tick + 1, {
+                "type": "player_joined",
+                "player_id": player_id,
+                "player_name": player_name,
+                "net_id": net_id,
+                "color_idx": color_idx,
+            })
+            self.events.add(self.tick + 1, {"type": "spawn", "player_id": player_id, "x": x, "y": y})
         except Exception as e:
             logger.error(f"Error registering player {player_name}: {str(e)}", exc_info=True)
             raise
     
-    async def unregister(self, websocket):
+    def unregister(self, websocket):
         """Unregister a player when they disconnect"""
         if websocket in self.clients:
             player_id = self.clients[websocket]
@@ -127,300 +351,945 @@ class AsteroidsServer:
             
             # Free up the color index
             if player_id in self.ships:
-                color_idx = self.ships[player_id].to_dict()["color_idx"]
+                color_idx = self.ships[player_id].color_idx
                 if color_idx not in self.color_indexes:
                     self.color_indexes.append(color_idx)
             
+            if self.recorder and player_id in self.net_ids:
+                self.recorder.leave(self.net_ids[player_id])
+            if self.lockstep:
+                self.lockstep.forget(websocket)
+            
             # Remove player data
             del self.clients[websocket]
+            self.connections.pop(websocket, None)
+            self.client_snapshots.pop(websocket, None)
+            self.client_encodings.pop(websocket, None)
+            self.client_budgets.pop(websocket, None)
+            self.net_ids.pop(player_id, None)
+            self.input_queues.pop(player_id, None)
+            self.fire_ticks.pop(player_id, None)
             if player_id in self.ships:
                 del self.ships[player_id]
             if player_id in self.game_state["scores"]:
                 del self.game_state["scores"][player_id]
             
-            logger.info(f"Player {player_name} ({player_id}) disconnected")
+            logger.info(f"Player {player_name} ({player_id}) left room {self.room_id}")
             
-            # Broadcast player left
-            await self.broadcast({"type": "player_left", "player_id": player_id, "player_name": player_name})
+            # Like joins, leaves belong to the next tick
+            self.events.add(self.tick + 1, {"type": "player_left", "player_id": player_id, "player_name": player_name})
     
-    async def process_message(self, websocket, message):
-        """Process a message from a client"""
+    def process_message(self, websocket, message):
+        """Process a message from a player in this room"""
         try:
-            logger.debug(f"Processing message: {message}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Processing message: {message}")
             
             if "type" not in message:
                 logger.warning(f"Message missing 'type' field: {message}")
                 return
                 
             player_id = self.clients.get(websocket)
-            if not player_id and message["type"] != "join":
+            if not player_id:
                 logger.warning(f"Message from unregistered client: {message}")
                 return
             
             if message["type"] == "input":
-                # Update the player's ship based on input
-                if player_id in self.ships:
-                    ship = self.ships[player_id]
-                    inputs = message["data"]
-                    
-                    if "rotation" in inputs:
-                        ship.rotate(inputs["rotation"])
-                    if "thrust" in inputs:
-                        ship.thrust(inputs["thrust"])
-                    if "fire" in inputs and inputs["fire"]:
-                        # Create a new laser
-                        laser_x = ship.rect.centerx + ship.radius * pygame.math.Vector2(1, 0).rotate(-ship.angle).x
-                        laser_y = ship.rect.centery + ship.radius * pygame.math.Vector2(1, 0).rotate(-ship.angle).y
-                        laser = {
-                            "x": laser_x,
-                            "y": laser_y,
-                            "angle": ship.angle,
-                            "player_id": player_id,
-                            "id": str(uuid.uuid4()),
-                            "created": time.time(),
-                            "lifetime": 1.5,  # 1.5 seconds lifetime
-                            "speed": 10,
-                        }
-                        self.lasers.append(laser)
+                # Hold the input until the tick it targets; it's applied in update_game
+                queue = self.input_queues.get(player_id)
+                if queue and isinstance(message.get("data"), dict):
+                    seq = message.get("seq")
+                    tick = message.get("tick")
+                    # Clients draw the world at their estimate of the server's tick,
+                    # and aim inputs a few ticks past it; that's the tick shots rewind to
+                    view_tick = min(max(tick - INPUT_LEAD_TICKS, 0), self.tick) if isinstance(tick, int) else None
+                    if not queue.push(seq if isinstance(seq, int) else None, tick, message["data"], self.tick, view_tick):
+                        logger.debug(f"Dropped duplicate input {seq} from {player_id}")
             
             elif message["type"] == "join":
-                # Register a new player
-                if "player_name" not in message:
-                    logger.warning("Join message missing player_name")
-                    return
-                    
-                await self.register(websocket, message["player_name"])
+                logger.warning(f"Player {player_id} is already in room {self.room_id}")
+            
+            elif message["type"] == "ack":
+                # Client confirmed it has this snapshot, so it can be used as a delta baseline
+                state = self.client_snapshots.get(websocket)
+                if state and isinstance(message.get("tick"), int):
+                    state.ack(message["tick"])
             else:
                 logger.warning(f"Unknown message type: {message['type']}")
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}", exc_info=True)
     
-    async def handle_client(self, websocket, path=None):
-        """Handle a client connection"""
-        logger.info(f"New client connection from {websocket.remote_address}")
-        try:
-            async for message in websocket:
-                try:
-                    data = json.loads(message)
-                    logger.debug(f"Received message: {data}")
-                    await self.process_message(websocket, data)
-                except json.JSONDecodeError:
-                    logger.warning("Received invalid JSON")
-                except Exception as e:
-                    logger.error(f"Error processing message: {str(e)}", exc_info=True)
-        except websockets.exceptions.ConnectionClosed as e:
-            logger.info(f"Connection closed: {e.code} - {e.reason}")
-        except Exception as e:
-            logger.error(f"Unexpected error in client handler: {str(e)}", exc_info=True)
-        finally:
-            logger.info(f"Client disconnected: {websocket.remote_address}")
-            await self.unregister(websocket)
+    def apply_input(self, player_id, inputs, view_tick=None):
+        """Update a player's ship from one input message, sent while the player was looking at view_tick"""
+        ship = self.ships[player_id]
+        
+        if "rotation" in inputs:
+            ship.rotate(inputs["rotation"])
+        if "thrust" in inputs:
+            ship.thrust(inputs["thrust"])
+        if "fire" in inputs and inputs["fire"] and self.can_fire(player_id):
+            # Create a new laser, with its velocity worked out once
+            self.fire_ticks[player_id] = self.tick
+            laser_x, laser_y = ship.nose()
+            angle_rad = math.radians(ship.angle)
+            self.lasers.add(
+                self.allocate_entity_id(), laser_x, laser_y,
+                vx=LASER_SPEED * math.cos(angle_rad),
+                vy=-LASER_SPEED * math.sin(angle_rad),
+                angle=ship.angle,
+                owner=self.net_ids[player_id],
+                spawn_tick=self.tick,
+                rewind=self.rewind_ticks(view_tick),
+            )
     
-    async def broadcast(self, message):
-        """Send a message to all connected clients"""
-        if not self.clients:
-            return
+    def can_fire(self, player_id):
+        """Check a ship's fire cooldown and live laser cap, counting shots they refuse"""
+        last_fire_tick = self.fire_ticks.get(player_id)
+        if (last_fire_tick is not None and self.tick - last_fire_tick < self.fire_cooldown) or \
+                self.lasers.count_owned(self.net_ids[player_id]) >= MAX_LASERS_PER_PLAYER:
+            self.metrics.shots_dropped += 1
+            return False
+        return True
+    
+    def rewind_ticks(self, view_tick):
+        """Get how many ticks to rewind a shot's hit tests so they match what the shooter saw"""
+        if view_tick is None:
+            return 0
+        return min(max(self.tick - view_tick, 0), MAX_REWIND_TICKS)
+    
+    def apply_inputs(self):
+        """Apply every queued input that targets the current tick (or earlier)"""
+        for player_id in self.clients.values():
+            due = self.input_queues[player_id].pop_due(self.tick)
+            if not due:
+                continue
+            
+            for inputs, view_tick in due:
+                # Lockstep participants see the world as of the inputs, so their shots aren't rewound
+                if self.lockstep:
+                    view_tick = None
+                if self.recorder:
+                    self.recorder.input(self.net_ids[player_id], inputs, view_tick)
+                self.apply_input(player_id, inputs, view_tick)
+    
+    def input_seq(self, websocket):
+        """Get the last input sequence number applied for a client's player"""
+        queue = self.input_queues.get(self.clients[websocket])
+        return queue.last_applied_seq if queue else None
+    
+    def player_for_net_id(self):
+        """Get a map from network id to player_id"""
+        return {net_id: player_id for player_id, net_id in self.net_ids.items()}
+    
+    def checkpoint(self):
+        """Get everything the simulation depends on, for lockstep participants that join late to start from"""
+        # Asteroid history is left out: lockstep shots aren't rewound
+        version, internal, gauss_next = self.random.getstate()
+        return {
+            "tick": self.tick,
+            "level": self.game_state["level"],
+            "random": [version, list(internal), gauss_next],
+            "next_entity_id": self.next_entity_id,
+            "next_net_id": self.next_net_id,
+            "color_indexes": list(self.color_indexes),
+            # In the order they joined, which is the order inputs are applied in
+            "players": [
+                {
+                    "net_id": self.net_ids[player_id],
+                    "encoding": self.client_encodings.get(websocket, ENCODING_JSON),
+                    "score": self.game_state["scores"].get(player_id, 0),
+                    "fire_tick": self.fire_ticks.get(player_id),
+                    "ship": self.ships[player_id].state(),
+                }
+                for websocket, player_id in self.clients.items()
+            ],
+            "asteroids": self.asteroids.state(),
+            "lasers": self.lasers.state(),
+        }
+    
+    def restore(self, checkpoint, clients, connection):
+        """Replace the world with a checkpoint(); clients maps each player's net_id to the key to register them under"""
+        self.tick = checkpoint["tick"]
+        self.game_state["level"] = checkpoint["level"]
+        version, internal, gauss_next = checkpoint["random"]
+        self.random.setstate((version, tuple(internal), gauss_next))
+        self.next_entity_id = checkpoint["next_entity_id"]
+        self.next_net_id = checkpoint["next_net_id"]
+        self.color_indexes = list(checkpoint["color_indexes"])
+        self.asteroids.load(checkpoint["asteroids"])
+        self.lasers.load(checkpoint["lasers"])
+        self.snapshot_entities = {"ships": {}, "asteroids": {}}
         
-        message_data = json.dumps(message)
-        await asyncio.gather(
-            *[client.send(message_data) for client in self.clients],
-            return_exceptions=True
-        )
+        for player in checkpoint["players"]:
+            ship = ShipModel.from_state(player["ship"], arena=(self.arena_width, self.arena_height))
+            player_id = ship.player_id
+            websocket = clients[player["net_id"]]
+            self.clients[websocket] = player_id
+            self.connections[websocket] = connection
+            self.client_snapshots[websocket] = ClientSnapshotState(joined_tick=self.tick)
+            self.client_encodings[websocket] = player["encoding"]
+            if self.snapshot_budget is not None:
+                self.client_budgets[websocket] = SnapshotBudget(self.snapshot_budget)
+            self.ships[player_id] = ship
+            self.input_queues[player_id] = InputQueue()
+            self.net_ids[player_id] = player["net_id"]
+            self.game_state["scores"][player_id] = player["score"]
+            if player["fire_tick"] is not None:
+                self.fire_ticks[player_id] = player["fire_tick"]
     
-    async def send_game_state(self, websocket=None):
-        """Send the current game state to a specific client or all clients"""
-        # Update the game state dictionary
-        self.game_state["ships"] = {player_id: ship.to_dict() for player_id, ship in self.ships.items()}
-        self.game_state["asteroids"] = self.asteroids
-        self.game_state["lasers"] = self.lasers
-        
-        # Create the message
-        message = {
-            "type": "game_state",
-            "data": self.game_state,
-            "timestamp": time.time()
+    def build_snapshot(self):
+        """Build a snapshot of the world with entities keyed by id"""
+        # Lasers carry the tick they were fired on, which binary frames send as an age
+        lasers = self.lasers.serialize({"id": "id", "x": "x", "y": "y", "angle": "angle", "player_id": "owner", "tick": "spawn_tick"})
+        players = self.player_for_net_id()
+        for laser in lasers.values():
+            laser["player_id"] = players.get(laser["player_id"])
+            self.precision.quantize_laser(laser, self.arena_width, self.arena_height)
+        
+        previous = self.snapshot_entities
+        entities = {
+            "ships": {
+                player_id: self.ship_snapshot(player_id, ship, previous["ships"].get(player_id))
+                for player_id, ship in self.ships.items()
+            },
+            # Asteroids are sent as their spawn state: position, angle and tick at
+            # spawn, plus velocity and spin, which never changes once spawned
+            "asteroids": self.asteroids.serialize({
+                "id": "id", "x": "spawn_x", "y": "spawn_y", "vx": "vx", "vy": "vy",
+                "tick": "spawn_tick", "angle": "angle", "spin": "spin", "level": "level",
+            }, previous=previous["asteroids"]),
         }
+        self.snapshot_entities = entities
         
-        if websocket:
-            # Send to specific client
-            await websocket.send(json.dumps(message))
-        else:
-            # Broadcast to all clients
-            await self.broadcast(message)
+        return {
+            "ships": entities["ships"],
+            "asteroids": entities["asteroids"],
+            "lasers": lasers,
+            "scores": dict(self.game_state["scores"]),
+            "level": self.game_state["level"],
+        }
     
-    async def update_game(self):
-        """Update the game state"""
-        current_time = time.time()
-        dt = current_time - self.last_update
-        self.last_update = current_time
+    def ship_snapshot(self, player_id, ship, previous=None):
+        """Get a ship's snapshot dict, reusing the previous one if nothing in it changed"""
+        # Compared once quantized, so changes too small to send don't count
+        entity = self.precision.quantize_ship(dict(ship.to_dict(), net_id=self.net_ids[player_id]),
+                                              self.arena_width, self.arena_height)
+        return previous if previous == entity else entity
+    
+    def index_positions(self):
+        """Get (ids, x, y) arrays for each entity section, used to filter snapshots by area of interest"""
+        ships = list(self.ships.values())
+        positions = {
+            "ships": (
+                np.array([ship.player_id for ship in ships], dtype=object),
+                np.array([ship.x for ship in ships]),
+                np.array([ship.y for ship in ships]),
+            ),
+        }
+        for section, store in (("asteroids", self.asteroids), ("lasers", self.lasers)):
+            n = len(store)
+            positions[section] = (store.id[:n].copy(), store.x[:n].copy(), store.y[:n].copy())
+        return positions
+    
+    def build_view(self, player_id, snapshot, positions):
+        """Filter a world snapshot down to the entities inside a player's area of interest"""
+        ship = self.ships.get(player_id)
+        if ship is None:
+            return snapshot
         
-        # Update all ships
-        for ship in self.ships.values():
-            ship.update()
-        
-        # Update lasers
-        new_lasers = []
-        for laser in self.lasers:
-            # Move the laser
-            laser["x"] += laser["speed"] * pygame.math.Vector2(1, 0).rotate(-laser["angle"]).x
-            laser["y"] += laser["speed"] * pygame.math.Vector2(1, 0).rotate(-laser["angle"]).y
+        # The area of interest is the player's view plus a margin, centered on
+        # their ship and measured the short way around the wrapping arena
+        half_width = SCREEN_WIDTH / 2 + AOI_MARGIN
+        half_height = SCREEN_HEIGHT / 2 + AOI_MARGIN
+        
+        view = {"scores": snapshot["scores"], "level": snapshot["level"]}
+        for section, (ids, xs, ys) in positions.items():
+            inside = (
+                (np.abs(wrap_delta(xs - ship.x, self.arena_width)) <= half_width)
+                & (np.abs(wrap_delta(ys - ship.y, self.arena_height)) <= half_height)
+            )
+            entities = snapshot[section]
+            view[section] = {entity_id: entities[entity_id] for entity_id in ids[inside].tolist()}
+        return view
+    
+    def budget_view(self, budget, encoding, player_id, state, view, baseline):
+        """Trim a client's view to its snapshot byte budget, sending the most important and longest-waiting updates"""
+        ship = self.ships.get(player_id)
+        costs = ENTITY_BYTES[encoding]
+        remaining = budget.budget
+        
+        # A keyframe resends everything the client already has in full, so only
+        # entities new to it compete for the budget. In a delta every change does
+        known = baseline
+        if known is None and state.acked_tick is not None:
+            known = state.history.get(state.acked_tick)
+        
+        candidates = []
+        for section in ENTITY_SECTIONS:
+            entities = view[section]
+            have = known[section] if known is not None else {}
+            if baseline is None:
+                waiting = [entity_id for entity_id in entities if entity_id not in have]
+                remaining -= costs[section] * (len(entities) - len(waiting))
+            else:
+                waiting = [entity_id for entity_id, entity in entities.items()
+                           if have.get(entity_id) is not entity and have.get(entity_id) != entity]
+            if not waiting:
+                continue
             
-            # Check if the laser is still alive
-            if current_time - laser["created"] < laser["lifetime"]:
-                # Check if the laser is still on screen
-                if (0 <= laser["x"] <= SCREEN_WIDTH and 
-                    0 <= laser["y"] <= SCREEN_HEIGHT):
-                    new_lasers.append(laser)
+            # Nearer entities matter more, measured the short way around the arena
+            weight = PRIORITY_WEIGHTS[section]
+            if ship is None:
+                candidates.extend((section, entity_id, weight, costs[section]) for entity_id in waiting)
+                continue
+            ids, xs, ys = self.snapshot_positions[section]
+            distances = dict(zip(ids.tolist(), np.hypot(
+                wrap_delta(xs - ship.x, self.arena_width), wrap_delta(ys - ship.y, self.arena_height)).tolist()))
+            candidates.extend(
+                (section, entity_id, weight / (1 + distances[entity_id] / PRIORITY_FALLOFF), costs[section])
+                for entity_id in waiting
+            )
         
-        self.lasers = new_lasers
+        selected = budget.select(candidates, remaining)
+        if len(selected) == len(candidates):
+            return view
+        self.metrics.entities_deferred += len(candidates) - len(selected)
         
-        # Update asteroids
-        new_asteroids = []
-        for asteroid in self.asteroids:
-            # Calculate velocity based on level
-            velocity = (4 - asteroid["level"]) * 1.0
+        # Updates that didn't fit stay as the client last had them, or out of
+        # the view if it has never had them
+        deferred = {(section, entity_id) for section, entity_id, _, _ in candidates} - selected
+        trimmed = {"scores": view["scores"], "level": view["level"]}
+        for section in ENTITY_SECTIONS:
+            held = baseline[section] if baseline is not None else {}
+            trimmed[section] = {}
+            for entity_id, entity in view[section].items():
+                if (section, entity_id) not in deferred:
+                    trimmed[section][entity_id] = entity
+                elif entity_id in held:
+                    trimmed[section][entity_id] = held[entity_id]
+        return trimmed
+    
+    def in_area_of_interest(self, ship, x, y):
+        """Check whether a point is inside the area of interest around a ship (see build_view)"""
+        return (abs(wrap_delta(x - ship.x, self.arena_width)) <= SCREEN_WIDTH / 2 + AOI_MARGIN
+                and abs(wrap_delta(y - ship.y, self.arena_height)) <= SCREEN_HEIGHT / 2 + AOI_MARGIN)
+    
+    def client_events(self, player_id, state):
+        """Get the events a client may not have seen yet, leaving out those that happened outside its view"""
+        ship = self.ships.get(player_id)
+        return [
+            event for event in self.events.between(state.events_after(), self.tick)
+            if "x" not in event or ship is None or self.in_area_of_interest(ship, event["x"], event["y"])
+        ]
+    
+    def encode_message(self, encoding, message, snapshot, baseline=None):
+        """Encode a game_state message for a client's negotiated encoding"""
+        if encoding == ENCODING_BINARY:
+            return encode_snapshot(message, snapshot, (self.arena_width, self.arena_height), baseline, self.net_ids,
+                                   self.binary_fragments, self.precision)
+        return encode_json_snapshot(message, self.json_fragments)
+    
+    def send_game_state(self):
+        """Offer each client its view of the current game state as a keyframe or delta"""
+        metrics = self.metrics
+        started = time.perf_counter()
+        
+        # Lockstep participants simulate the world themselves and only need the inputs
+        if self.lockstep:
+            self.lockstep.flush(self.tick, self.connections)
+            metrics.lap("broadcast", started)
+            return
+        
+        snapshot = self.build_snapshot()
+        self.snapshots.add(self.tick, snapshot)
+        self.snapshot_positions = self.index_positions()
+        self.json_fragments.prune(snapshot)
+        self.binary_fragments.prune(snapshot)
+        started = metrics.lap("snapshot", started)
+        
+        if not self.clients:
+            return
+        
+        # Every client sees a different part of the arena, so each gets its
+        # own view, delta'd against the last view of its own that it acked
+        timestamp = time.time()
+        for websocket, state in self.client_snapshots.items():
+            player_id = self.clients[websocket]
+            view = self.build_view(player_id, snapshot, self.snapshot_positions)
             
-            # Move the asteroid (simple linear movement)
-            # TODO: Implement actual asteroid movement with angles
-            angle = random.uniform(0, 360)
-            asteroid["x"] += velocity * pygame.math.Vector2(1, 0).rotate(-angle).x
-            asteroid["y"] += velocity * pygame.math.Vector2(1, 0).rotate(-angle).y
+            # A client whose budget is already leaving updates out can't afford
+            # periodic keyframes, which resend everything it has
+            budget = self.client_budgets.get(websocket)
+            baseline_tick = state.baseline_tick(self.tick, state.history, periodic=budget is None or not budget.deferred)
             
-            # Check if the asteroid is still on or near the screen
-            if (-100 <= asteroid["x"] <= SCREEN_WIDTH + 100 and 
-                -100 <= asteroid["y"] <= SCREEN_HEIGHT + 100):
-                new_asteroids.append(asteroid)
+            # A client that has fallen so far behind that some of its events were
+            # dropped gets a keyframe and the whole roster in their place
+            events = self.client_events(player_id, state)
+            if not self.events.complete_after(state.events_after()):
+                baseline_tick = None
+                events.insert(0, {"type": "roster", "players": self.roster(), "tick": self.tick})
+            if baseline_tick is None:
+                state.last_keyframe_tick = self.tick
+            baseline = state.history.get(baseline_tick) if baseline_tick is not None else None
+            
+            # Keep to the client's byte budget. The history gets the view as the
+            # client will have it, so what's left out is still missing next time
+            if budget is not None:
+                budget.adapt(self.connections[websocket].dropped_snapshots)
+                view = self.budget_view(budget, self.client_encodings[websocket], player_id, state, view, baseline)
+            state.history.add(self.tick, view)
+            
+            message = snapshot_message(
+                self.tick, view,
+                baseline_tick=baseline_tick,
+                baseline=baseline,
+                timestamp=timestamp,
+                world=snapshot,
+                world_baseline=self.snapshots.get(baseline_tick) if baseline_tick is not None else None,
+                events=events,
+            )
+            # Tell the client which of its inputs this snapshot reflects
+            message["input_seq"] = self.input_seq(websocket)
+            data = self.encode_message(self.client_encodings[websocket], message, view, baseline)
+            self.connections[websocket].send_snapshot(data)
+            metrics.snapshots += 1
+            metrics.snapshot_bytes += len(data)
+        metrics.lap("broadcast", started)
+    
+    def update_game(self, dt, now=None):
+        """Advance the simulation by one fixed step of dt seconds (now overrides the wall clock in replays)"""
+        self.now = time.time() if now is None else now
+        scale = dt / BASE_STEP
+        self.tick += 1
+        
+        metrics = self.metrics
+        started = time.perf_counter()
+        
+        if self.recorder:
+            self.recorder.tick(self.tick, self.now, dt)
         
-        self.asteroids = new_asteroids
+        # Inputs take effect at tick boundaries, in the order they were sent
+        self.apply_inputs()
+        started = metrics.lap("inputs", started)
+        
+        # Update all ships
+        for ship in self.ships.values():
+            ship.update(dt)
+        started = metrics.lap("ships", started)
+        
+        # Update lasers, dropping those that expired
+        self.lasers.integrate(scale)
+        self.lasers.wrap(self.arena_width, self.arena_height)
+        self.lasers.compact(self.lasers.alive_at(self.tick, self.laser_lifetime))
+        started = metrics.lap("lasers", started)
+        
+        # Update asteroids
+        self.asteroids.extrapolate(self.tick, scale, self.arena_width, self.arena_height)
+        started = metrics.lap("asteroids", started)
         
         # Check for collisions between lasers and asteroids
         self.check_laser_asteroid_collisions()
+        started = metrics.lap("laser_collisions", started)
         
         # Check for collisions between ships and asteroids
         self.check_ship_asteroid_collisions()
+        started = metrics.lap("ship_collisions", started)
         
         # If no asteroids, create more
         if not self.asteroids:
             self.game_state["level"] += 1
             self.create_asteroids(10 + self.game_state["level"])
         
-        # Send updated game state to all clients
-        await self.send_game_state()
+        if self.recorder and self.tick % KEYFRAME_TICKS == 0:
+            self.recorder.keyframe(self.tick, self.build_snapshot())
+        if self.lockstep and self.tick % CHECK_TICKS == 0:
+            self.lockstep.check(self.tick, self.build_snapshot(), self.checkpoint())
+        metrics.lap("level", started)
+        
+        metrics.entities["ships"] = len(self.ships)
+        metrics.entities["asteroids"] = len(self.asteroids)
+        metrics.entities["lasers"] = len(self.lasers)
+        metrics.players = len(self.clients)
+    
+    def rebuild_asteroid_grid(self):
+        """Rebuild the broadphase grid from the current asteroids"""
+        # A fresh grid rather than clearing the old one, which the asteroid history may still hold
+        self.asteroid_grid = SpatialHash(wrap=(self.arena_width, self.arena_height))
+        for asteroid_idx, (x, y, level) in enumerate(zip(*self.asteroids.columns("x", "y", "level"))):
+            self.asteroid_grid.insert(asteroid_idx, x, y, asteroid_radius(level))
+    
+    def find_asteroid_hit(self, x, y, radius, after=-1):
+        """Get the lowest asteroid index above `after` touching the circle at (x, y), or None"""
+        asteroids = self.asteroids
+        for asteroid_idx in sorted(self.asteroid_grid.query(x, y, radius)):
+            if asteroid_idx <= after:
+                continue
+            
+            dx = wrap_delta(x - float(asteroids.x[asteroid_idx]), self.arena_width)
+            dy = wrap_delta(y - float(asteroids.y[asteroid_idx]), self.arena_height)
+            reach = radius + asteroid_radius(int(asteroids.level[asteroid_idx]))
+            if dx*dx + dy*dy < reach*reach:
+                return asteroid_idx
+        return None
+    
+    def record_asteroid_history(self):
+        """Store this tick's asteroid positions (and their freshly built grid) for lag compensation"""
+        asteroids = self.asteroids
+        n = len(asteroids)
+        self.asteroid_history.record(
+            self.tick, asteroids.id[:n], asteroids.x[:n], asteroids.y[:n], asteroid_radius(asteroids.level[:n]),
+            grid=self.asteroid_grid,
+        )
+    
+    def find_rewound_hits(self, x, y, tick):
+        """Get the ids of asteroids touching the point (x, y) at a past tick, or None if that tick isn't kept"""
+        frame = self.asteroid_history.frame(tick)
+        if frame is None:
+            return None
+        
+        ids, xs, ys, radii = frame
+        hits = []
+        for index in sorted(self.asteroid_history.grid(tick).query(x, y)):
+            # The grid may also hold fragments added after the frame was recorded
+            if index >= len(ids):
+                continue
+            dx = wrap_delta(x - float(xs[index]), self.arena_width)
+            dy = wrap_delta(y - float(ys[index]), self.arena_height)
+            reach = float(radii[index])
+            if dx*dx + dy*dy < reach*reach:
+                hits.append(int(ids[index]))
+        return hits
+    
+    def hit_asteroid(self, asteroid_idx, owner, players):
+        """Split an asteroid hit by a laser and award points to the laser's owner"""
+        asteroid_x = float(self.asteroids.x[asteroid_idx])
+        asteroid_y = float(self.asteroids.y[asteroid_idx])
+        level = int(self.asteroids.level[asteroid_idx])
+        
+        # Create smaller asteroids if not smallest
+        if level < 3:
+            for _ in range(2):
+                new_idx = self.spawn_asteroid(asteroid_x, asteroid_y, level + 1)
+                self.asteroid_grid.insert(new_idx, asteroid_x, asteroid_y, asteroid_radius(level + 1))
+        
+        # Award points to the player
+        player_id = players.get(owner)
+        self.events.add(self.tick, {
+            "type": "hit",
+            "id": int(self.asteroids.id[asteroid_idx]),
+            "x": self.precision.position(asteroid_x, self.arena_width),
+            "y": self.precision.position(asteroid_y, self.arena_height),
+            "level": level,
+            "player_id": player_id,
+        })
+        if player_id in self.ships:
+            # Points based on asteroid size (smaller = more points)
+            points = (4 - level) * 100
+            self.game_state["scores"][player_id] = self.game_state["scores"].get(player_id, 0) + points
+            # Update the ship's score for client-side display
+            self.ships[player_id].score = self.game_state["scores"][player_id]
     
     def check_laser_asteroid_collisions(self):
         """Check for collisions between lasers and asteroids"""
         # We'll use a simple circle-based collision detection
-        lasers_to_remove = set()
-        asteroids_to_remove = set()
-        
-        for laser_idx, laser in enumerate(self.lasers):
-            for asteroid_idx, asteroid in enumerate(self.asteroids):
-                # Simple distance-based collision
-                dx = laser["x"] - asteroid["x"]
-                dy = laser["y"] - asteroid["y"]
-                distance = (dx*dx + dy*dy) ** 0.5
-                
-                # Asteroid radius based on level (larger = bigger)
-                asteroid_radius = (4 - asteroid["level"]) * 15
+        lasers_to_remove = []
+        asteroids_to_remove = []
+        players = self.player_for_net_id()
+        
+        self.rebuild_asteroid_grid()
+        
+        started = time.perf_counter()
+        self.record_asteroid_history()
+        rewind_elapsed = time.perf_counter() - started
+        asteroid_indexes = None  # Maps asteroid id to current index, built for the first rewound shot
+        # Asteroids already hit this tick, by rewound or current-time lasers
+        # alike, so no asteroid breaks up (or scores) twice
+        hit_asteroids = set()
+        
+        for laser_idx, (laser_x, laser_y, owner, rewind) in enumerate(zip(*self.lasers.columns("x", "y", "owner", "rewind"))):
+            if rewind:
+                # Test the laser against the asteroids as its shooter saw them
+                started = time.perf_counter()
+                hits = self.find_rewound_hits(laser_x, laser_y, self.tick - rewind)
+                if hits is not None:
+                    if hits and asteroid_indexes is None:
+                        asteroid_indexes = {asteroid_id: idx for idx, asteroid_id in enumerate(self.asteroids.columns("id")[0])}
+                    for asteroid_id in hits:
+                        # Asteroids destroyed since then can't be hit again
+                        asteroid_idx = asteroid_indexes.get(asteroid_id)
+                        if asteroid_idx is None or asteroid_idx in hit_asteroids:
+                            continue
+                        hit_asteroids.add(asteroid_idx)
+                        lasers_to_remove.append(laser_idx)
+                        asteroids_to_remove.append(asteroid_idx)
+                        self.hit_asteroid(asteroid_idx, owner, players)
+                    rewind_elapsed += time.perf_counter() - started
+                    continue
+                rewind_elapsed += time.perf_counter() - started
+            
+            # Visit hits in asteroid order, including fragments spawned earlier in this pass
+            asteroid_idx = self.find_asteroid_hit(laser_x, laser_y, 0)
+            while asteroid_idx is not None:
+                # Collision detected
+                if asteroid_idx not in hit_asteroids:
+                    hit_asteroids.add(asteroid_idx)
+                    lasers_to_remove.append(laser_idx)
+                    asteroids_to_remove.append(asteroid_idx)
+                    self.hit_asteroid(asteroid_idx, owner, players)
                 
-                if distance < asteroid_radius:
-                    # Collision detected
-                    lasers_to_remove.add(laser_idx)
-                    asteroids_to_remove.add(asteroid_idx)
-                    
-                    # Create smaller asteroids if not smallest
-                    if asteroid["level"] < 3:
-                        for _ in range(2):
-                            new_asteroid = {
-                                "x": asteroid["x"],
-                                "y": asteroid["y"],
-                                "level": asteroid["level"] + 1,
-                                "id": str(uuid.uuid4())
-                            }
-                            self.asteroids.append(new_asteroid)
-                    
-                    # Award points to the player
-                    if "player_id" in laser and laser["player_id"] in self.ships:
-                        player_id = laser["player_id"]
-                        # Points based on asteroid size (smaller = more points)
-                        points = (4 - asteroid["level"]) * 100
-                        self.game_state["scores"][player_id] = self.game_state["scores"].get(player_id, 0) + points
-                        # Update the ship's score for client-side display
-                        self.ships[player_id].score = self.game_state["scores"][player_id]
+                asteroid_idx = self.find_asteroid_hit(laser_x, laser_y, 0, after=asteroid_idx)
+        
+        self.rewind_time += (rewind_elapsed - self.rewind_time) * TICK_TIME_SMOOTHING
         
         # Remove the collided objects
-        self.lasers = [laser for idx, laser in enumerate(self.lasers) if idx not in lasers_to_remove]
-        self.asteroids = [asteroid for idx, asteroid in enumerate(self.asteroids) if idx not in asteroids_to_remove]
+        if lasers_to_remove:
+            keep = np.ones(len(self.lasers), dtype=bool)
+            keep[lasers_to_remove] = False
+            self.lasers.compact(keep)
+        if asteroids_to_remove:
+            keep = np.ones(len(self.asteroids), dtype=bool)
+            keep[asteroids_to_remove] = False
+            self.asteroids.compact(keep)
     
     def check_ship_asteroid_collisions(self):
         """Check for collisions between ships and asteroids"""
+        self.rebuild_asteroid_grid()
+        
         for player_id, ship in list(self.ships.items()):
             if ship.invulnerable:
                 continue  # Skip invulnerable ships
+            
+            # A respawned ship keeps checking the remaining asteroids from its new position
+            asteroid_idx = self.find_asteroid_hit(ship.x, ship.y, ship.radius)
+            while asteroid_idx is not None:
+                # Ship hit by asteroid - respawn and make invulnerable
+                self.events.add(self.tick, {
+                    "type": "crash",
+                    "player_id": player_id,
+                    "x": self.precision.position(ship.x, self.arena_width),
+                    "y": self.precision.position(ship.y, self.arena_height),
+                })
+                ship.respawn(*self.spawn_position())
+                self.events.add(self.tick, {"type": "spawn", "player_id": player_id, "x": ship.x, "y": ship.y})
                 
-            for asteroid in self.asteroids:
-                # Simple distance-based collision
-                dx = ship.position.x - asteroid["x"]
-                dy = ship.position.y - asteroid["y"]
-                distance = (dx*dx + dy*dy) ** 0.5
-                
-                # Asteroid radius based on level
-                asteroid_radius = (4 - asteroid["level"]) * 15
+                # Penalize score
+                penalty = 50
+                self.game_state["scores"][player_id] = max(0, self.game_state["scores"].get(player_id, 0) - penalty)
+                ship.score = self.game_state["scores"][player_id]
                 
-                if distance < ship.radius + asteroid_radius:
-                    # Ship hit by asteroid - respawn and make invulnerable
-                    ship.position.x = random.randint(SCREEN_WIDTH // 4, 3 * SCREEN_WIDTH // 4)
-                    ship.position.y = random.randint(SCREEN_HEIGHT // 4, 3 * SCREEN_HEIGHT // 4)
-                    ship.velocity = pygame.Vector2(0, 0)
-                    ship.set_invulnerable()
-                    
-                    # Penalize score
-                    penalty = 50
-                    self.game_state["scores"][player_id] = max(0, self.game_state["scores"].get(player_id, 0) - penalty)
-                    ship.score = self.game_state["scores"][player_id]
+                asteroid_idx = self.find_asteroid_hit(ship.x, ship.y, ship.radius, after=asteroid_idx)
     
-    async def game_loop(self):
-        """Main game loop"""
+    def stats(self):
+        """Get this room's counters for /stats"""
+        return dict(
+            self.metrics.as_dict(),
+            tick=self.tick,
+            tick_time_ms=self.tick_time * 1000,
+            rewind_time_ms=self.rewind_time * 1000,
+        )
+    
+    def stop(self):
+        """Stop the game loop and finish the match recording"""
+        self.running = False
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+    
+    def start_loop(self, now):
+        """Start the fixed-step schedule at a clock time (in seconds)"""
         self.running = True
         
+        # Deadlines advance by exact intervals so the schedule doesn't drift
+        self.next_step = now
+        self.next_snapshot = now
+    
+    def run_due(self, now):
+        """Run every simulation step and snapshot that has come due by `now`, and return the next deadline"""
+        step = 1 / self.simulation_rate
+        snapshot_interval = 1 / self.snapshot_rate
+        
+        # Run every simulation step that has come due
+        steps = 0
+        while self.next_step <= now and steps < MAX_CATCHUP_STEPS:
+            started = time.perf_counter()
+            self.update_game(step)
+            elapsed = time.perf_counter() - started
+            self.tick_time += (elapsed - self.tick_time) * TICK_TIME_SMOOTHING
+            self.metrics.tick(elapsed)
+            if self.recorder:
+                self.recorder.tick_cost(elapsed)
+            self.next_step += step
+            steps += 1
+        
+        # If we fell too far behind, drop the backlog instead of spiralling
+        if self.next_step <= now:
+            logger.warning(f"Simulation fell behind by {now - self.next_step:.3f}s, skipping ahead")
+            self.next_step = now + step
+        
+        # Hand the updated game state to each client's writer
+        if self.next_snapshot <= now:
+            self.send_game_state()
+            self.next_snapshot += snapshot_interval
+            if self.next_snapshot <= now:
+                self.next_snapshot = now + snapshot_interval
+        
+        return min(self.next_step, self.next_snapshot)
+    
+    async def game_loop(self):
+        """Main game loop: fixed-step simulation with snapshots sent at their own rate, run on the event loop"""
+        loop = asyncio.get_running_loop()
+        self.start_loop(loop.time())
         while self.running:
-            start_time = time.time()
-            
-            # Update game state
-            await self.update_game()
+            deadline = self.run_due(loop.time())
             
-            # Calculate how long to sleep to maintain the update rate
-            elapsed = time.time() - start_time
-            sleep_time = max(0, UPDATE_RATE - elapsed)
-            
-            # Sleep until next update
-            await asyncio.sleep(sleep_time)
-
-async def handle_index(request):
-    """Serve the index.html file"""
-    with open('index.html', encoding='utf-8') as f:
-        return web.Response(text=f.read(), content_type='text/html')
+            # Sleep until the next deadline
+            await asyncio.sleep(max(0, deadline - loop.time()))
 
-async def handle_js(request):
-    """Serve the client.js file"""
-    with open('client.js', encoding='utf-8') as f:
-        return web.Response(text=f.read(), content_type='application/javascript')
+class RoomManager:
+    """Creates rooms on demand, routes joining players to them and tears down empty ones"""
+    def __init__(self, max_players=MAX_PLAYERS, record_dir=None):
+        self.max_players = max_players
+        self.record_dir = record_dir  # Directory for match logs, or None to not record
+        self.rooms = {}  # Maps room_id to ThreadedRoom
+        self.room_numbers = itertools.count(1)
+        self.metrics = ServerMetrics()
+    
+    def create_room(self, room_id=None, mode=MODE_SNAPSHOT):
+        """Create a room and start its game loop on a thread of its own"""
+        if room_id is None:
+            room_id = f"room-{next(self.room_numbers)}"
+            while room_id in self.rooms:
+                room_id = f"room-{next(self.room_numbers)}"
+        
+        # Ticks run off the event loop, so a slow one doesn't hold up every socket
+        room = ThreadedRoom(AsteroidsServer(room_id=room_id, max_players=self.max_players,
+                                            recorder=open_recorder(self.record_dir, room_id), mode=mode),
+                            asyncio.get_running_loop())
+        room.start()
+        self.rooms[room_id] = room
+        logger.info(f"Created {mode} room {room_id} ({len(self.rooms)} rooms running)")
+        return room
+    
+    def close_room(self, room):
+        """Stop an empty room's game loop and forget it"""
+        room.stop()
+        self.rooms.pop(room.room_id, None)
+        logger.info(f"Closed room {room.room_id} ({len(self.rooms)} rooms running)")
+    
+    def close_all(self):
+        """Close every room, e.g. when the server shuts down"""
+        rooms = list(self.rooms.values())
+        for room in rooms:
+            self.close_room(room)
+        
+        # Let the simulation threads finish their match recordings
+        for room in rooms:
+            room.join(ROOM_STOP_TIMEOUT)
+    
+    def find_room(self, room_id=None, mode=MODE_SNAPSHOT):
+        """Get the room a joining player should go to, or None if the requested room is full"""
+        if room_id is not None:
+            room = self.rooms.get(room_id) or self.create_room(room_id, mode)
+            return None if room.is_full() else room
+        
+        # Fill existing rooms before opening new ones
+        for room in self.rooms.values():
+            if room.mode == mode and not room.is_full():
+                return room
+        return self.create_room(mode=mode)
+    
+    def join(self, websocket, connection, message):
+        """Handle a join message, returning the room the player was placed in"""
+        if "player_name" not in message:
+            logger.warning("Join message missing player_name")
+            return None
+        
+        encoding = message.get("encoding", ENCODING_JSON)
+        if encoding not in ENCODINGS:
+            logger.warning(f"Unknown encoding {encoding}, falling back to {ENCODING_JSON}")
+            encoding = ENCODING_JSON
+        
+        mode = message.get("mode", MODE_SNAPSHOT)
+        if mode not in MODES:
+            logger.warning(f"Unknown room mode {mode}, falling back to {MODE_SNAPSHOT}")
+            mode = MODE_SNAPSHOT
+        
+        room_id = message.get("room")
+        room_id = str(room_id)[:32] if room_id else None
+        if room_id in self.rooms and self.rooms[room_id].mode != mode:
+            logger.info(f"Room {room_id} isn't a {mode} room, turning away {message['player_name']}")
+            connection.send_reliable(json.dumps({"type": "error", "reason": "wrong_mode", "room": room_id}))
+            return None
+        
+        room = self.find_room(room_id, mode)
+        if room is None:
+            logger.info(f"Room {room_id} is full, turning away {message['player_name']}")
+            connection.send_reliable(json.dumps({"type": "error", "reason": "room_full", "room": room_id}))
+            return None
+        
+        room.register(websocket, connection, message["player_name"], encoding,
+                      on_error=functools.partial(self.join_failed, room, websocket, connection))
+        return room
+    
+    def join_failed(self, room, websocket, connection):
+        """Clean up after a room failed to register a player (I/O loop)"""
+        # Rooms register players on their own thread or worker, so a failure
+        # arrives after join returned. Leaving also drops whatever the room
+        # had half set up for the player
+        room.unregister(websocket)
+        connection.disconnect(f"could not join room {room.room_id}", close_reason="Could not join")
+        if room.is_empty() and self.rooms.get(room.room_id) is room:
+            self.close_room(room)
+    
+    def parse_message(self, message):
+        """Decode a text (JSON) or binary client frame, or return None if it's invalid"""
+        if isinstance(message, bytes):
+            # Binary frames carry inputs and acks from clients using the binary encoding
+            data = decode_client_message(message)
+            if data is None:
+                logger.warning("Received invalid binary message")
+            return data
+        
+        try:
+            data = json.loads(message)
+        except json.JSONDecodeError:
+            logger.warning("Received invalid JSON")
+            return None
+        if not isinstance(data, dict) or "type" not in data:
+            logger.warning(f"Message missing 'type' field: {data}")
+            return None
+        return data
+    
+    async def handle_client(self, websocket, path=None):
+        """Handle a client connection"""
+        logger.info(f"New client connection from {websocket.remote_address}")
+        connection = ClientConnection(websocket)
+        connection.start()
+        self.metrics.connections.add(connection)
+        limiter = InboundLimiter()
+        room = None
+        try:
+            async for message in websocket:
+                self.metrics.messages_received += 1
+                
+                # Over-budget messages are dropped before they cost any parsing
+                # Text frames are limited by their UTF-8 size, like binary ones
+                size = len(message) if isinstance(message, bytes) else len(message.encode())
+                if not limiter.allow(size):
+                    self.metrics.messages_rate_limited += 1
+                    if limiter.abusive() and not connection.closing:
+                        self.metrics.rate_limit_disconnects += 1
+                        connection.disconnect(f"over its message limits for {limiter.abuse_time}s",
+                                              close_reason="Too many messages")
+                        break
+                    continue
+                
+                try:
+                    data = self.parse_message(message)
+                    if data is None:
+                        continue
+                    
+                    if room is not None:
+                        room.process_message(websocket, data)
+                    elif data["type"] == "join":
+                        room = self.join(websocket, connection, data)
+                    else:
+                        logger.warning(f"Message from client that hasn't joined: {data}")
+                except Exception as e:
+                    logger.error(f"Error processing message: {str(e)}", exc_info=True)
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.info(f"Connection closed: {e.code} - {e.reason}")
+        except Exception as e:
+            logger.error(f"Unexpected error in client handler: {str(e)}", exc_info=True)
+        finally:
+            logger.info(f"Client disconnected: {websocket.remote_address}")
+            if room is not None:
+                room.unregister(websocket)
+                if room.is_empty() and self.rooms.get(room.room_id) is room:
+                    self.close_room(room)
+            if connection.dropped_snapshots:
+                logger.info(f"Dropped {connection.dropped_snapshots} stale snapshots for {websocket.remote_address}")
+            if limiter.dropped:
+                logger.info(f"Dropped {limiter.dropped} rate-limited messages from {websocket.remote_address}")
+            await connection.stop()
+            self.metrics.connection_closed(connection)
+    
+    def stats(self):
+        """Gather the server's and every room's counters"""
+        rooms = {}
+        for room_id, room in self.rooms.items():
+            stats = room.stats()
+            if stats is not None:  # Rooms on workers have none until the worker's first report
+                rooms[room_id] = stats
+        return {"server": self.metrics.as_dict(), "rooms": rooms}
+    
+    async def handle_stats(self, request):
+        """Serve the counters as JSON"""
+        return web.json_response(self.stats())
+    
+    async def handle_metrics(self, request):
+        """Serve the counters in the Prometheus text format"""
+        return web.Response(body=render_prometheus(self.stats()).encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
 
-async def handle_css(request):
-    """Serve the style.css file"""
-    with open('style.css', encoding='utf-8') as f:
-        return web.Response(text=f.read(), content_type='text/css')
+class PooledRoomManager(RoomManager):
+    """RoomManager whose rooms run on worker processes, placed by measured tick time"""
+    def __init__(self, pool, max_players=MAX_PLAYERS):
+        super().__init__(max_players)
+        self.pool = pool
+    
+    def create_room(self, room_id=None, mode=MODE_SNAPSHOT):
+        """Place a room on the least loaded worker"""
+        if room_id is None:
+            room_id = f"room-{next(self.room_numbers)}"
+            while room_id in self.rooms:
+                room_id = f"room-{next(self.room_numbers)}"
+        
+        worker_index = self.pool.place_room(room_id, self.max_players, mode)
+        room = RemoteRoom(room_id, self.pool, worker_index, self.max_players, mode)
+        self.rooms[room_id] = room
+        return room
+    
+    def close_room(self, room):
+        """Remove an empty room from its worker"""
+        self.pool.close_room(room.worker_index, room.room_id)
+        self.rooms.pop(room.room_id, None)
+        logger.info(f"Closed room {room.room_id} on worker {room.worker_index} ({len(self.rooms)} rooms running)")
+    
+    def close_all(self):
+        """Close every room; the workers finish their match recordings before they exit"""
+        for room in list(self.rooms.values()):
+            self.close_room(room)
 
-async def start_server():
+async def start_server(workers=0, record_dir=None, watch_assets=False, switch_interval=None):
     """Start the game server and web server"""
-    # Create the game server
-    game_server = AsteroidsServer()
+    # Create the room manager (rooms are created as players join). With
+    # workers, this process only handles sockets and rooms run elsewhere.
+    pool = None
+    if workers > 0:
+        pool = WorkerPool(workers, record_dir)
+        pool.start()
+        room_manager = PooledRoomManager(pool)
+    else:
+        room_manager = RoomManager(record_dir=record_dir)
+        # Room threads share the GIL with the I/O loop; shorter slices keep a long tick from stalling it
+        if switch_interval:
+            sys.setswitchinterval(switch_interval)
     
     # Create the web server
     app = web.Application()
-    app.router.add_get('/', handle_index)
-    app.router.add_get('/client.js', handle_js)
-    app.router.add_get('/style.css', handle_css)
+    
+    # The web client's files are read and compressed once, then served from memory.
+    # They sit next to this file, wherever the server is started from
+    assets = StaticAssets(root=os.path.dirname(os.path.abspath(__file__)))
+    assets.add('/', 'index.html', 'text/html; charset=utf-8')
+    assets.add('/client.js', 'client.js', 'application/javascript; charset=utf-8')
+    assets.add('/style.css', 'style.css', 'text/css; charset=utf-8')
+    assets.register(app.router)
+    if watch_assets:
+        assets.start_watching()
+    app.router.add_get('/stats', room_manager.handle_stats)
+    app.router.add_get('/metrics', room_manager.handle_metrics)
     
     # Set up the HTTP server
     runner = web.AppRunner(app)
@@ -431,19 +1300,29 @@ async def start_server():
     
     # Start the WebSocket server
     ws_server = await websockets.serve(
-        game_server.handle_client, '0.0.0.0', 8081
+        room_manager.handle_client, '0.0.0.0', 8081, max_size=MAX_MESSAGE_SIZE
     )
     logger.info("WebSocket server started at ws://localhost:8081")
     
-    # Start the game loop
-    asyncio.create_task(game_server.game_loop())
-    
-    return ws_server, runner
+    return ws_server, runner, room_manager, pool
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multiplayer Asteroids server")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run rooms on this many worker processes (0 runs them in the server process)")
+    parser.add_argument("--record", metavar="DIR",
+                        help="Record every room's match to a log in DIR, for replay.py")
+    parser.add_argument("--dev", action="store_true",
+                        help="Reload the web client's files when they change on disk")
+    parser.add_argument("--switch-interval", type=float, default=SWITCH_INTERVAL, metavar="SECONDS",
+                        help="Python's thread switch interval while rooms run in the server process (0 keeps Python's default)")
+    args = parser.parse_args()
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    
     async def main():
         # Start the server
-        ws_server, runner = await start_server()
+        ws_server, runner, room_manager, pool = await start_server(args.workers, args.record, args.dev, args.switch_interval)
         
         # Keep the server running until interrupted
         try:
@@ -457,6 +1336,9 @@ if __name__ == "__main__":
             ws_server.close()
             await ws_server.wait_closed()
             await runner.cleanup()
+            room_manager.close_all()
+            if pool:
+                pool.stop()
             logger.info("Server shutdown complete")
             
     try:
@@ -2,6 +2,8 @@ import pygame
 import math
 import random
 
+from ship_model import ShipModel
+
 # Retro color constants
 NEON_BLUE = (0, 195, 255)
 NEON_PINK = (255, 0, 153)
@@ -17,58 +19,81 @@ SHIP_COLORS = [NEON_BLUE, NEON_PINK, NEON_GREEN, NEON_YELLOW, NEON_ORANGE, NEON_
 THRUSTER_COLORS = [NEON_ORANGE, NEON_YELLOW, (255, 255, 255)]
 
 class Ship(pygame.sprite.Sprite):
-    def __init__(self, x, y, player_id=None, player_name=None, color_idx=None):
-        """Initialize the player's ship"""
+    def __init__(self, x, y, player_id=None, player_name=None, color_idx=None, model=None):
+        """Initialize the player's ship as a view over a ShipModel"""
         super().__init__()
         
-        # Player identification for multiplayer
-        self.player_id = player_id if player_id is not None else "local"
-        self.player_name = player_name if player_name is not None else "Player"
-        
-        # Ship properties
-        self.radius = 15  # For collision detection
-        self.angle = 90  # Starting angle (facing up)
-        self.rotation_speed = 6  # Degrees per frame (increased from 5)
-        self.rotation_direction = 0  # 0 = not rotating, 1 = clockwise, -1 = counter-clockwise
-        
-        # Movement properties
-        self.position = pygame.Vector2(x, y)
-        self.velocity = pygame.Vector2(0, 0)
-        self.acceleration = 0.3  # Increased from 0.2
-        self.friction = 0.97  # Improved friction for better control (was 0.95)
-        self.max_speed = 8.5  # Increased speed limit from 6.0
-        self.thrusting = False
-        
-        # Ship color - assign from index or random if not specified
-        if color_idx is not None and 0 <= color_idx < len(SHIP_COLORS):
-            self.color = SHIP_COLORS[color_idx]
-        else:
-            self.color = random.choice(SHIP_COLORS)
+        # All simulation state lives in the model
+        self.model = model if model is not None else ShipModel(
+            x, y, player_id=player_id, player_name=player_name, color_idx=color_idx
+        )
+        self.color = SHIP_COLORS[self.model.color_idx]
         
         # Create the ship's image
         self.original_image = self.create_ship_image()
+        self.rendered_angle = None
         self.image = self.original_image
-        self.rect = self.image.get_rect(center=(x, y))
+        self.rect = self.image.get_rect(center=(int(self.model.x), int(self.model.y)))
+        self.sync_image()
         
         # Thruster effect params
         self.thrust_particles = []
         self.thrust_counter = 0
-        
-        # Invulnerability properties
-        self.invulnerable = False
-        self.invulnerable_time = 1500  # Reduced from 3 seconds to 1.5 seconds
-        self.blink_time = 100  # Blink every 100ms
-        self.last_blink = 0
-        self.visible = True
-        
-        # Off-screen timer - track how long the ship has been off-screen
-        self.off_screen_time = 0
-        self.max_off_screen_time = 3.0  # 3 seconds max off-screen before respawning
-        
-        # Score tracking for multiplayer
-        self.score = 0
         self.last_update_time = pygame.time.get_ticks()
     
+    # Read-only views of the model's state
+    @property
+    def player_id(self):
+        return self.model.player_id
+    
+    @property
+    def player_name(self):
+        return self.model.player_name
+    
+    @property
+    def radius(self):
+        return self.model.radius
+    
+    @property
+    def angle(self):
+        return self.model.angle
+    
+    @property
+    def rotation_direction(self):
+        return self.model.rotation_direction
+    
+    @property
+    def thrusting(self):
+        return self.model.thrusting
+    
+    @property
+    def invulnerable(self):
+        return self.model.invulnerable
+    
+    @property
+    def visible(self):
+        return self.model.visible
+    
+    @property
+    def off_screen_time(self):
+        return self.model.off_screen_time
+    
+    @property
+    def max_off_screen_time(self):
+        return self.model.max_off_screen_time
+    
+    @property
+    def score(self):
+        return self.model.score
+    
+    @property
+    def position(self):
+        return pygame.Vector2(self.model.x, self.model.y)
+    
+    @property
+    def velocity(self):
+        return pygame.Vector2(self.model.velocity_x, self.model.velocity_y)
+    
     def create_ship_image(self):
         """Create the ship's image as a triangle with neon glow effect"""
         # Create a transparent surface
@@ -100,94 +125,28 @@ class Ship(pygame.sprite.Sprite):
     
     def rotate(self, direction):
         """Rotate the ship (direction: 1 for left, -1 for right)"""
-        self.rotation_direction = direction
+        self.model.rotate(direction)
     
     def thrust(self, on):
         """Toggle the ship's thrust"""
-        self.thrusting = on
+        self.model.thrust(on)
     
     def set_invulnerable(self):
         """Make the ship temporarily invulnerable"""
-        self.invulnerable = True
-        self.last_blink = pygame.time.get_ticks()
-        
-        # Reset invulnerability after a delay
-        pygame.time.set_timer(pygame.USEREVENT, self.invulnerable_time)
+        self.model.set_invulnerable()
+    
+    def sync_image(self):
+        """Match the sprite's image and rect to the model"""
+        # Only rotate the image when the angle has actually changed
+        if self.model.angle != self.rendered_angle:
+            self.image = pygame.transform.rotate(self.original_image, self.model.angle - 90)
+            self.rendered_angle = self.model.angle
+        self.rect = self.image.get_rect(center=(int(self.model.x), int(self.model.y)))
     
     def update(self):
         """Update the ship's position and rotation"""
-        # Update rotation (only when keys are pressed)
-        if self.rotation_direction != 0:
-            self.angle += self.rotation_direction * self.rotation_speed
-            
-            # Keep angle in the range [0, 360)
-            self.angle %= 360
-            
-            # Rotate the image
-            self.image = pygame.transform.rotate(self.original_image, self.angle - 90)
-            self.rect = self.image.get_rect(center=self.rect.center)
-        
-        # Apply thrust if the ship is thrusting
-        if self.thrusting:
-            # Calculate thrust direction based on ship's angle
-            angle_rad = math.radians(self.angle)
-            thrust_x = math.cos(angle_rad) * self.acceleration
-            thrust_y = -math.sin(angle_rad) * self.acceleration
-            
-            # Apply thrust to velocity
-            self.velocity.x += thrust_x
-            self.velocity.y += thrust_y
-            
-            # Limit maximum speed
-            speed = self.velocity.length()
-            if speed > self.max_speed:
-                self.velocity.normalize_ip()  # Convert to unit vector
-                self.velocity *= self.max_speed  # Scale to max_speed
-        
-        # Apply friction to gradually slow down
-        self.velocity *= self.friction
-        
-        # If velocity is very small, stop completely to prevent endless drifting
-        if self.velocity.length() < 0.1:
-            self.velocity = pygame.Vector2(0, 0)
-        
-        # Update position
-        self.position += self.velocity
-        self.rect.center = (int(self.position.x), int(self.position.y))
-        
-        # Check if ship is off-screen
-        screen_width = 1024  # Updated screen dimensions 
-        screen_height = 768
-        screen_rect = pygame.Rect(0, 0, screen_width, screen_height)
-        ship_visible = screen_rect.collidepoint(self.position.x, self.position.y)
-        
-        if not ship_visible:
-            # Ship is off-screen, increment timer (assuming 60 FPS)
-            self.off_screen_time += 1/60
-            
-            # If ship has been off-screen too long, respawn it at center
-            if self.off_screen_time >= self.max_off_screen_time:
-                self.position.x = screen_width // 2
-                self.position.y = screen_height // 2
-                self.velocity = pygame.Vector2(0, 0)
-                self.off_screen_time = 0
-                self.set_invulnerable()  # Make ship invulnerable after respawn
-        else:
-            # Reset timer when ship is on screen
-            self.off_screen_time = 0
-        
-        # Handle invulnerability blinking effect
-        if self.invulnerable:
-            current_time = pygame.time.get_ticks()
-            
-            if current_time - self.last_blink > self.blink_time:
-                self.visible = not self.visible
-                self.last_blink = current_time
-            
-            # Check if invulnerability period is over
-            if current_time > self.last_blink + self.invulnerable_time:
-                self.invulnerable = False
-                self.visible = True
+        self.model.update()
+        self.sync_image()
         
         # Update thruster particles
         self.thrust_counter += 1
@@ -232,43 +191,10 @@ class Ship(pygame.sprite.Sprite):
     
     def to_dict(self):
         """Convert ship state to a dictionary for network transmission"""
-        return {
-            'player_id': self.player_id,
-            'player_name': self.player_name,
-            'x': self.position.x,
-            'y': self.position.y,
-            'angle': self.angle,
-            'velocity_x': self.velocity.x,
-            'velocity_y': self.velocity.y,
-            'thrusting': self.thrusting,
-            'rotation_direction': self.rotation_direction,
-            'invulnerable': self.invulnerable,
-            'visible': self.visible,
-            'score': self.score,
-            'color_idx': SHIP_COLORS.index(self.color) if self.color in SHIP_COLORS else 0
-        }
+        return self.model.to_dict()
     
     @classmethod
     def from_dict(cls, data):
         """Create a ship from a dictionary (received from network)"""
-        ship = cls(
-            data['x'], 
-            data['y'],
-            player_id=data['player_id'],
-            player_name=data['player_name'],
-            color_idx=data['color_idx']
-        )
-        ship.angle = data['angle']
-        ship.velocity.x = data['velocity_x']
-        ship.velocity.y = data['velocity_y']
-        ship.thrusting = data['thrusting']
-        ship.rotation_direction = data['rotation_direction']
-        ship.invulnerable = data['invulnerable']
-        ship.visible = data['visible']
-        ship.score = data['score']
-        
-        # Update the image based on the angle
-        ship.image = pygame.transform.rotate(ship.original_image, ship.angle - 90)
-        ship.rect = ship.image.get_rect(center=ship.rect.center)
-        
-        return ship 
\ No newline at end of file
+        model = ShipModel.from_dict(data)
+        return cls(model.x, model.y, model=model)
@@ -0,0 +1,205 @@
+import math
+import random
+
+# World constants (must match the screen size used by the game)
+SCREEN_WIDTH = 1024
+SCREEN_HEIGHT = 768
+
+SHIP_COLOR_COUNT = 8  # Number of entries in ship.SHIP_COLORS
+STEP_TIME = 1 / 60  # Per-step constants below are tuned for 60 steps per second
+
+class ShipModel:
+    """Render-free ship state and physics, shared by the server and the pygame sprite"""
+    def __init__(self, x, y, player_id=None, player_name=None, color_idx=None, arena=None):
+        """Initialize the ship's state"""
+        # Optional (width, height) of a toroidal world. Without one the ship
+        # lives on a single screen and respawns after leaving it for too long
+        self.arena = arena
+
+        # Player identification for multiplayer
+        self.player_id = player_id if player_id is not None else "local"
+        self.player_name = player_name if player_name is not None else "Player"
+
+        # Ship color - assign from index or random if not specified
+        if color_idx is not None and 0 <= color_idx < SHIP_COLOR_COUNT:
+            self.color_idx = color_idx
+        else:
+            self.color_idx = random.randrange(SHIP_COLOR_COUNT)
+
+        # Ship properties
+        self.radius = 15  # For collision detection
+        self.angle = 90  # Starting angle (facing up)
+        self.rotation_speed = 6  # Degrees per step
+        self.rotation_direction = 0  # 0 = not rotating, 1 = counter-clockwise, -1 = clockwise
+
+        # Movement properties
+        self.x = float(x)
+        self.y = float(y)
+        self.velocity_x = 0.0
+        self.velocity_y = 0.0
+        self.acceleration = 0.3
+        self.friction = 0.97
+        self.max_speed = 8.5
+        self.thrusting = False
+
+        # Invulnerability properties (in seconds of simulated time)
+        self.invulnerable = False
+        self.invulnerable_time = 1.5
+        self.invulnerable_remaining = 0.0
+        self.blink_time = 0.1  # Blink every 100ms
+        self.blink_remaining = 0.0
+        self.visible = True
+
+        # Off-screen timer - track how long the ship has been off-screen
+        self.off_screen_time = 0
+        self.max_off_screen_time = 3.0  # 3 seconds max off-screen before respawning
+
+        # Score tracking for multiplayer
+        self.score = 0
+
+    def rotate(self, direction):
+        """Rotate the ship (direction: 1 for left, -1 for right)"""
+        self.rotation_direction = direction
+
+    def thrust(self, on):
+        """Toggle the ship's thrust"""
+        self.thrusting = on
+
+    def set_invulnerable(self):
+        """Make the ship temporarily invulnerable"""
+        self.invulnerable = True
+        self.invulnerable_remaining = self.invulnerable_time
+        self.blink_remaining = self.blink_time
+
+    def respawn(self, x, y):
+        """Move the ship to a new position, stopped and invulnerable"""
+        self.x = float(x)
+        self.y = float(y)
+        self.velocity_x = 0.0
+        self.velocity_y = 0.0
+        self.set_invulnerable()
+
+    def nose(self):
+        """Get the position of the ship's nose, where lasers are fired from"""
+        angle_rad = math.radians(self.angle)
+        return (
+            self.x + self.radius * math.cos(angle_rad),
+            self.y - self.radius * math.sin(angle_rad),
+        )
+
+    def update(self, dt=STEP_TIME):
+        """Advance the ship by dt seconds"""
+        scale = dt / STEP_TIME
+
+        # Update rotation (only when keys are pressed)
+        if self.rotation_direction != 0:
+            self.angle += self.rotation_direction * self.rotation_speed * scale
+
+            # Keep angle in the range [0, 360)
+            self.angle %= 360
+
+        # Apply thrust if the ship is thrusting
+        if self.thrusting:
+            # Calculate thrust direction based on ship's angle
+            angle_rad = math.radians(self.angle)
+            self.velocity_x += math.cos(angle_rad) * self.acceleration * scale
+            self.velocity_y -= math.sin(angle_rad) * self.acceleration * scale
+
+            # Limit maximum speed
+            speed = math.hypot(self.velocity_x, self.velocity_y)
+            if speed > self.max_speed:
+                self.velocity_x *= self.max_speed / speed
+                self.velocity_y *= self.max_speed / speed
+
+        # Apply friction to gradually slow down
+        friction = self.friction ** scale
+        self.velocity_x *= friction
+        self.velocity_y *= friction
+
+        # If velocity is very small, stop completely to prevent endless drifting
+        if math.hypot(self.velocity_x, self.velocity_y) < 0.1:
+            self.velocity_x = 0.0
+            self.velocity_y = 0.0
+
+        # Update position
+        self.x += self.velocity_x * scale
+        self.y += self.velocity_y * scale
+
+        # Check if ship is off-screen
+        if self.arena is not None:
+            # Flying off one edge of the arena brings the ship back on the other
+            self.x %= self.arena[0]
+            self.y %= self.arena[1]
+        elif 0 <= self.x < SCREEN_WIDTH and 0 <= self.y < SCREEN_HEIGHT:
+            # Reset timer when ship is on screen
+            self.off_screen_time = 0
+        else:
+            self.off_screen_time += dt
+
+            # If ship has been off-screen too long, respawn it at center
+            if self.off_screen_time >= self.max_off_screen_time:
+                self.respawn(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+                self.off_screen_time = 0
+
+        # Handle invulnerability blinking effect
+        if self.invulnerable:
+            self.blink_remaining -= dt
+            if self.blink_remaining <= 0:
+                self.visible = not self.visible
+                self.blink_remaining += self.blink_time
+
+            # Check if invulnerability period is over
+            self.invulnerable_remaining -= dt
+            if self.invulnerable_remaining <= 0:
+                self.invulnerable = False
+                self.visible = True
+
+    def to_dict(self):
+        """Convert ship state to a dictionary for network transmission"""
+        return {
+            'player_id': self.player_id,
+            'player_name': self.player_name,
+            'x': self.x,
+            'y': self.y,
+            'angle': self.angle,
+            'velocity_x': self.velocity_x,
+            'velocity_y': self.velocity_y,
+            'thrusting': self.thrusting,
+            'rotation_direction': self.rotation_direction,
+            'invulnerable': self.invulnerable,
+            'visible': self.visible,
+            'score': self.score,
+            'color_idx': self.color_idx
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a ship model from a dictionary (received from network)"""
+        model = cls(
+            data['x'],
+            data['y'],
+            player_id=data['player_id'],
+            player_name=data['player_name'],
+            color_idx=data['color_idx']
+        )
+        model.angle = data['angle']
+        model.velocity_x = data['velocity_x']
+        model.velocity_y = data['velocity_y']
+        model.thrusting = data['thrusting']
+        model.rotation_direction = data['rotation_direction']
+        model.invulnerable = data['invulnerable']
+        model.visible = data['visible']
+        model.score = data['score']
+        return model
+
+    def state(self):
+        """Get every simulated field of the ship, for a lockstep checkpoint"""
+        # Unlike to_dict, this includes the timers, so a restored ship carries on exactly
+        return {name: value for name, value in vars(self).items() if name != 'arena'}
+
+    @classmethod
+    def from_state(cls, state, arena=None):
+        """Recreate a ship from state()"""
+        model = cls(state['x'], state['y'], arena=arena)
+        vars(model).update(state)
+        return model
@@ -0,0 +1,164 @@
+from collections import deque
+
+# Snapshot protocol constants
+KEYFRAME_INTERVAL = 60  # Send a full snapshot at least once per second
+SNAPSHOT_HISTORY = 120  # Number of past snapshots kept as delta baselines
+# Ticks of events kept for clients that haven't acked them yet. This outlasts
+# connection.BACKLOG_DISCONNECT_TIME at 60 ticks per second, so a client whose
+# acks stall is normally disconnected before it can miss any
+EVENT_HISTORY = 360
+ENTITY_SECTIONS = ("ships", "asteroids", "lasers")
+
+
+class SnapshotHistory:
+    """Ring of recently sent world snapshots, keyed by tick"""
+    def __init__(self, size=SNAPSHOT_HISTORY):
+        self.size = size
+        self.snapshots = {}
+        self.ticks = deque()
+
+    def add(self, tick, snapshot):
+        """Store the snapshot for a tick, dropping the oldest one if full"""
+        if tick not in self.snapshots:
+            self.ticks.append(tick)
+        self.snapshots[tick] = snapshot
+
+        while len(self.ticks) > self.size:
+            del self.snapshots[self.ticks.popleft()]
+
+    def get(self, tick):
+        """Get the snapshot for a tick, or None if it is no longer kept"""
+        return self.snapshots.get(tick)
+
+
+class EventLog:
+    """Recent discrete events (joins, leaves, hits, spawns), each stamped with the tick it happened in"""
+    # Events ride along with snapshots. Snapshots can be dropped, so a client
+    # gets every event since the last snapshot it acked, and skips any it
+    # has already seen by their tick.
+    def __init__(self, size=EVENT_HISTORY):
+        self.size = size
+        self.events = deque()  # Event dicts, in tick order
+        self.forgotten_tick = None  # Tick of the newest event dropped from the history
+
+    def add(self, tick, event):
+        """Record an event, dropping events older than the history"""
+        event["tick"] = tick
+        self.events.append(event)
+        while self.events[0]["tick"] <= tick - self.size:
+            self.forgotten_tick = self.events.popleft()["tick"]
+
+    def complete_after(self, after):
+        """Check whether every event after a tick is still kept"""
+        return self.forgotten_tick is None or after >= self.forgotten_tick
+
+    def between(self, after, through):
+        """Get the events with after < tick <= through, oldest first"""
+        found = []
+        for event in reversed(self.events):
+            if event["tick"] <= after:
+                break
+            if event["tick"] <= through:
+                found.append(event)
+        found.reverse()
+        return found
+
+
+class ClientSnapshotState:
+    """Tracks the snapshot baseline a single client has acknowledged"""
+    def __init__(self, joined_tick=0):
+        self.joined_tick = joined_tick  # The client's welcome covers everything up to this tick
+        self.acked_tick = None
+        self.last_keyframe_tick = None
+        self.history = SnapshotHistory()  # Views sent to this client, filtered to its area of interest
+
+    def ack(self, tick):
+        """Record an acknowledgement from the client (acks never move backwards)"""
+        if self.acked_tick is None or tick > self.acked_tick:
+            self.acked_tick = tick
+
+    def events_after(self):
+        """Get the tick after which events may not have reached the client yet"""
+        return max(self.joined_tick, self.acked_tick) if self.acked_tick is not None else self.joined_tick
+
+    def baseline_tick(self, tick, history, periodic=True):
+        """Get the tick to delta against, or None if a keyframe is due"""
+        # Without periodic keyframes, a client that keeps acking only gets deltas
+        if self.acked_tick is None or history.get(self.acked_tick) is None:
+            return None
+        if periodic and (self.last_keyframe_tick is None or tick - self.last_keyframe_tick >= KEYFRAME_INTERVAL):
+            return None
+        return self.acked_tick
+
+
+def diff_snapshots(baseline, current):
+    """Build the delta that turns the baseline snapshot into the current one"""
+    data = {}
+    removed = {}
+
+    for section in ENTITY_SECTIONS:
+        old_entities = baseline[section]
+        new_entities = current[section]
+
+        # Entities that were created or changed since the baseline. Unchanged
+        # ships and asteroids are the very same dicts, so most skip the compare
+        data[section] = {
+            entity_id: entity
+            for entity_id, entity in new_entities.items()
+            if old_entities.get(entity_id) is not entity and old_entities.get(entity_id) != entity
+        }
+
+        # Entities that no longer exist
+        removed[section] = [entity_id for entity_id in old_entities if entity_id not in new_entities]
+
+    # Scores and level are small, so they are sent whole but only when changed
+    if baseline["scores"] != current["scores"]:
+        data["scores"] = current["scores"]
+    if baseline["level"] != current["level"]:
+        data["level"] = current["level"]
+
+    return data, removed
+
+
+def area_events(baseline, current, world_baseline, world):
+    """Find entities that entered or left a client's view without being created or destroyed"""
+    entered = {}
+    left = {}
+
+    for section in ENTITY_SECTIONS:
+        # In view now, out of view at the baseline, but already in the world then
+        entered[section] = [
+            entity_id for entity_id in current[section]
+            if entity_id not in baseline[section] and entity_id in world_baseline[section]
+        ]
+        # In view at the baseline, out of view now, but still in the world
+        left[section] = [
+            entity_id for entity_id in baseline[section]
+            if entity_id not in current[section] and entity_id in world[section]
+        ]
+
+    return entered, left
+
+
+def snapshot_message(tick, snapshot, baseline_tick=None, baseline=None, timestamp=None, world=None, world_baseline=None,
+                     events=None):
+    """Build a game_state message, either a keyframe or a delta against a baseline"""
+    # When snapshot is a filtered view, world and world_baseline are the
+    # unfiltered snapshots at the same ticks, used to report enter/leave events
+    message = {"type": "game_state", "tick": tick, "timestamp": timestamp}
+    if events:
+        message["events"] = events
+
+    if baseline is None:
+        message["keyframe"] = True
+        message["data"] = snapshot
+    else:
+        data, removed = diff_snapshots(baseline, snapshot)
+        message["keyframe"] = False
+        message["baseline"] = baseline_tick
+        message["data"] = data
+        message["removed"] = removed
+        if world is not None and world_baseline is not None:
+            message["entered"], message["left"] = area_events(baseline, snapshot, world_baseline, world)
+
+    return message
@@ -0,0 +1,53 @@
+import math
+
+DEFAULT_CELL_SIZE = 64  # Roughly the diameter of the largest asteroid
+
+
+class SpatialHash:
+    """Uniform grid broadphase: items are bucketed by the cells their bounds overlap"""
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE, wrap=None):
+        self.cells = {}
+
+        # On a toroidal world of size wrap=(width, height), cells are stretched
+        # slightly so a whole number of them tiles the world, and cell
+        # coordinates wrap around with it
+        self.columns = None
+        self.rows = None
+        self.cell_width = cell_size
+        self.cell_height = cell_size
+        if wrap is not None:
+            self.columns = max(1, round(wrap[0] / cell_size))
+            self.rows = max(1, round(wrap[1] / cell_size))
+            self.cell_width = wrap[0] / self.columns
+            self.cell_height = wrap[1] / self.rows
+
+    def cell_range(self, x, y, radius):
+        """Get the (x, y) cell coordinates covered by a circle's bounding box"""
+        min_x = math.floor((x - radius) / self.cell_width)
+        max_x = math.floor((x + radius) / self.cell_width)
+        min_y = math.floor((y - radius) / self.cell_height)
+        max_y = math.floor((y + radius) / self.cell_height)
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                if self.columns is not None:
+                    yield cell_x % self.columns, cell_y % self.rows
+                else:
+                    yield cell_x, cell_y
+
+    def insert(self, item, x, y, radius=0):
+        """Add an item covering the circle at (x, y)"""
+        for cell in self.cell_range(x, y, radius):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                self.cells[cell] = [item]
+            else:
+                bucket.append(item)
+
+    def query(self, x, y, radius=0):
+        """Get the set of items whose cells overlap the circle at (x, y)"""
+        found = set()
+        for cell in self.cell_range(x, y, radius):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        return found
@@ -0,0 +1,132 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+
+from aiohttp import web
+
+logger = logging.getLogger("asteroids_server")
+
+CACHE_CONTROL = "no-cache"  # Browsers may keep assets but must revalidate them (cheap, thanks to ETags)
+WATCH_INTERVAL = 1.0  # Seconds between modification checks when watching for changes
+MIN_GZIP_SIZE = 256  # Smaller files aren't worth compressing
+
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 asks for GETs)"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag or tag == "W/" + etag:
+            return True
+    return False
+
+
+def accepts_gzip(accept_encoding):
+    """Check whether an Accept-Encoding header allows gzip, i.e. gives it (or failing that, *) a q-value above 0"""
+    if not accept_encoding:
+        return False
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0  # Unreadable, so don't count on it
+        qualities[coding] = quality
+    # An explicit gzip (or its old alias) beats the wildcard
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+class StaticAsset:
+    """One file held in memory, with its gzip-compressed body and ETag"""
+    def __init__(self, path, content_type):
+        self.path = path
+        self.content_type = content_type
+        self.load()
+
+    def load(self):
+        """Read and compress the file"""
+        with open(self.path, "rb") as f:
+            self.body = f.read()
+        self.mtime = os.stat(self.path).st_mtime_ns
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'  # Strong ETags differ between encodings of the same content
+        self.gzipped = None
+        if len(self.body) >= MIN_GZIP_SIZE:
+            # mtime=0 keeps the compressed bytes stable across reloads
+            compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if len(compressed) < len(self.body):
+                self.gzipped = compressed
+
+    def changed(self):
+        """Check whether the file on disk has been modified since it was loaded"""
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime
+        except OSError:
+            return False
+
+
+class StaticAssets:
+    """Serves the web client's files from memory, precompressed, with ETags and conditional GETs"""
+    def __init__(self, root="."):
+        self.root = root
+        self.assets = {}  # Maps URL path to StaticAsset
+        self.watch_task = None
+
+    def add(self, url_path, filename, content_type):
+        """Load a file and serve it at a URL path"""
+        self.assets[url_path] = StaticAsset(os.path.join(self.root, filename), content_type)
+
+    def register(self, router):
+        """Add a GET route for every asset"""
+        for url_path in self.assets:
+            router.add_get(url_path, self.handle)
+
+    async def handle(self, request):
+        """Serve an asset, or 304 Not Modified if the browser's copy is current"""
+        asset = self.assets[request.path]
+        gzipped = asset.gzipped is not None and accepts_gzip(request.headers.get("Accept-Encoding"))
+        headers = {
+            "ETag": asset.gzip_etag if gzipped else asset.etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+
+        if etag_matches(request.headers.get("If-None-Match"), headers["ETag"]):
+            return web.Response(status=304, headers=headers)
+
+        headers["Content-Type"] = asset.content_type
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return web.Response(body=asset.gzipped, headers=headers)
+        return web.Response(body=asset.body, headers=headers)
+
+    def start_watching(self, interval=WATCH_INTERVAL):
+        """Reload assets when their files change (for development)"""
+        self.watch_task = asyncio.create_task(self.watch(interval))
+
+    async def watch(self, interval):
+        """Poll the files' modification times and reload any that changed"""
+        while True:
+            await asyncio.sleep(interval)
+            for url_path, asset in self.assets.items():
+                if asset.changed():
+                    try:
+                        asset.load()
+                        logger.info(f"Reloaded {asset.path} for {url_path}")
+                    except OSError as e:
+                        logger.warning(f"Could not reload {asset.path}: {str(e)}")
@@ -0,0 +1,50 @@
+from input_queue import MAX_INPUT_LEAD, MAX_QUEUED_INPUTS, InputQueue
+
+
+def test_inputs_wait_for_their_tick():
+    queue = InputQueue()
+    queue.push(1, 5, {"fire": True}, current_tick=2, view_tick=1)
+
+    assert queue.pop_due(4) == []
+    assert queue.pop_due(5) == [({"fire": True}, 1)]
+    assert queue.last_applied_seq == 1
+
+
+def test_duplicates_are_rejected():
+    queue = InputQueue()
+
+    assert queue.push(3, 5, {}, current_tick=0)
+    assert not queue.push(3, 5, {}, current_tick=0)
+    assert not queue.push(2, 6, {}, current_tick=0)
+    assert len(queue.pending) == 1
+
+
+def test_target_ticks_are_clamped():
+    queue = InputQueue()
+    queue.push(1, 3, {"late": True}, current_tick=10)
+    queue.push(2, 1000, {"early": True}, current_tick=10)
+    queue.push(3, None, {"untimed": True}, current_tick=10)
+
+    # Late inputs go into the next tick, far-off ones are pulled in, and
+    # nothing is reordered ahead of an input that was sent before it
+    assert [entry[0] for entry in queue.pending] == [11, 10 + MAX_INPUT_LEAD, 10 + MAX_INPUT_LEAD]
+
+
+def test_unsequenced_inputs_are_accepted():
+    queue = InputQueue()
+
+    assert queue.push(None, 1, {"a": 1}, current_tick=0)
+    assert queue.push(None, 1, {"a": 2}, current_tick=0)
+    assert queue.pop_due(1) == [({"a": 1}, None), ({"a": 2}, None)]
+    assert queue.last_applied_seq is None
+
+
+def test_overfull_queue_applies_oldest_early():
+    queue = InputQueue()
+    for seq in range(MAX_QUEUED_INPUTS + 5):
+        queue.push(seq, 20, {"seq": seq}, current_tick=0)
+
+    due = queue.pop_due(0)
+
+    assert [inputs["seq"] for inputs, _ in due] == list(range(5))
+    assert len(queue.pending) == MAX_QUEUED_INPUTS
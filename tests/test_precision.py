@@ -0,0 +1,84 @@
+import pytest
+
+from precision import POSITION_LIMIT, ANGLE_LIMIT, VELOCITY_LIMIT, DEFAULT_PRECISION, PrecisionProfile
+from wire import SHIP_RECORD
+
+WIDTH, HEIGHT = 4096, 3072
+
+
+def test_positions_wrap_into_the_arena():
+    precision = DEFAULT_PRECISION
+
+    assert precision.position_to_steps(0, WIDTH) == 0
+    # Rounding up to the far edge lands back on 0
+    assert precision.position_to_steps(WIDTH - 0.01, WIDTH) == 0
+    assert precision.position_to_steps(-1, WIDTH) == (WIDTH - 1) * precision.position_scale
+    assert 0 <= precision.position_to_steps(WIDTH * 3 + 5.5, WIDTH) < POSITION_LIMIT
+
+
+def test_angles_fit_one_byte():
+    precision = DEFAULT_PRECISION
+
+    assert precision.angle_to_steps(0) == 0
+    assert precision.angle_to_steps(359.9) == 0
+    assert precision.angle_to_steps(-90) == 3 * ANGLE_LIMIT // 4
+    for angle in range(-720, 720, 7):
+        assert 0 <= precision.angle_to_steps(angle) < ANGLE_LIMIT
+
+
+def test_velocities_clamp_to_int16():
+    precision = DEFAULT_PRECISION
+
+    assert precision.velocity_to_steps(1e9) == VELOCITY_LIMIT - 1
+    assert precision.velocity_to_steps(-1e9) == -VELOCITY_LIMIT
+    assert precision.velocity_to_steps(-0.5) == -precision.velocity_scale // 2
+
+
+def test_quantizing_is_idempotent():
+    precision = DEFAULT_PRECISION
+    for value in (0.0, 0.06, 123.4567, WIDTH - 0.001, -3.3):
+        once = precision.position(value, WIDTH)
+        assert precision.position(once, WIDTH) == once
+    for value in (0.0, 1.41, 359.99, -45.3):
+        once = precision.angle(value)
+        assert precision.angle(once) == once
+        assert 0 <= once < 360
+    for value in (0.0, 8.5, -2.0001, 1e6):
+        once = precision.velocity(value)
+        assert precision.velocity(once) == once
+
+
+def test_extreme_ships_pack_into_their_record():
+    precision = DEFAULT_PRECISION
+    ship = precision.quantize_ship({
+        "x": WIDTH - 0.0001, "y": -0.0001, "angle": -0.1, "velocity_x": 1e9, "velocity_y": -1e9,
+    }, WIDTH, HEIGHT)
+
+    SHIP_RECORD.pack(
+        0, precision.position_to_steps(ship["x"], WIDTH), precision.position_to_steps(ship["y"], HEIGHT),
+        precision.angle_to_steps(ship["angle"]),
+        precision.velocity_to_steps(ship["velocity_x"]), precision.velocity_to_steps(ship["velocity_y"]),
+        0, 0, 0,
+    )
+    assert ship["x"] == 0.0
+    assert ship["angle"] == 0.0
+
+
+def test_arena_must_fit_position_fields():
+    DEFAULT_PRECISION.check_arena(WIDTH, HEIGHT)
+    with pytest.raises(ValueError):
+        DEFAULT_PRECISION.check_arena(8193, 100)
+    PrecisionProfile(position_scale=4).check_arena(8192 * 2, 100)
+
+
+def test_angle_steps_are_limited_to_one_byte():
+    with pytest.raises(ValueError):
+        PrecisionProfile(angle_steps=ANGLE_LIMIT + 1)
+
+
+def test_profile_round_trips_through_its_dict():
+    profile = PrecisionProfile(position_scale=4, angle_steps=128, velocity_scale=64)
+    copy = PrecisionProfile(**profile.to_dict())
+
+    assert copy.to_dict() == profile.to_dict()
+    assert copy.angle(100.0) == profile.angle(100.0)
@@ -0,0 +1,65 @@
+from priority import MIN_BUDGET, BUDGET_RECOVERY_SNAPSHOTS, SnapshotBudget
+
+
+def test_highest_priority_fits_first():
+    budget = SnapshotBudget(100)
+
+    selected = budget.select([("asteroids", 1, 1.0, 60), ("ships", "a", 4.0, 60), ("lasers", 2, 2.0, 30)], 100)
+
+    assert selected == {("ships", "a"), ("lasers", 2)}
+    assert budget.deferred == 1
+    assert budget.priorities == {("asteroids", 1): 1.0}
+
+
+def test_top_candidate_goes_even_over_budget():
+    budget = SnapshotBudget(10)
+
+    assert budget.select([("ships", "a", 4.0, 50), ("ships", "b", 1.0, 50)], 10) == {("ships", "a")}
+
+
+def test_deferred_updates_accumulate_until_sent():
+    budget = SnapshotBudget(50)
+    waits = 0
+    # A low-priority update competing with a steady stream of high-priority ones
+    while True:
+        selected = budget.select([("ships", "a", 4.0, 50), ("asteroids", 1, 1.0, 50)], 50)
+        if ("asteroids", 1) in selected:
+            break
+        waits += 1
+        assert waits < 10
+
+    assert waits == 4
+    # Once sent, its priority starts over
+    assert ("asteroids", 1) not in budget.priorities
+
+
+def test_updates_no_longer_waiting_are_forgotten():
+    budget = SnapshotBudget(10)
+    budget.select([("ships", "a", 4.0, 10), ("asteroids", 1, 1.0, 10)], 10)
+    assert ("asteroids", 1) in budget.priorities
+
+    budget.select([("ships", "a", 4.0, 10)], 10)
+
+    assert budget.priorities == {}
+    assert budget.deferred == 0
+
+
+def test_budget_halves_on_drops_and_recovers():
+    budget = SnapshotBudget(4000)
+
+    budget.adapt(1)
+    assert budget.budget == 2000
+    budget.adapt(1)  # No new drops
+    assert budget.budget == 2000 + 4000 // BUDGET_RECOVERY_SNAPSHOTS
+
+    for _ in range(BUDGET_RECOVERY_SNAPSHOTS):
+        budget.adapt(1)
+    assert budget.budget == 4000
+
+
+def test_budget_never_drops_below_minimum():
+    budget = SnapshotBudget(4000)
+    for dropped in range(1, 20):
+        budget.adapt(dropped)
+
+    assert budget.budget == MIN_BUDGET
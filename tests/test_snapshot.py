@@ -0,0 +1,181 @@
+import copy
+
+from snapshot import (
+    KEYFRAME_INTERVAL, ENTITY_SECTIONS, SnapshotHistory, EventLog, ClientSnapshotState,
+    diff_snapshots, area_events, snapshot_message,
+)
+
+
+def make_snapshot(ships=None, asteroids=None, lasers=None, scores=None, level=1):
+    return {
+        "ships": ships or {},
+        "asteroids": asteroids or {},
+        "lasers": lasers or {},
+        "scores": scores or {},
+        "level": level,
+    }
+
+
+def apply_delta(baseline, data, removed):
+    """Apply a delta the way clients do: start from the baseline, overwrite changes, drop removals"""
+    result = copy.deepcopy(baseline)
+    for section in ENTITY_SECTIONS:
+        result[section].update(copy.deepcopy(data[section]))
+        for entity_id in removed[section]:
+            del result[section][entity_id]
+    for key in ("scores", "level"):
+        if key in data:
+            result[key] = data[key]
+    return result
+
+
+def test_delta_turns_baseline_into_current():
+    ship = {"x": 1.0, "y": 2.0}
+    rock = {"x": 10.0, "level": 1}
+    baseline = make_snapshot(
+        ships={"a": ship, "b": {"x": 5.0, "y": 5.0}},
+        asteroids={1: rock, 2: {"x": 20.0, "level": 2}},
+        lasers={7: {"x": 0.0}},
+        scores={"a": 0, "b": 100},
+    )
+    current = make_snapshot(
+        ships={"a": ship, "c": {"x": 9.0, "y": 9.0}},
+        asteroids={1: rock, 3: {"x": 30.0, "level": 3}},
+        lasers={7: {"x": 10.0}, 8: {"x": 3.0}},
+        scores={"a": 100, "c": 0},
+        level=2,
+    )
+
+    data, removed = diff_snapshots(baseline, current)
+
+    assert apply_delta(baseline, data, removed) == current
+    assert removed == {"ships": ["b"], "asteroids": [2], "lasers": []}
+    # Unchanged entities are left out
+    assert "a" not in data["ships"]
+    assert 1 not in data["asteroids"]
+
+
+def test_equal_copies_count_as_unchanged():
+    baseline = make_snapshot(ships={"a": {"x": 1.0}})
+    current = make_snapshot(ships={"a": {"x": 1.0}})
+
+    data, removed = diff_snapshots(baseline, current)
+
+    assert data == {"ships": {}, "asteroids": {}, "lasers": {}}
+    assert removed == {"ships": [], "asteroids": [], "lasers": []}
+
+
+def test_scores_and_level_only_sent_when_changed():
+    baseline = make_snapshot(scores={"a": 0}, level=1)
+
+    data, _ = diff_snapshots(baseline, make_snapshot(scores={"a": 0}, level=1))
+    assert "scores" not in data and "level" not in data
+
+    data, _ = diff_snapshots(baseline, make_snapshot(scores={"a": 50}, level=3))
+    assert data["scores"] == {"a": 50}
+    assert data["level"] == 3
+
+
+def test_snapshot_message_keyframe_and_delta():
+    baseline = make_snapshot(asteroids={1: {"x": 1.0}})
+    current = make_snapshot(asteroids={2: {"x": 2.0}})
+
+    keyframe = snapshot_message(10, current, events=[{"type": "spawn", "tick": 10}])
+    assert keyframe["keyframe"] is True
+    assert keyframe["data"] is current
+    assert keyframe["events"] == [{"type": "spawn", "tick": 10}]
+
+    delta = snapshot_message(10, current, baseline_tick=8, baseline=baseline)
+    assert delta["keyframe"] is False
+    assert delta["baseline"] == 8
+    assert apply_delta(baseline, delta["data"], delta["removed"]) == current
+    assert "events" not in delta
+
+
+def test_area_events_ignore_created_and_destroyed_entities():
+    world_baseline = make_snapshot(asteroids={1: {}, 2: {}, 3: {}})
+    world = make_snapshot(asteroids={1: {}, 2: {}, 4: {}})
+    baseline = make_snapshot(asteroids={2: {}, 3: {}})
+    current = make_snapshot(asteroids={1: {}, 4: {}})
+
+    entered, left = area_events(baseline, current, world_baseline, world)
+
+    # 4 was created and 3 destroyed, so the delta itself reports them
+    assert entered["asteroids"] == [1]
+    assert left["asteroids"] == [2]
+
+
+def test_snapshot_history_drops_oldest():
+    history = SnapshotHistory(size=2)
+    for tick in range(1, 4):
+        history.add(tick, {"tick": tick})
+
+    assert history.get(1) is None
+    assert history.get(2) == {"tick": 2}
+    assert history.get(3) == {"tick": 3}
+
+
+def test_baseline_tick_needs_an_ack_of_a_kept_snapshot():
+    history = SnapshotHistory()
+    history.add(5, make_snapshot())
+    state = ClientSnapshotState()
+
+    assert state.baseline_tick(6, history) is None
+
+    state.ack(5)
+    state.last_keyframe_tick = 5
+    assert state.baseline_tick(6, history) == 5
+
+    state.ack(4)  # Acks never move backwards
+    assert state.acked_tick == 5
+
+    state.ack(6)  # Not in the history
+    assert state.baseline_tick(7, history) is None
+
+
+def test_baseline_tick_periodic_keyframes():
+    history = SnapshotHistory()
+    history.add(1, make_snapshot())
+    state = ClientSnapshotState()
+    state.ack(1)
+    state.last_keyframe_tick = 1
+
+    tick = 1 + KEYFRAME_INTERVAL
+    assert state.baseline_tick(tick, history) is None
+    assert state.baseline_tick(tick, history, periodic=False) == 1
+
+
+def test_events_after_counts_from_join_until_acked():
+    state = ClientSnapshotState(joined_tick=10)
+    assert state.events_after() == 10
+
+    state.ack(5)
+    assert state.events_after() == 10
+
+    state.ack(12)
+    assert state.events_after() == 12
+
+
+def test_event_log_between():
+    events = EventLog()
+    for tick in (1, 2, 2, 3, 5):
+        events.add(tick, {"type": "hit"})
+
+    assert [event["tick"] for event in events.between(1, 3)] == [2, 2, 3]
+    assert [event["tick"] for event in events.between(3, 10)] == [5]
+    assert events.between(5, 10) == []
+
+
+def test_event_log_forgets_old_events():
+    events = EventLog(size=10)
+    events.add(1, {"type": "spawn"})
+    events.add(5, {"type": "spawn"})
+    assert events.complete_after(0)
+
+    events.add(12, {"type": "spawn"})
+
+    assert [event["tick"] for event in events.between(0, 20)] == [5, 12]
+    assert events.forgotten_tick == 1
+    # A client that has everything through tick 1 missed nothing
+    assert events.complete_after(1)
+    assert not events.complete_after(0)
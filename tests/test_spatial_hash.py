@@ -0,0 +1,35 @@
+from spatial_hash import SpatialHash
+
+
+def test_query_finds_overlapping_items():
+    grid = SpatialHash(cell_size=64)
+    grid.insert("near", 100, 100, radius=10)
+    grid.insert("far", 500, 500, radius=10)
+
+    assert grid.query(110, 100) == {"near"}
+    assert grid.query(300, 300) == set()
+
+
+def test_items_cover_every_cell_of_their_bounds():
+    grid = SpatialHash(cell_size=64)
+    grid.insert("big", 64, 64, radius=30)
+
+    # The circle straddles four cells
+    for x, y in ((40, 40), (90, 40), (40, 90), (90, 90)):
+        assert grid.query(x, y) == {"big"}
+
+
+def test_wrapping_grid_tiles_the_world():
+    grid = SpatialHash(cell_size=64, wrap=(1000, 600))
+
+    assert grid.columns * grid.cell_width == 1000
+    assert grid.rows * grid.cell_height == 600
+
+
+def test_wrapping_grid_finds_items_across_the_edge():
+    grid = SpatialHash(cell_size=64, wrap=(1024, 768))
+    grid.insert("edge", 1020, 765, radius=8)
+
+    assert grid.query(2, 2) == {"edge"}
+    assert grid.query(-4, -4) == {"edge"}
+    assert grid.query(512, 384) == set()
@@ -0,0 +1,234 @@
+import json
+
+from precision import DEFAULT_PRECISION
+from snapshot import snapshot_message
+from wire import (
+    MSG_SNAPSHOT, MSG_INPUT, MSG_ACK, INPUT_LEFT, INPUT_RIGHT, INPUT_THRUST, INPUT_FIRE,
+    FLAG_KEYFRAME, FLAG_SCORES, FLAG_AREA_EVENTS, FLAG_EVENTS, SHIP_THRUSTING, SHIP_INVULNERABLE, SHIP_VISIBLE,
+    SHIP_ROTATING_LEFT, SHIP_ROTATING_RIGHT, NO_BASELINE, NO_INPUT_SEQ,
+    HEADER, COUNT8, COUNT16, SHIP_RECORD, ASTEROID_RECORD, LASER_RECORD, SCORE_RECORD, ENTITY_ID, EVENTS_LENGTH,
+    INPUT_MESSAGE, ACK_MESSAGE,
+    FragmentCache, encode_json_fragment, encode_json_snapshot, encode_record, encode_snapshot, decode_client_message,
+)
+
+ARENA = (2048, 1536)
+
+
+class Reader:
+    """Reads fixed-layout records off the front of a frame"""
+    def __init__(self, frame):
+        self.frame = frame
+        self.offset = 0
+
+    def read(self, record):
+        values = record.unpack_from(self.frame, self.offset)
+        self.offset += record.size
+        return values
+
+    def read_bytes(self, length):
+        data = self.frame[self.offset:self.offset + length]
+        self.offset += length
+        return data
+
+    def read_ids(self):
+        (ship_count,) = self.read(COUNT8)
+        ids = {"ships": [self.read(COUNT8)[0] for _ in range(ship_count)]}
+        for section in ("asteroids", "lasers"):
+            (count,) = self.read(COUNT16)
+            ids[section] = [self.read(ENTITY_ID)[0] for _ in range(count)]
+        return ids
+
+
+def decode_snapshot(frame, precision=DEFAULT_PRECISION):
+    """Decode a binary snapshot frame the way client.js does, with ships keyed by net_id"""
+    reader = Reader(frame)
+    kind, tick, baseline, flags, level, input_seq = reader.read(HEADER)
+    assert kind == MSG_SNAPSHOT
+    decoded = {"tick": tick, "baseline": baseline, "flags": flags, "level": level, "input_seq": input_seq}
+
+    if flags & FLAG_EVENTS:
+        (length,) = reader.read(EVENTS_LENGTH)
+        decoded["events"] = json.loads(reader.read_bytes(length))
+
+    scale = precision.position_scale
+    ships = {}
+    for _ in range(reader.read(COUNT8)[0]):
+        net_id, x, y, angle, vx, vy, ship_flags, score, color_idx = reader.read(SHIP_RECORD)
+        ships[net_id] = {
+            "x": x / scale, "y": y / scale, "angle": angle * precision.angle_step,
+            "velocity_x": vx / precision.velocity_scale, "velocity_y": vy / precision.velocity_scale,
+            "thrusting": bool(ship_flags & SHIP_THRUSTING),
+            "invulnerable": bool(ship_flags & SHIP_INVULNERABLE),
+            "visible": bool(ship_flags & SHIP_VISIBLE),
+            "rotation_direction": 1 if ship_flags & SHIP_ROTATING_LEFT else -1 if ship_flags & SHIP_ROTATING_RIGHT else 0,
+            "score": score, "color_idx": color_idx,
+        }
+    asteroids = {}
+    for _ in range(reader.read(COUNT16)[0]):
+        entity_id, x, y, vx, vy, spawn_tick, angle, spin, level = reader.read(ASTEROID_RECORD)
+        asteroids[entity_id] = {
+            "x": x / scale, "y": y / scale,
+            "vx": vx / precision.velocity_scale, "vy": vy / precision.velocity_scale,
+            "tick": spawn_tick, "angle": angle * precision.angle_step,
+            "spin": spin / precision.velocity_scale, "level": level,
+        }
+    lasers = {}
+    for _ in range(reader.read(COUNT16)[0]):
+        entity_id, x, y, angle, owner, age = reader.read(LASER_RECORD)
+        lasers[entity_id] = {"x": x / scale, "y": y / scale, "angle": angle * precision.angle_step,
+                             "owner": owner, "tick": tick - age}
+    decoded["data"] = {"ships": ships, "asteroids": asteroids, "lasers": lasers}
+    decoded["removed"] = reader.read_ids()
+
+    if flags & FLAG_SCORES:
+        decoded["scores"] = dict(reader.read(SCORE_RECORD) for _ in range(reader.read(COUNT8)[0]))
+    if flags & FLAG_AREA_EVENTS:
+        decoded["entered"] = reader.read_ids()
+        decoded["left"] = reader.read_ids()
+
+    assert reader.offset == len(frame)
+    return decoded
+
+
+def make_ship(player_id, net_id, x, y, **fields):
+    ship = {
+        "player_id": player_id, "player_name": player_id, "x": x, "y": y, "angle": 33.3,
+        "velocity_x": 1.234, "velocity_y": -2.5, "thrusting": True, "rotation_direction": -1,
+        "invulnerable": False, "visible": True, "score": 300, "color_idx": 2, "net_id": net_id,
+    }
+    ship.update(fields)
+    return DEFAULT_PRECISION.quantize_ship(ship, *ARENA)
+
+
+def make_asteroid(entity_id, x, y, level=1):
+    precision = DEFAULT_PRECISION
+    return {
+        "id": entity_id, "x": precision.position(x, ARENA[0]), "y": precision.position(y, ARENA[1]),
+        "vx": precision.velocity(1.7), "vy": precision.velocity(-0.6), "tick": 40,
+        "angle": precision.angle(200.0), "spin": precision.velocity(-1.3), "level": level,
+    }
+
+
+def make_world():
+    lasers = {
+        9: DEFAULT_PRECISION.quantize_laser({"id": 9, "x": 100.3, "y": 1535.99, "angle": 91.0, "player_id": "a", "tick": 95},
+                                            *ARENA),
+    }
+    return {
+        "ships": {"a": make_ship("a", 3, 10.06, 20.5), "b": make_ship("b", 200, 2000.0, 1500.25, rotation_direction=1)},
+        "asteroids": {5: make_asteroid(5, 300.1, 400.2), 6: make_asteroid(6, 1.0, 1535.9, level=3)},
+        "lasers": lasers,
+        "scores": {"a": 300, "b": 0},
+        "level": 2,
+    }
+
+
+def test_input_frame_round_trip():
+    frame = INPUT_MESSAGE.pack(MSG_INPUT, INPUT_LEFT | INPUT_THRUST, 7, 123)
+
+    assert decode_client_message(frame) == {
+        "type": "input", "seq": 7, "tick": 123,
+        "data": {"rotation": 1, "thrust": True, "fire": False},
+    }
+    frame = INPUT_MESSAGE.pack(MSG_INPUT, INPUT_RIGHT | INPUT_FIRE, 8, 124)
+    assert decode_client_message(frame)["data"] == {"rotation": -1, "thrust": False, "fire": True}
+
+
+def test_ack_frame_round_trip():
+    assert decode_client_message(ACK_MESSAGE.pack(MSG_ACK, 99)) == {"type": "ack", "tick": 99}
+
+
+def test_malformed_client_frames_are_ignored():
+    assert decode_client_message(b"") is None
+    assert decode_client_message(ACK_MESSAGE.pack(MSG_ACK, 99)[:-1]) is None
+    assert decode_client_message(bytes([MSG_SNAPSHOT]) + bytes(8)) is None
+
+
+def test_binary_keyframe_round_trip():
+    world = make_world()
+    message = snapshot_message(100, world, events=[{"type": "spawn", "player_id": "a", "tick": 100}])
+    message["input_seq"] = 12
+
+    decoded = decode_snapshot(encode_snapshot(message, world, ARENA))
+
+    assert decoded["flags"] & FLAG_KEYFRAME
+    assert decoded["baseline"] == NO_BASELINE
+    assert decoded["level"] == 2
+    assert decoded["input_seq"] == 12
+    assert decoded["events"] == message["events"]
+    for ship in world["ships"].values():
+        expected = {key: ship[key] for key in decoded["data"]["ships"][ship["net_id"]]}
+        assert decoded["data"]["ships"][ship["net_id"]] == expected
+    for entity_id, asteroid in world["asteroids"].items():
+        assert decoded["data"]["asteroids"][entity_id] == {key: value for key, value in asteroid.items() if key != "id"}
+    # Positions at the far edge wrap back to 0
+    assert decoded["data"]["lasers"][9] == {"x": world["lasers"][9]["x"], "y": 0.0, "angle": world["lasers"][9]["angle"],
+                                            "owner": 3, "tick": 95}
+    assert world["lasers"][9]["y"] == 0.0
+    assert decoded["scores"] == {3: 300, 200: 0}
+
+
+def test_binary_delta_round_trip():
+    baseline = make_world()
+    world = make_world()
+    world["ships"]["a"] = baseline["ships"]["a"]
+    world["asteroids"] = {5: baseline["asteroids"][5], 7: make_asteroid(7, 50.0, 60.0)}
+    del world["ships"]["b"]
+    message = snapshot_message(110, world, baseline_tick=100, baseline=baseline, world=world, world_baseline=baseline)
+
+    decoded = decode_snapshot(encode_snapshot(message, world, ARENA, baseline))
+
+    assert not decoded["flags"] & FLAG_KEYFRAME
+    assert decoded["baseline"] == 100
+    assert decoded["input_seq"] == NO_INPUT_SEQ
+    assert decoded["data"]["ships"] == {}
+    assert list(decoded["data"]["asteroids"]) == [7]
+    # The departed ship is named by the net id it had in the baseline
+    assert decoded["removed"] == {"ships": [200], "asteroids": [6], "lasers": []}
+    assert "scores" not in decoded
+
+
+def test_records_match_precision_steps():
+    ship = make_ship("a", 3, 10.06, 20.5)
+    record = SHIP_RECORD.unpack(encode_record("ships", "a", ship, ARENA))
+    precision = DEFAULT_PRECISION
+
+    assert record[1] == precision.position_to_steps(ship["x"], ARENA[0])
+    assert record[3] == precision.angle_to_steps(ship["angle"])
+    assert len(encode_record("asteroids", 5, make_asteroid(5, 1.0, 2.0), ARENA)) == ASTEROID_RECORD.size
+
+
+def test_json_snapshot_with_fragments_matches_plain_json():
+    world = make_world()
+    message = snapshot_message(100, world, events=[{"type": "hit", "tick": 100}])
+    fragments = FragmentCache(encode_json_fragment)
+
+    encoded = encode_json_snapshot(message, fragments)
+
+    assert json.loads(encoded) == json.loads(json.dumps(message))
+    assert json.loads(encoded) == json.loads(encode_json_snapshot(message))
+
+
+def test_fragment_cache_reencodes_only_changed_entities():
+    encoded = []
+
+    def encode(section, entity_id, entity):
+        encoded.append(entity_id)
+        return f"{entity_id}:{entity['x']}"
+
+    cache = FragmentCache(encode)
+    rock = {"x": 1.0}
+    assert cache.get("asteroids", 1, rock) == "1:1.0"
+    assert cache.get("asteroids", 1, rock) == "1:1.0"
+    # An equal but new dict means the entity changed
+    assert cache.get("asteroids", 1, {"x": 2.0}) == "1:2.0"
+    assert encoded == [1, 1]
+
+
+def test_fragment_cache_prunes_departed_entities():
+    cache = FragmentCache(lambda section, entity_id, entity: b"")
+    for entity_id in range(100):
+        cache.get("asteroids", entity_id, {})
+
+    cache.prune({"ships": {}, "asteroids": {1: {}}})
+    assert list(cache.fragments) == [("asteroids", 1)]
@@ -0,0 +1,250 @@
+import json
+import struct
+
+from precision import DEFAULT_PRECISION
+
+# Encodings a client can ask for in its join message
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+ENCODINGS = (ENCODING_JSON, ENCODING_BINARY)
+
+# Binary message kinds (first byte of every binary frame)
+MSG_SNAPSHOT = 1  # Server -> client
+MSG_INPUT = 2  # Client -> server
+MSG_ACK = 3  # Client -> server
+
+# Input bitfield
+INPUT_LEFT = 1 << 0
+INPUT_RIGHT = 1 << 1
+INPUT_THRUST = 1 << 2
+INPUT_FIRE = 1 << 3
+
+# Snapshot header flags
+FLAG_KEYFRAME = 1 << 0
+FLAG_SCORES = 1 << 1
+FLAG_AREA_EVENTS = 1 << 2
+FLAG_EVENTS = 1 << 3
+
+# Ship state flags
+SHIP_THRUSTING = 1 << 0
+SHIP_INVULNERABLE = 1 << 1
+SHIP_VISIBLE = 1 << 2
+SHIP_ROTATING_LEFT = 1 << 3
+SHIP_ROTATING_RIGHT = 1 << 4
+
+NO_BASELINE = 0xFFFFFFFF
+NO_INPUT_SEQ = 0xFFFFFFFF
+
+# Sections whose encoded entities are cached between snapshots. Lasers move
+# every tick, so caching theirs would only cost
+CACHED_SECTIONS = ("ships", "asteroids")
+PRUNE_SLACK = 64  # Departed entities a fragment cache may hold beyond twice the live ones
+
+# Fixed-layout records (little-endian, no padding). Positions, angles,
+# velocities and spins are quantized steps of the room's PrecisionProfile
+HEADER = struct.Struct("<BIIBHI")  # kind, tick, baseline, flags, level, last applied input seq
+COUNT8 = struct.Struct("<B")
+COUNT16 = struct.Struct("<H")
+SHIP_RECORD = struct.Struct("<BHHBhhBiB")  # net_id, x, y, angle, vx, vy, flags, score, color_idx
+ASTEROID_RECORD = struct.Struct("<IHHhhIBhB")  # id, spawn x, y, vx, vy, spawn tick, angle, spin, level
+LASER_RECORD = struct.Struct("<IHHBBH")  # id, x, y, angle, owner net_id, ticks since it was fired
+SCORE_RECORD = struct.Struct("<Bi")  # net_id, score
+ENTITY_ID = struct.Struct("<I")
+EVENTS_LENGTH = struct.Struct("<I")  # Byte length of the JSON event list that follows
+INPUT_MESSAGE = struct.Struct("<BBII")  # kind, input bits, seq, target tick
+ACK_MESSAGE = struct.Struct("<BI")  # kind, tick
+
+
+def pack_ship_flags(ship):
+    """Pack the boolean ship fields into one byte"""
+    flags = 0
+    if ship["thrusting"]:
+        flags |= SHIP_THRUSTING
+    if ship["invulnerable"]:
+        flags |= SHIP_INVULNERABLE
+    if ship["visible"]:
+        flags |= SHIP_VISIBLE
+    if ship["rotation_direction"] > 0:
+        flags |= SHIP_ROTATING_LEFT
+    elif ship["rotation_direction"] < 0:
+        flags |= SHIP_ROTATING_RIGHT
+    return flags
+
+
+class FragmentCache:
+    """Encoded form of each ship and asteroid, reused across snapshots and clients while the entity is unchanged"""
+    # A room hands out the same snapshot dict for an entity until one of its
+    # fields changes, so an identity check tells whether a fragment is current
+    def __init__(self, encode):
+        self.encode = encode  # (section, entity_id, entity) -> fragment
+        self.fragments = {}  # Maps (section, entity_id) to (entity dict, fragment)
+
+    def get(self, section, entity_id, entity):
+        """Get an entity's fragment, encoding it only if the entity changed since it was last encoded"""
+        key = (section, entity_id)
+        cached = self.fragments.get(key)
+        if cached is not None and cached[0] is entity:
+            return cached[1]
+        fragment = self.encode(section, entity_id, entity)
+        self.fragments[key] = (entity, fragment)
+        return fragment
+
+    def prune(self, snapshot):
+        """Forget entities that have left the world, once they make up over half the cache"""
+        live = sum(len(snapshot[section]) for section in CACHED_SECTIONS)
+        if len(self.fragments) > 2 * live + PRUNE_SLACK:
+            self.fragments = {key: entry for key, entry in self.fragments.items() if key[1] in snapshot[key[0]]}
+
+
+def encode_json_fragment(section, entity_id, entity):
+    """Encode one entity as the `"id": {...}` member json.dumps would write for it"""
+    return f"{json.dumps(str(entity_id))}: {json.dumps(entity)}"
+
+
+def encode_json_snapshot(message, fragments=None):
+    """Encode a game_state message as JSON, splicing in cached ship and asteroid fragments"""
+    if fragments is None:
+        return json.dumps(message)
+
+    members = []
+    for key, value in message["data"].items():
+        if key in CACHED_SECTIONS:
+            body = ", ".join(fragments.get(key, entity_id, entity) for entity_id, entity in value.items())
+            members.append(f'"{key}": {{{body}}}')
+        else:
+            members.append(f"{json.dumps(key)}: {json.dumps(value)}")
+    head = json.dumps({key: value for key, value in message.items() if key != "data"})
+    return f'{head[:-1]}, "data": {{{", ".join(members)}}}}}'
+
+
+def encode_record(section, entity_id, entity, arena, precision=DEFAULT_PRECISION):
+    """Pack a ship or asteroid as its fixed-layout binary record, in a (width, height) arena"""
+    width, height = arena
+    if section == "ships":
+        return SHIP_RECORD.pack(
+            entity["net_id"],
+            precision.position_to_steps(entity["x"], width), precision.position_to_steps(entity["y"], height),
+            precision.angle_to_steps(entity["angle"]),
+            precision.velocity_to_steps(entity["velocity_x"]), precision.velocity_to_steps(entity["velocity_y"]),
+            pack_ship_flags(entity), entity["score"], entity["color_idx"],
+        )
+    return ASTEROID_RECORD.pack(
+        entity["id"],
+        precision.position_to_steps(entity["x"], width), precision.position_to_steps(entity["y"], height),
+        precision.velocity_to_steps(entity["vx"]), precision.velocity_to_steps(entity["vy"]),
+        entity["tick"], precision.angle_to_steps(entity["angle"]), precision.velocity_to_steps(entity["spin"]), entity["level"],
+    )
+
+
+def pack_entity_ids(parts, ids, ship_net_ids):
+    """Append per-section id lists: ships as u8 net ids, asteroids and lasers as u32 ids"""
+    ships = ids.get("ships", [])
+    parts.append(COUNT8.pack(len(ships)))
+    for player_id in ships:
+        parts.append(COUNT8.pack(ship_net_ids[player_id]))
+    for section in ("asteroids", "lasers"):
+        section_ids = ids.get(section, [])
+        parts.append(COUNT16.pack(len(section_ids)))
+        for entity_id in section_ids:
+            parts.append(ENTITY_ID.pack(entity_id))
+
+
+def encode_snapshot(message, snapshot, arena, baseline=None, net_ids=None, records=None, precision=DEFAULT_PRECISION):
+    """Encode a game_state message (keyframe or delta) as a binary frame, reusing records from a FragmentCache if given"""
+    data = message["data"]
+    removed = message.get("removed", {})
+    # Filtered snapshots may leave out ships whose scores and lasers are still
+    # sent, so callers can pass the room's full player_id -> net_id map
+    if net_ids is None:
+        net_ids = {player_id: ship["net_id"] for player_id, ship in snapshot["ships"].items()}
+
+    flags = 0
+    if message["keyframe"]:
+        flags |= FLAG_KEYFRAME
+    if "scores" in data:
+        flags |= FLAG_SCORES
+    if "entered" in message:
+        flags |= FLAG_AREA_EVENTS
+    if message.get("events"):
+        flags |= FLAG_EVENTS
+
+    baseline_tick = message.get("baseline")
+    parts = [HEADER.pack(
+        MSG_SNAPSHOT,
+        message["tick"],
+        NO_BASELINE if baseline_tick is None else baseline_tick,
+        flags,
+        data.get("level", snapshot["level"]),
+        NO_INPUT_SEQ if message.get("input_seq") is None else message["input_seq"],
+    )]
+
+    # Events come before the entities, so clients see joins before the new players' ships.
+    # They are rare and varied, so they are sent as JSON rather than fixed records
+    if message.get("events"):
+        events = json.dumps(message["events"], separators=(",", ":")).encode("utf-8")
+        parts.append(EVENTS_LENGTH.pack(len(events)))
+        parts.append(events)
+
+    # Ships, then asteroids
+    for section, count in (("ships", COUNT8), ("asteroids", COUNT16)):
+        entities = data[section]
+        parts.append(count.pack(len(entities)))
+        for entity_id, entity in entities.items():
+            parts.append(records.get(section, entity_id, entity) if records
+                         else encode_record(section, entity_id, entity, arena, precision))
+
+    # Lasers
+    width, height = arena
+    lasers = data["lasers"]
+    parts.append(COUNT16.pack(len(lasers)))
+    for laser in lasers.values():
+        parts.append(LASER_RECORD.pack(
+            laser["id"],
+            precision.position_to_steps(laser["x"], width), precision.position_to_steps(laser["y"], height),
+            precision.angle_to_steps(laser["angle"]),
+            net_ids.get(laser["player_id"], 0xFF), message["tick"] - laser["tick"],
+        ))
+
+    # Removed entities (departed ships are looked up in the baseline for their net id)
+    baseline_net_ids = {player_id: ship["net_id"] for player_id, ship in baseline["ships"].items()} if baseline else {}
+    pack_entity_ids(parts, removed, baseline_net_ids)
+
+    # Scores
+    if "scores" in data:
+        scores = [(net_ids[player_id], score) for player_id, score in data["scores"].items() if player_id in net_ids]
+        parts.append(COUNT8.pack(len(scores)))
+        for net_id, score in scores:
+            parts.append(SCORE_RECORD.pack(net_id, score))
+
+    # Area of interest events (ships that entered or left are still in the room)
+    if "entered" in message:
+        pack_entity_ids(parts, message["entered"], net_ids)
+        pack_entity_ids(parts, message["left"], net_ids)
+
+    return b"".join(parts)
+
+
+def decode_client_message(frame):
+    """Decode a binary client frame into the same dict shape as a JSON message"""
+    if not frame:
+        return None
+
+    kind = frame[0]
+    if kind == MSG_INPUT and len(frame) == INPUT_MESSAGE.size:
+        _, bits, seq, tick = INPUT_MESSAGE.unpack(frame)
+        rotation = (1 if bits & INPUT_LEFT else 0) - (1 if bits & INPUT_RIGHT else 0)
+        return {
+            "type": "input",
+            "seq": seq,
+            "tick": tick,
+            "data": {
+                "rotation": rotation,
+                "thrust": bool(bits & INPUT_THRUST),
+                "fire": bool(bits & INPUT_FIRE),
+            },
+        }
+    if kind == MSG_ACK and len(frame) == ACK_MESSAGE.size:
+        _, tick = ACK_MESSAGE.unpack(frame)
+        return {"type": "ack", "tick": tick}
+
+    return None